@@ -0,0 +1,56 @@
+"""
+Time per step of ForwardStrategyCompiled (torch.compile of the whole step) against the default scripted strategies,
+on binary trees with segments of a few different lengths, once compiled. Compile time of the first steps is printed
+separately.
+
+Run with PYTHONPATH=src python benchmarks/bench_compiled.py
+"""
+import time
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_compiled import ForwardStrategyCompiled
+from dendrites.segment import dendrite_default_configuration
+
+SIZES = (15, 255, 4095)
+LENGTHS = (5, 6, 7, 8)
+STEPS = 200
+
+
+def tree(c, n_segments: int, strategy, packed: bool):
+    engine = DendriteEngine(c, forward_context=ForwardContext(c, strategy) if strategy else None, packed=packed)
+    configuration = dendrite_default_configuration(c)
+    configuration.pop('LEN')
+    lengths = [LENGTHS[i % len(LENGTHS)] for i in range(n_segments)]
+    segments = engine.create_segments([f"S{i}" for i in range(n_segments)], lengths, **configuration)
+    with engine.transaction():
+        for i in range(n_segments // 2):
+            engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+    segments[-1].V[1] = 0.5
+    return engine
+
+
+def bench(n_segments: int, packed: bool):
+    c = MainConfig()
+    times = []
+    for strategy in (None, ForwardStrategyCompiled(c)):
+        engine = tree(c, n_segments, strategy, packed)
+        start = time.perf_counter()
+        engine.forward()
+        warmup = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(STEPS):
+            engine.forward()
+        times.append(((time.perf_counter() - start) / STEPS, warmup))
+    (scripted, _), (compiled, compile_time) = times
+    return scripted, compiled, compile_time
+
+
+if __name__ == '__main__':
+    print(f"{'storage':>8} {'segments':>9} {'scripted us':>12} {'compiled us':>12} {'compile s':>10}")
+    for packed in (False, True):
+        for n in SIZES:
+            scripted, compiled, compile_time = bench(n, packed)
+            print(f"{'packed' if packed else 'tables':>8} {n:>9} {scripted * 1e6:>12.1f} {compiled * 1e6:>12.1f} "
+                  f"{compile_time:>10.1f}")
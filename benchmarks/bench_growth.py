@@ -0,0 +1,43 @@
+"""
+Cost of add_segment and grow per call for growing numbers of segments, it should stay flat, and of grow_many per
+segment moved.
+
+Run with PYTHONPATH=src python benchmarks/bench_growth.py
+"""
+import time
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.segment import dendrite_default_configuration, DendriteSegment
+
+SIZES = (1000, 2000, 4000, 8000, 16000)
+
+
+def bench(n: int, packed: bool):
+    c = MainConfig()
+    engine = DendriteEngine(c, packed=packed)
+    configuration = dendrite_default_configuration(c)
+    segments = [DendriteSegment(**configuration, name=f"D{i}") for i in range(n)]
+
+    start = time.perf_counter()
+    for segment in segments:
+        engine.add_segment(segment)
+    add_segment = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for segment in segments:
+        engine.grow(segment)
+    grow = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.grow_many(segments)
+    grow_many = time.perf_counter() - start
+    return add_segment / n * 1e6, grow / n * 1e6, grow_many / n * 1e6
+
+
+if __name__ == '__main__':
+    print(f"{'storage':>8} {'segments':>9} {'add_segment us':>15} {'grow us':>9} {'grow_many us':>13}")
+    for packed in (False, True):
+        for n in SIZES:
+            add_segment, grow, grow_many = bench(n, packed)
+            print(f"{'packed' if packed else 'tables':>8} {n:>9} {add_segment:>15.1f} {grow:>9.1f} {grow_many:>13.1f}")
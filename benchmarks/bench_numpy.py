@@ -0,0 +1,55 @@
+"""
+Time per forward() of small trees, a few dozen to a few hundred compartments, with the default torch strategies
+against ForwardStrategyNumpy, with and without Numba.
+
+Run with PYTHONPATH=src python benchmarks/bench_numpy.py
+"""
+import time
+
+from config import MainConfig
+from dendrites import numpy_kernels
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_numpy import ForwardStrategyNumpy
+from dendrites.segment import dendrite_default_configuration
+
+SIZES = (3, 7, 15, 63)
+LENGTHS = (5, 6, 7)
+STEPS = 1000
+
+
+def tree(c, n_segments: int, strategy, packed: bool):
+    engine = DendriteEngine(c, forward_context=ForwardContext(c, strategy) if strategy else None, packed=packed)
+    configuration = dendrite_default_configuration(c)
+    configuration.pop('LEN')
+    lengths = [LENGTHS[i % len(LENGTHS)] for i in range(n_segments)]
+    segments = engine.create_segments([f"S{i}" for i in range(n_segments)], lengths, **configuration)
+    for i in range(n_segments // 2):
+        engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+    segments[-1].V[1] = 0.5
+    return engine, sum(lengths)
+
+
+def bench(n_segments: int, packed: bool):
+    c = MainConfig()
+    strategies = [None, ForwardStrategyNumpy(c, jit=False)]
+    if numpy_kernels.numba is not None:
+        strategies.append(ForwardStrategyNumpy(c, jit=True))
+    times = []
+    for strategy in strategies:
+        engine, compartments = tree(c, n_segments, strategy, packed)
+        engine.forward()
+        start = time.perf_counter()
+        for _ in range(STEPS):
+            engine.forward()
+        times.append((time.perf_counter() - start) / STEPS)
+    return compartments, times + [float('nan')] * (3 - len(times))
+
+
+if __name__ == '__main__':
+    print(f"{'storage':>8} {'compartments':>13} {'torch us':>9} {'numpy us':>9} {'numba us':>9}")
+    for packed in (False, True):
+        for n in SIZES:
+            compartments, (torch_time, numpy_time, numba_time) = bench(n, packed)
+            print(f"{'packed' if packed else 'tables':>8} {compartments:>13} {torch_time * 1e6:>9.1f} "
+                  f"{numpy_time * 1e6:>9.1f} {numba_time * 1e6:>9.1f}")
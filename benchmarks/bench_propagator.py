@@ -0,0 +1,57 @@
+"""
+Time to simulate binary trees over many steps with a few inputs, stepping every DT with run() against jumping from
+input to input with advance().
+
+Run with PYTHONPATH=src python benchmarks/bench_propagator.py
+"""
+import time
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.segment import dendrite_default_configuration
+from dendrites.stimulus import StimulusSchedule
+
+SIZES = (15, 63, 255)
+LENGTHS = (5, 6, 7)
+STEPS = 20000
+EVENTS = 10
+
+
+def tree(c, n_segments: int):
+    engine = DendriteEngine(c)
+    configuration = dendrite_default_configuration(c)
+    configuration.pop('LEN')
+    lengths = [LENGTHS[i % len(LENGTHS)] for i in range(n_segments)]
+    segments = engine.create_segments([f"S{i}" for i in range(n_segments)], lengths, **configuration)
+    for i in range(n_segments // 2):
+        engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+    schedule = StimulusSchedule(c)
+    times = torch.arange(EVENTS, dtype=torch.float) * (STEPS // EVENTS) * c.dendrites.DT
+    schedule.add_events(segments[-1], times, 2, 0.5)
+    engine.set_stimulus(schedule)
+    return engine, sum(lengths)
+
+
+def bench(n_segments: int):
+    c = MainConfig()
+    engine, compartments = tree(c, n_segments)
+    start = time.perf_counter()
+    engine.run(STEPS)
+    stepped = time.perf_counter() - start
+    engine, _ = tree(c, n_segments)
+    start = time.perf_counter()
+    engine.advance(STEPS * c.dendrites.DT)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.advance(STEPS * c.dendrites.DT)
+    cached = time.perf_counter() - start
+    return compartments, stepped, first, cached
+
+
+if __name__ == '__main__':
+    print(f"{'compartments':>13} {'run ms':>9} {'advance ms':>11} {'cached ms':>10}")
+    for n in SIZES:
+        compartments, stepped, first, cached = bench(n)
+        print(f"{compartments:>13} {stepped * 1e3:>9.1f} {first * 1e3:>11.1f} {cached * 1e3:>10.1f}")
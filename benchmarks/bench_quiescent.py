@@ -0,0 +1,62 @@
+"""
+Time per step of ForwardStrategyQuiescent against the full explicit update, on binary trees at rest with a sparse
+input: one signal into one leaf every 50 steps. Also prints the fraction of blocks updated and the largest voltage
+difference to the full update.
+
+Run with PYTHONPATH=src python benchmarks/bench_quiescent.py
+"""
+import time
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_quiescent import ForwardStrategyQuiescent
+from dendrites.segment import dendrite_default_configuration
+
+SIZES = ((500, 100), (2000, 200))
+STEPS = 200
+EVERY = 50
+
+
+def tree(c, n_segments: int, length: int, strategy, packed: bool):
+    engine = DendriteEngine(c, forward_context=ForwardContext(c, strategy) if strategy else None, packed=packed)
+    configuration = dendrite_default_configuration(c)
+    configuration.pop('LEN')
+    segments = engine.create_segments([f"S{i}" for i in range(n_segments)], [length] * n_segments,
+                                      **{**configuration, 'k': 0.0})
+    with engine.transaction():
+        for i in range(n_segments // 2 - 1):
+            engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+    for segment in segments:
+        segment.V.fill_(c.dendrites.EL)
+    return engine, segments
+
+
+def bench(n_segments: int, length: int, packed: bool):
+    c = MainConfig()
+    results = []
+    for strategy in (None, ForwardStrategyQuiescent(c)):
+        engine, segments = tree(c, n_segments, length, strategy, packed)
+        engine.forward()
+        active = 0.0
+        start = time.perf_counter()
+        for step in range(STEPS):
+            if step % EVERY == 0:
+                segments[-3].signal(3, torch.tensor([0.5]))
+            engine.forward()
+            active += strategy.active_fraction if strategy else 1.0
+        elapsed = (time.perf_counter() - start) / STEPS
+        results.append((torch.cat([segment.V for segment in segments]), elapsed, active / STEPS))
+    (full, full_time, _), (gated, gated_time, active) = results
+    return full_time, gated_time, active, (full - gated).abs().max().item()
+
+
+if __name__ == '__main__':
+    print(f"{'storage':>8} {'compartments':>13} {'full ms':>8} {'quiescent ms':>13} {'active':>7} {'max error':>10}")
+    for packed in (False, True):
+        for n_segments, length in SIZES:
+            full_time, gated_time, active, error = bench(n_segments, length, packed)
+            print(f"{'packed' if packed else 'tables':>8} {n_segments * length:>13} {full_time * 1e3:>8.2f} "
+                  f"{gated_time * 1e3:>13.2f} {active:>7.4f} {error:>10.2e}")
@@ -0,0 +1,61 @@
+"""
+Time per step of a forest and of one large tree in a single engine against ShardedEngine with 1, 2, 4, ... worker
+processes up to the number of cores. The forest needs no exchange, the large tree exchanges its cut junctions every
+step.
+
+Run with PYTHONPATH=src python benchmarks/bench_sharded.py
+"""
+import os
+import time
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.segment import dendrite_default_configuration
+from dendrites.sharded_engine import ShardedEngine
+
+DEPTH = 12
+TREES = 16
+LENGTHS = (20, 30, 40)
+STEPS = 100
+
+
+def forest(c, n_trees: int, depth: int):
+    engine = DendriteEngine(c, packed=True)
+    configuration = dendrite_default_configuration(c)
+    configuration.pop('LEN')
+    n = 2 ** depth - 1
+    for t in range(n_trees):
+        lengths = [LENGTHS[i % len(LENGTHS)] for i in range(n)]
+        segments = engine.create_segments([f"T{t}S{i}" for i in range(n)], lengths, **configuration)
+        for i in range(n // 2):
+            engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+        segments[-1].V[1] = 0.5
+    return engine
+
+
+def bench(n_trees: int, depth: int):
+    c = MainConfig()
+    engine = forest(c, n_trees, depth)
+    compartments = sum(segment.length for segment in engine.slice_ids)
+    engine.forward()
+    start = time.perf_counter()
+    engine.run(STEPS)
+    times = [(1, (time.perf_counter() - start) / STEPS, 0)]
+    n_shards = 2
+    while n_shards <= os.cpu_count():
+        with ShardedEngine(engine, n_shards) as sharded:
+            sharded.run(1)
+            start = time.perf_counter()
+            sharded.run(STEPS)
+            times.append((n_shards, (time.perf_counter() - start) / STEPS, sharded.cross_junctions))
+        n_shards *= 2
+    return compartments, times
+
+
+if __name__ == '__main__':
+    print(f"{'model':>8} {'compartments':>13} {'shards':>7} {'cut':>5} {'ms/step':>9} {'speedup':>8}")
+    for name, n_trees, depth in (('forest', TREES, DEPTH - 4), ('tree', 1, DEPTH)):
+        compartments, times = bench(n_trees, depth)
+        for n_shards, seconds, cut in times:
+            print(f"{name:>8} {compartments:>13} {n_shards:>7} {cut:>5} {seconds * 1e3:>9.2f} "
+                  f"{times[0][1] / seconds:>8.2f}")
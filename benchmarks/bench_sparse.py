@@ -0,0 +1,62 @@
+"""
+Time per forward() of binary trees with the default strategies against ForwardStrategySparse, one sparse matrix
+product with the CableOperator of the engine, and the time to assemble the operator from scratch and after one grow.
+
+Run with PYTHONPATH=src python benchmarks/bench_sparse.py
+"""
+import time
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_sparse import ForwardStrategySparse
+from dendrites.segment import dendrite_default_configuration
+
+SIZES = (15, 255, 4095)
+LENGTHS = (5, 6, 7)
+STEPS = 200
+
+
+def tree(c, n_segments: int, strategy, packed: bool):
+    engine = DendriteEngine(c, forward_context=ForwardContext(c, strategy) if strategy else None, packed=packed)
+    configuration = dendrite_default_configuration(c)
+    configuration.pop('LEN')
+    lengths = [LENGTHS[i % len(LENGTHS)] for i in range(n_segments)]
+    segments = engine.create_segments([f"S{i}" for i in range(n_segments)], lengths, **configuration)
+    for i in range(n_segments // 2):
+        engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+    segments[-1].V[1] = 0.5
+    return engine, segments, sum(lengths)
+
+
+def step_time(engine):
+    engine.forward()
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        engine.forward()
+    return (time.perf_counter() - start) / STEPS
+
+
+def bench(n_segments: int, packed: bool):
+    c = MainConfig()
+    engine, _, compartments = tree(c, n_segments, None, packed)
+    default = step_time(engine)
+    engine, segments, _ = tree(c, n_segments, ForwardStrategySparse(c), packed)
+    start = time.perf_counter()
+    engine.operator.assemble()
+    assemble = time.perf_counter() - start
+    engine.grow(segments[-1])
+    start = time.perf_counter()
+    engine.operator.assemble()
+    update = time.perf_counter() - start
+    return compartments, default, step_time(engine), assemble, update
+
+
+if __name__ == '__main__':
+    print(f"{'storage':>8} {'compartments':>13} {'default us':>11} {'sparse us':>10} {'assemble ms':>12} "
+          f"{'after grow ms':>14}")
+    for packed in (False, True):
+        for n in SIZES:
+            compartments, default, sparse, assemble, update = bench(n, packed)
+            print(f"{'packed' if packed else 'tables':>8} {compartments:>13} {default * 1e6:>11.1f} "
+                  f"{sparse * 1e6:>10.1f} {assemble * 1e3:>12.1f} {update * 1e3:>14.1f}")
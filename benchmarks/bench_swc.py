@@ -0,0 +1,70 @@
+"""
+Time to build a tree from an SWC reconstruction with load_swc, against one create_segment and add_branch call per
+segment, for synthetic binary trees with 20 samples per segment.
+
+Run with PYTHONPATH=src python benchmarks/bench_swc.py
+"""
+import io
+import time
+
+import numpy as np
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.morphology import load_swc
+from dendrites.segment import dendrite_default_configuration
+
+SIZES = (1000, 4000, 10000)
+SAMPLES = 20
+
+
+def synthetic_swc(n_segments: int) -> str:
+    """
+    Binary tree grown by forking random tips, segments of SAMPLES samples one unit apart.
+    """
+    rng = np.random.default_rng(0)
+    rows = [(1, 1, 0.0, 0.0, 0.0, 10.0, -1)]
+    tips = [1]
+    while len(rows) < n_segments * SAMPLES:
+        parent = tips.pop(rng.integers(len(tips)))
+        for _ in range(2):
+            previous = parent
+            for _ in range(SAMPLES):
+                x, y, z = (np.array(rows[previous - 1][2:5]) + rng.normal(size=3) / np.sqrt(3)).tolist()
+                rows.append((len(rows) + 1, 3, x, y, z, 2.0, previous))
+                previous = len(rows)
+            tips.append(previous)
+    text = io.StringIO()
+    np.savetxt(text, np.array(rows), fmt='%g')
+    return text.getvalue()
+
+
+def bench(n: int, packed: bool):
+    c = MainConfig()
+    swc = synthetic_swc(n)
+
+    engine = DendriteEngine(c, packed=packed)
+    start = time.perf_counter()
+    segments = load_swc(engine, io.StringIO(swc))
+    bulk = time.perf_counter() - start
+
+    reference = DendriteEngine(c, packed=packed)
+    configuration = dendrite_default_configuration(c)
+    start = time.perf_counter()
+    copies = {}
+    for segment in segments:
+        copies[segment] = reference.create_segment(**{**configuration, 'r0': segment.r0.item(),
+                                                      'k': segment.k.item(), 'LEN': segment.length},
+                                                   name=segment.name)
+    for segment, children in engine.branches:
+        reference.add_branch(copies[segment], *[copies[child] for child in children])
+    one_by_one = time.perf_counter() - start
+    return len(segments), bulk, one_by_one
+
+
+if __name__ == '__main__':
+    print(f"{'storage':>8} {'segments':>9} {'load_swc s':>11} {'create_segment s':>17}")
+    for packed in (False, True):
+        for n in SIZES:
+            segments, bulk, one_by_one = bench(n, packed)
+            print(f"{'packed' if packed else 'tables':>8} {segments:>9} {bulk:>11.3f} {one_by_one:>17.3f}")
@@ -1,5 +1,5 @@
 from .dendrites import DendritesConfig
-from .tensorboard import create_tensorboard_writer
+from .tensorboard import AsyncWriter, create_tensorboard_writer
 
 
 class MainConfig:
@@ -8,3 +8,19 @@ class DendritesConfig:
     GL = 2.0
     CM = 1.0
     LEN = 5
+    # Deviation from El below which ForwardStrategyQuiescent skips a compartment
+    QUIESCENCE_TOLERANCE = 1e-6
+    # Compartments per block that ForwardStrategyQuiescent updates or skips together
+    QUIESCENCE_WIDTH = 64
+    # Largest local error of an accepted AdaptiveStepper step
+    ADAPTIVE_TOLERANCE = 1e-5
+    # Largest AdaptiveStepper step in multiples of DT
+    ADAPTIVE_MAX_MULTIPLE = 64
+    # Jump lengths whose propagators Propagator keeps
+    PROPAGATOR_CACHE = 16
+    # Right-hand sides SteadyState solves together
+    STEADY_STATE_BLOCK = 256
+    # torch threads of every ShardedEngine worker process
+    SHARD_THREADS = 1
+    # torch threads of every SweepRunner worker process
+    SWEEP_THREADS = 1
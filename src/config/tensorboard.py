@@ -1,7 +1,9 @@
 import datetime
 import os
+import queue
 import threading
 
+import torch
 from torch.utils.tensorboard import SummaryWriter
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,7 +18,113 @@ class MyWriter(SummaryWriter):
         self.run = run
 
 
-def create_tensorboard_writer():
+def _snapshot(value):
+    """
+    Copy of the tensors in value, so the simulation can keep changing them while the worker logs.
+    """
+    if isinstance(value, torch.Tensor):
+        return value.detach().to('cpu', copy=True)
+    if isinstance(value, dict):
+        return {key: _snapshot(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_snapshot(item) for item in value)
+    return value
+
+
+class AsyncWriter:
+    POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+    def __init__(self, writer, *, maxsize: int = 256, policy: str = 'block'):
+        """
+        Runs the add_* calls of writer on a worker thread, so TensorBoard encoding and figure rendering stay off the
+        simulation thread. Tensor arguments are copied when the call is queued.
+
+        @param writer: Writer called on the worker thread, usually a MyWriter
+        @param maxsize: Number of calls the queue holds
+        @param policy: What a call does when the queue is full: 'block' waits for the worker, 'drop_newest' drops the
+            call, 'drop_oldest' drops the oldest queued call
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown policy {policy}, expected one of {self.POLICIES}")
+        self.writer = writer
+        self.policy = policy
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    @property
+    def run(self):
+        return self.writer.run
+
+    def __getattr__(self, name):
+        if not name.startswith('add_'):
+            raise AttributeError(name)
+        method = getattr(self.writer, name)
+        return lambda *args, **kwargs: self.submit(lambda _, *a, **k: method(*a, **k), *args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queues fn(writer, *args, **kwargs) for the worker thread.
+        """
+        self._raise()
+        item = (fn, _snapshot(args), _snapshot(kwargs))
+        if self.policy == 'block':
+            self._queue.put(item)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                self.dropped += 1
+                if self.policy == 'drop_newest':
+                    return
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                except queue.Empty:
+                    pass
+
+    def flush(self):
+        """
+        Waits until all queued calls are written.
+        """
+        self._queue.join()
+        self._raise()
+        self.writer.flush()
+
+    def close(self):
+        self._queue.join()
+        self._queue.put(None)
+        self._worker.join()
+        self.writer.close()
+        self._raise()
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                fn, args, kwargs = item
+                fn(self.writer, *args, **kwargs)
+            except Exception as error:
+                self._error = self._error or error
+            finally:
+                self._queue.task_done()
+
+
+def create_tensorboard_writer(background: bool = False, **kwargs):
+    """
+    @param background: Wrap the writer in an AsyncWriter, kwargs are passed to it
+    """
     thread_id = threading.get_native_id()
     TENSORBOARD_RUN = datetime.datetime.now().strftime("%m-%d__%H-%M") + f"__{thread_id}"
     TENSORBOARD_LOGDIR = os.path.join(ROOT_DIR,
@@ -26,4 +134,6 @@ def create_tensorboard_writer():
                                       TENSORBOARD_RUN)
     writer = MyWriter(log_dir=TENSORBOARD_LOGDIR, flush_secs=30, max_queue=100000)
     writer.run = TENSORBOARD_RUN
+    if background:
+        return AsyncWriter(writer, **kwargs)
     return writer
@@ -0,0 +1,129 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+
+# Step size factor per step, from the error estimate of TR-BDF2 which scales with dt^3
+SAFETY = 0.9
+ORDER = 3
+
+
+def _power_of_two(n) -> int:
+    """
+    Largest power of two at most n, n >= 1.
+    """
+    return 1 << (int(n).bit_length() - 1)
+
+
+def apply_due_inputs(engine) -> bool:
+    """
+    Applies the inputs of the engine's stimulus schedule due at the current step, True if there were any.
+    """
+    if engine.stimulus is None:
+        return False
+    _, steps = engine._compiled_stimulus()
+    due = any(bisect_right(due, engine.steps) > bisect_left(due, engine.steps) for due in steps.values())
+    if due:
+        engine._forward_stimulus()
+    return due
+
+
+def steps_to_event(engine, end: int) -> int:
+    """
+    Steps from the current one to the first of end, the next input and the next probe sample.
+    """
+    step = engine.steps
+    limit = end - step
+    if engine.stimulus is not None:
+        _, steps = engine._compiled_stimulus()
+        for due in steps.values():
+            i = bisect_right(due, step)
+            if i < len(due):
+                limit = min(limit, due[i] - step)
+    for probe in engine.probes:
+        limit = min(limit, (step // probe.every + 1) * probe.every - step)
+    return limit
+
+
+class AdaptiveStepper:
+    def __init__(self, engine, *, tolerance: float = None, max_multiple: int = None):
+        """
+        Advances an engine with TR-BDF2 steps of a variable multiple m of DT, chosen from the embedded error estimate
+        of every step: m doubles while the estimate stays well below tolerance and steps above it are rejected and
+        retried with a smaller m. Flat voltages are crossed in steps of up to max_multiple * DT, well beyond the
+        explicit stability limit, and steps shrink around stimuli and steep gradients.
+
+        m is a power of two and steps never cross a step at which an input of the engine's stimulus schedule is due
+        or a probe records, so inputs are applied and samples are taken at the same steps as with forward(). The
+        step after an input starts again from m = 1. engine.steps counts steps of DT as usual.
+
+        Steps of DT above tolerance are accepted, as there is no smaller step on the grid. Ensembles are not
+        supported, like ForwardStrategyImplicit.
+
+        @param tolerance: Largest accepted local error of a step, in voltage, DendritesConfig.ADAPTIVE_TOLERANCE by
+            default
+        @param max_multiple: Largest step in multiples of DT, DendritesConfig.ADAPTIVE_MAX_MULTIPLE by default
+        """
+        c = engine.c
+        self.engine = engine
+        self.dt = float(c.dendrites.DT)
+        self.tolerance = float(c.dendrites.ADAPTIVE_TOLERANCE if tolerance is None else tolerance)
+        self.max_multiple = int(c.dendrites.ADAPTIVE_MAX_MULTIPLE if max_multiple is None else max_multiple)
+        self.strategy = ForwardStrategyImplicit(c, method='tr_bdf2')
+        self.multiple = 1
+        self.accepted = 0
+        self.rejected = 0
+        # Accepted steps by multiple of DT
+        self.multiples = Counter()
+        self._structure = None
+
+    def run(self, n_steps: int):
+        """
+        Advances the engine by n_steps steps of DT.
+        """
+        engine = self.engine
+        if engine.structure != self._structure:
+            self.strategy.cache_clear()
+            self._structure = engine.structure
+        graph = self.strategy.graph(engine.voltage_tables, engine.branches)
+        end = engine.steps + n_steps
+        while engine.steps < end:
+            if apply_due_inputs(engine):
+                self.multiple = 1
+            m = _power_of_two(min(self.multiple, steps_to_event(engine, end)))
+            # A step cut short by an input or a probe says nothing about the multiple to keep using
+            limited = m < self.multiple
+            V = graph.gather(engine.voltage_tables)
+            while True:
+                V_new, error = self.strategy.step(V, m * self.dt, estimate=True)
+                norm = error.abs().max().item() / self.tolerance if graph.n else 0.0
+                if norm <= 1.0 or m == 1:
+                    break
+                self.rejected += 1
+                limited = False
+                m = self._multiple(m, norm)
+            if graph.n:
+                graph.scatter(engine.voltage_tables, V_new)
+            engine._forward_boundary()
+            engine.steps += m
+            engine._forward_probes()
+            self.accepted += 1
+            self.multiples[m] += 1
+            if not limited:
+                self.multiple = min(self._multiple(m, norm), self.max_multiple)
+
+    @staticmethod
+    def _multiple(m: int, norm: float) -> int:
+        """
+        Power of two closest below the multiple m * SAFETY * norm^(-1 / ORDER) the error estimate asks for, at most
+        twice m.
+        """
+        target = m * SAFETY * (norm if norm > 0 else 1e-12) ** (-1 / ORDER)
+        return _power_of_two(max(1.0, min(target, 2 * m)))
+
+    @property
+    def mean_multiple(self):
+        """
+        Mean accepted step in multiples of DT.
+        """
+        return sum(m * n for m, n in self.multiples.items()) / self.accepted if self.accepted else 0.0
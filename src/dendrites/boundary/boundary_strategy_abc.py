@@ -12,5 +12,10 @@ class BoundaryStrategyABC(ABC):
         pass
 
     @abstractmethod
-    def boundary_branch(self, branchesM: List[Tensor], branchesL: List[Tensor], branchesR: List[Tensor]):
+    def boundary_packed(self, voltages: Tensor, first: Tensor, last: Tensor):
+        pass
+
+    @abstractmethod
+    def boundary_branch(self, voltages: List[Tensor], rows: List[Tensor], inner: List[Tensor], outer: List[Tensor],
+                        arms: List[Tensor], junctions: Tensor, counts: Tensor):
         pass
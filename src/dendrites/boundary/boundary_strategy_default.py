@@ -6,10 +6,18 @@ from torch import Tensor
 from dendrites.boundary.boundary_strategy_abc import BoundaryStrategyABC
 
 
+@torch.jit.script
+def _batched(voltages: torch.Tensor):
+    """
+    Storage data with its batch dimension, a leading dimension of 1 is added to storages of a single replica.
+    """
+    return voltages if voltages.dim() == 4 else voltages.unsqueeze(0)
+
+
 @torch.jit.script
 def _boundary(voltage_table: torch.Tensor):
-    voltage_table[:, 0, 0] = voltage_table[:, 0, 1]
-    voltage_table[:, 0, -1] = voltage_table[:, 0, -2]
+    voltage_table[..., 0, 0] = voltage_table[..., 0, 1]
+    voltage_table[..., 0, -1] = voltage_table[..., 0, -2]
 
 @torch.jit.script
 def boundary_torchscript(voltage_tables: Dict[int, torch.Tensor]):
@@ -22,6 +30,40 @@ def boundary_torchscript(voltage_tables: Dict[int, torch.Tensor]):
         torch.jit.wait(fut)
 
 
+@torch.jit.script
+def boundary_packed_torchscript(voltages: torch.Tensor, first: torch.Tensor, last: torch.Tensor):
+    voltages = _batched(voltages)
+    voltages[:, 0, 0, first] = voltages[:, 0, 0, first + 1]
+    voltages[:, 0, 0, last] = voltages[:, 0, 0, last - 1]
+
+
+@torch.jit.script
+def boundary_branch_torchscript(voltages: List[Tensor], rows: List[Tensor], inner: List[Tensor], outer: List[Tensor],
+                                arms: List[Tensor], junctions: Tensor, counts: Tensor):
+    """
+    All junctions at once, any number of arms each: outer compartments are set to the mean of the inner ones, and
+    the inner ones take their current into the junction minus the mean current over the arms of the junction.
+    voltages[i] is a storage, rows[i], inner[i] and outer[i] locate the arms arms[i] in it. Leading batch dimensions
+    of the storages are kept.
+    """
+    batched = [_batched(voltage) for voltage in voltages]
+    B = batched[0].shape[0]
+    values = torch.zeros((B, junctions.shape[0]), dtype=counts.dtype)
+    for i in range(len(batched)):
+        values[:, arms[i]] = batched[i][:, rows[i], 0, inner[i]]
+
+    mean_value = torch.zeros((B, counts.shape[0]), dtype=counts.dtype).index_add_(1, junctions, values).div_(
+        counts)[:, junctions]
+    I = mean_value - values
+    I_mean = torch.zeros((B, counts.shape[0]), dtype=counts.dtype).index_add_(1, junctions, I).div_(
+        counts)[:, junctions]
+    values += I - I_mean
+
+    for i in range(len(batched)):
+        batched[i][:, rows[i], 0, outer[i]] = mean_value[:, arms[i]]
+        batched[i][:, rows[i], 0, inner[i]] = values[:, arms[i]]
+
+
 class BoundaryStrategyDefault(BoundaryStrategyABC):
     @staticmethod
     @torch.jit.script
@@ -30,30 +72,14 @@ class BoundaryStrategyDefault(BoundaryStrategyABC):
 
     @staticmethod
     @torch.jit.script
-    def boundary_branch(branchesM: List[Tensor], branchesL: List[Tensor], branchesR: List[Tensor]):
-        V_stack = torch.stack(branchesM, dim=0)
-        Vb1_stack = torch.stack(branchesL, dim=0)
-        Vb2_stack = torch.stack(branchesR, dim=0)
-
-        mean_value = (V_stack[:, -2] + Vb1_stack[:, 1] + Vb2_stack[:, 1]) / 3
-
-        V_stack[:, 1].copy_(mean_value)
-        Vb1_stack[:, 0].copy_(mean_value)
-        Vb2_stack[:, 0].copy_(mean_value)
-
-        I = -V_stack[:, 0] + mean_value
-        Ib1 = -Vb1_stack[:, 1] + mean_value
-        Ib2 = -Vb2_stack[:, 1] + mean_value
-        I_mean = (I + Ib1 + Ib2) / 3
-
-        V_stack[:, 0].add_(I - I_mean)
-        Vb1_stack[:, 1].add_(Ib1 - I_mean)
-        Vb2_stack[:, 1].add_(Ib2 - I_mean)
-
-        for i in range(len(branchesM)):
-            branchesM[i].copy_(V_stack[i])
-            branchesL[i].copy_(Vb1_stack[i])
-            branchesR[i].copy_(Vb2_stack[i])
+    def boundary_packed(voltages: torch.Tensor, first: torch.Tensor, last: torch.Tensor):
+        boundary_packed_torchscript(voltages, first, last)
+
+    @staticmethod
+    @torch.jit.script
+    def boundary_branch(voltages: List[Tensor], rows: List[Tensor], inner: List[Tensor], outer: List[Tensor],
+                        arms: List[Tensor], junctions: Tensor, counts: Tensor):
+        boundary_branch_torchscript(voltages, rows, inner, outer, arms, junctions, counts)
 
     def __str__(self):
         return 'Default'
@@ -0,0 +1,36 @@
+from typing import Dict, List
+
+from torch import Tensor
+
+from dendrites import numpy_kernels
+from dendrites.boundary.boundary_strategy_abc import BoundaryStrategyABC
+from dendrites.forward.forward_strategy_numpy import as_numpy
+
+
+class BoundaryStrategyNumpy(BoundaryStrategyABC):
+    def __init__(self):
+        """
+        BoundaryStrategyDefault on NumPy views of the storages, for trees too small for torch dispatch to pay off.
+        ForwardStrategyNumpy applies boundaries itself, this strategy pairs the NumPy kernels with other forward
+        strategies.
+        """
+        # Junctions index tensor -> junction_members of it
+        self._members = (None, None)
+
+    def boundary(self, voltage_tables: Dict[int, Tensor]):
+        for data in voltage_tables.values():
+            numpy_kernels.boundary(as_numpy(data))
+
+    def boundary_packed(self, voltages: Tensor, first: Tensor, last: Tensor):
+        numpy_kernels.boundary_packed(as_numpy(voltages), first.numpy(), last.numpy())
+
+    def boundary_branch(self, voltages: List[Tensor], rows: List[Tensor], inner: List[Tensor], outer: List[Tensor],
+                        arms: List[Tensor], junctions: Tensor, counts: Tensor):
+        if self._members[0] is not junctions:
+            self._members = (junctions, numpy_kernels.junction_members(junctions.numpy(), counts.numpy()))
+        numpy_kernels.branch([as_numpy(data) for data in voltages], *([value.numpy() for value in values]
+                                                                      for values in (rows, inner, outer, arms)),
+                             junctions.numpy(), counts.numpy(), self._members[1])
+
+    def __str__(self):
+        return 'NumPy'
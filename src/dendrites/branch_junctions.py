@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+import torch
+
+from dendrites.segment import DendriteSegment
+
+
+class BranchJunctions:
+    def __init__(self):
+        """
+        Branch points as integer indices into the voltage storages instead of tensor views, so they stay valid when
+        a storage is reallocated. A junction has one arm per segment meeting there, the end of the parent and the
+        start of every child. An arm is two compartments: the outer one at the junction and the inner one next to it.
+
+        Positions of the arms are cached and only looked up again for segments that moved. The index tensors are
+        rebuilt from them on the next step, grouped by storage, so boundary_branch runs one gather and one scatter
+        per storage whatever the number of junctions.
+        """
+        self.arms = []
+        self.segment_arms = defaultdict(list)
+        self.counts = []
+        self._positions = []
+        self._moved = set()
+        self._index = None
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, segment: DendriteSegment, children) -> int:
+        """
+        Adds a junction between the end of segment and the start of every child.
+
+        @return: Junction number
+        """
+        junction = len(self.counts)
+        for member, end in [(segment, True)] + [(child, False) for child in children]:
+            self.segment_arms[member].append(len(self.arms))
+            self.arms.append((junction, member, end))
+            self._positions.append(None)
+            self._moved.add(len(self.arms) - 1)
+        self.counts.append(len(children) + 1)
+        self._index = None
+        return junction
+
+    def move(self, segment: DendriteSegment = None):
+        """
+        Marks the arms of segment (of all segments if None) to be located again before the next step.
+        """
+        self._moved.update(range(len(self.arms)) if segment is None else self.segment_arms.get(segment, ()))
+        self._index = None
+
+    def index(self, voltage_tables):
+        """
+        @param voltage_tables: Voltage storages of the engine
+        @return: (keys, rows, inner, outer, arms, junctions, counts), the first five are lists with one entry per
+            storage holding arms: its key, rows and columns of the inner and outer compartments and arm numbers.
+            junctions is the junction of every arm and counts the number of arms of every junction.
+        """
+        if self._index is None:
+            self._index = self._build(voltage_tables)
+        return self._index
+
+    def _build(self, voltage_tables):
+        keys = {id(storage): key for key, storage in voltage_tables.items()}
+        for arm in self._moved:
+            _, segment, end = self.arms[arm]
+            storage, row, start = segment.locate()
+            inner, outer = (start + segment.length - 3, start + segment.length - 2) if end else (start + 2, start + 1)
+            self._positions[arm] = (keys[id(storage)], row, inner, outer)
+        self._moved.clear()
+
+        groups = defaultdict(lambda: ([], [], [], []))
+        for arm, (key, row, inner, outer) in enumerate(self._positions):
+            for values, value in zip(groups[key], (row, inner, outer, arm)):
+                values.append(value)
+        index = [[torch.tensor(group[i], dtype=torch.long) for group in groups.values()] for i in range(4)]
+        junctions = torch.tensor([junction for junction, _, _ in self.arms], dtype=torch.long)
+        return (list(groups), *index, junctions, torch.tensor(self.counts, dtype=torch.float))
@@ -0,0 +1,206 @@
+import warnings
+from typing import Dict
+
+import torch
+
+from dendrites.boundary.boundary_strategy_default import _batched
+from dendrites.forward.forward_strategy_compiled import junction_members
+
+
+def _local(lengths: torch.Tensor):
+    """
+    Segment and position in the segment of every compartment of segments with the given lengths.
+    """
+    segments = torch.repeat_interleave(torch.arange(len(lengths)), lengths)
+    return segments, torch.arange(len(segments)) - torch.repeat_interleave(torch.cumsum(lengths, 0) - lengths, lengths)
+
+
+class CableOperator:
+    def __init__(self, engine):
+        """
+        One explicit step of the whole tree as an affine map V' = matrix @ V + affine on the flat vector of all
+        storages (every storage of engine.voltage_tables in key order, rows one after the other). The matrix is
+        sparse CSR and composes the three parts of the default step: the stencil with tapering D of every segment,
+        sealed ends (boundary compartments copy their neighbour) and junctions (both compartments of every arm set to
+        the mean of the inner compartments of the arms). Positions of storages that hold no segment are kept.
+
+        The stencil is cached per segment in its own coordinates and only computed again for new, grown or changed
+        segments. The matrix is assembled from the cached stencils after the tree changed, on the next call of
+        assemble(). Coefficients are read from the storages, so the operator follows exactly what the default
+        strategies step.
+
+        @param engine: DendriteEngine the operator belongs to, it calls invalidate() when parameters change
+        """
+        self.engine = engine
+        # Segment -> (length, off-diagonal, diagonal, affine) of its stencil, one value per compartment
+        self._stencils = {}
+        self._structure = None
+        self.offsets: Dict[int, int] = {}
+        self.n = 0
+        # Positions of the compartments of all segments in the flat vector, in engine.slice_ids order
+        self.positions = torch.zeros(0, dtype=torch.long)
+        self.matrix = None
+        self.affine = None
+        # Stencils computed so far, every segment once plus once per grow or parameter change
+        self.computed = 0
+
+    def invalidate(self, segment=None):
+        """
+        Computes the stencil of segment (of all segments if None) again on the next assemble().
+        """
+        if segment is None:
+            self._stencils.clear()
+        else:
+            self._stencils.pop(segment, None)
+        self._structure = None
+
+    def assemble(self):
+        """
+        Brings matrix and affine up to date with the tree.
+
+        @return: self
+        """
+        if self._structure == self.engine.structure and self.matrix is not None:
+            return self
+        voltage_tables = self.engine.voltage_tables
+        self.offsets = {}
+        self.n = 0
+        for key, table in voltage_tables.items():
+            self.offsets[key] = self.n
+            self.n += table.data.shape[-3] * table.data.shape[-1]
+        segments = list(self.engine.slice_ids)
+        stale = [segment for segment in segments
+                 if segment not in self._stencils or self._stencils[segment][0] != segment.length]
+        self._compute(stale)
+        self._stencils = {segment: self._stencils[segment] for segment in segments}
+        self.matrix, self.affine, self.positions = self._assemble(segments)
+        self._structure = self.engine.structure
+        return self
+
+    def index(self, segment) -> torch.Tensor:
+        """
+        Positions of the compartments of segment in the flat vector.
+        """
+        return self.base(segment) + torch.arange(segment.length)
+
+    def base(self, segment) -> int:
+        storage, row, start = segment.locate()
+        key = self.engine.storage_key(segment)
+        return self.offsets[key] + row * storage.data.shape[-1] + start
+
+    def gather(self, voltage_tables, channel: int = 0) -> torch.Tensor:
+        """
+        Flat vector (B, n) of a channel of all storages.
+        """
+        return torch.cat([_batched(table.data)[:, :, channel].reshape(_batched(table.data).shape[0], -1)
+                          for table in voltage_tables.values()], 1)
+
+    def scatter(self, voltage_tables, V: torch.Tensor):
+        """
+        Writes the flat vector V (B, n) back into the voltages of the storages.
+        """
+        for key, table in voltage_tables.items():
+            data = _batched(table.data)
+            size = data.shape[1] * data.shape[-1]
+            data[:, :, 0] = V[:, self.offsets[key]:self.offsets[key] + size].view(data.shape[0], data.shape[1], -1)
+
+    def step(self, voltage_tables):
+        """
+        One step of all storages, a single sparse matrix product for all replicas.
+        """
+        self.assemble()
+        V = self.gather(voltage_tables)
+        self.scatter(voltage_tables, torch.addmm(self.affine.unsqueeze(1), self.matrix, V.t()).t())
+
+    def _compute(self, segments):
+        by_key = {}
+        for segment in segments:
+            by_key.setdefault(self.engine.storage_key(segment), []).append(segment)
+        for key, group in by_key.items():
+            data = _batched(self.engine.voltage_tables[key].data)
+            lengths = torch.tensor([segment.length for segment in group], dtype=torch.long)
+            starts = torch.tensor([segment.locate()[1:] for segment in group], dtype=torch.long)
+            i, position = _local(lengths)
+            # (B, 4, compartments): dt / Cm, D / dx^2, gl, El
+            coefficients = data[:, :, 2:].transpose(1, 2)[:, :, starts[i, 0], starts[i, 1] + position]
+            if not torch.equal(coefficients, coefficients[:1].expand_as(coefficients)):
+                raise ValueError("The cable operator is shared by all replicas, their parameters must be equal")
+            dt_cm, d, gl, El = coefficients[0]
+            interior = ((position > 0) & (position < lengths[i] - 1)).float()
+            off = dt_cm * d * interior
+            leak = dt_cm * gl * interior
+            diagonal = 1 - 2 * off - leak
+            affine = leak * El
+            for segment, values in zip(group, zip(*(v.split(lengths.tolist()) for v in (off, diagonal, affine)))):
+                self._stencils[segment] = (segment.length, *values)
+            self.computed += len(group)
+
+    def _assemble(self, segments):
+        n = self.n
+        if segments:
+            lengths = torch.tensor([segment.length for segment in segments], dtype=torch.long)
+            bases = torch.tensor([self.base(segment) for segment in segments], dtype=torch.long)
+            i, position = _local(lengths)
+            positions = bases[i] + position
+            off, diagonal, affine = (torch.cat([self._stencils[segment][k] for segment in segments])
+                                     for k in (1, 2, 3))
+            interior = (position > 0) & (position < lengths[i] - 1)
+        else:
+            positions = torch.zeros(0, dtype=torch.long)
+            off = diagonal = affine = torch.zeros(0)
+            interior = torch.zeros(0, dtype=torch.bool)
+
+        # Stencil: tridiagonal on interior compartments, empty rows on boundary compartments, identity elsewhere
+        covered = torch.zeros(n, dtype=torch.bool)
+        covered[positions] = True
+        free = (~covered).nonzero().squeeze(1)
+        rows = positions[interior]
+        stencil_rows = torch.cat((rows, rows, rows, free))
+        stencil_cols = torch.cat((rows - 1, rows, rows + 1, free))
+        stencil_values = torch.cat((off[interior], diagonal[interior], off[interior], torch.ones(len(free))))
+        stencil = torch.sparse_coo_tensor(torch.stack((stencil_rows, stencil_cols)), stencil_values, (n, n))
+        stencil_affine = torch.zeros(n)
+        stencil_affine[positions] = affine
+
+        # Selection: boundary compartments take their neighbour, arms of a junction the mean of its inner compartments
+        source = torch.arange(n)
+        if segments:
+            first = bases
+            last = bases + lengths - 1
+            source[first] = first + 1
+            source[last] = last - 1
+        select_rows = torch.arange(n)
+        select_cols = source.clone()
+        select_values = torch.ones(n)
+        junctions = self.engine.junctions
+        if len(junctions):
+            keys, table_rows, inner, outer, arms, arm_junctions, counts = junctions.index(self.engine.voltage_tables)
+            inner_positions = torch.zeros(len(arm_junctions), dtype=torch.long)
+            outer_positions = torch.zeros(len(arm_junctions), dtype=torch.long)
+            for key, row, column_inner, column_outer, arm in zip(keys, table_rows, inner, outer, arms):
+                width = self.engine.voltage_tables[key].data.shape[-1]
+                inner_positions[arm] = self.offsets[key] + row * width + column_inner
+                outer_positions[arm] = self.offsets[key] + row * width + column_outer
+            # Every arm writes its outer then its inner compartment, outer ones first like boundary_branch. A
+            # compartment written twice (the same inner compartment of a short segment at both ends) keeps the last
+            targets = torch.cat((outer_positions, inner_positions))
+            order = torch.arange(len(targets))
+            last = torch.full((n,), -1, dtype=torch.long).scatter_reduce_(0, targets, order, 'amax')
+            writers = order[last[targets] == order]
+            writer_arms = writers % len(arm_junctions)
+            members = junction_members(arm_junctions, counts)[arm_junctions[writer_arms]]
+            valid = members < len(arm_junctions)
+            owners = writers.unsqueeze(1).expand_as(members)[valid]
+            weights = (1 / counts[arm_junctions[writer_arms]]).unsqueeze(1).expand_as(members)[valid]
+            keep = torch.ones(n, dtype=torch.bool)
+            keep[targets] = False
+            select_rows = torch.cat((select_rows[keep], targets[owners]))
+            select_cols = torch.cat((select_cols[keep], source[inner_positions[members[valid]]]))
+            select_values = torch.cat((select_values[keep], weights))
+        select = torch.sparse_coo_tensor(torch.stack((select_rows, select_cols)), select_values, (n, n))
+
+        with warnings.catch_warnings():
+            # CSR tensors warn that their support is in beta
+            warnings.simplefilter('ignore', UserWarning)
+            matrix = torch.sparse.mm(select, stencil).coalesce().to_sparse_csr()
+        return matrix, torch.sparse.mm(select, stencil_affine.unsqueeze(1)).squeeze(1), positions
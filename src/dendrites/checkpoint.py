@@ -0,0 +1,127 @@
+import json
+import os
+
+import numpy as np
+import torch
+
+from dendrites.packed_voltage_buffer import PackedVoltageBuffer
+from dendrites.segment import DendriteSegment
+from dendrites.voltage_cache_table import VoltageCacheTable
+
+META = 'meta.json'
+FORMAT = 2
+
+
+def _path(path, name):
+    return os.path.join(path, f'{name}.npy')
+
+
+def save(engine, path):
+    """
+    Writes the state of engine into the directory path: one .npy file per voltage storage with voltages and
+    coefficients as they are in memory, the rows of all segments in the parameter store, their slices and the
+    topology, so restore() reads every array back in one piece without recomputing coefficients.
+    """
+    os.makedirs(path, exist_ok=True)
+    segments = list(engine.slice_ids)
+    number = {segment: i for i, segment in enumerate(segments)}
+
+    ids = torch.tensor([segment._id for segment in segments], dtype=torch.long)
+    parameters = engine.parameters
+    np.save(_path(path, 'parameters'), parameters.values[ids].numpy())
+    np.save(_path(path, 'per_replica'), parameters.per_replica[ids].numpy())
+    slices = np.array([(segment.length, engine.storage_key(segment), engine.slice_ids[segment])
+                       for segment in segments], dtype=np.int64).reshape(-1, 3)
+    np.save(_path(path, 'slices'), slices)
+
+    tables = []
+    for key, storage in engine.voltage_tables.items():
+        np.save(_path(path, f'table_{key}'), storage.data.numpy())
+        tables.append(key)
+    if engine.packed:
+        buffer = engine.voltage_tables[0]
+        offsets = np.array([buffer.offsets[engine.slice_ids[segment]] for segment in segments],
+                           dtype=np.int64).reshape(-1, 2)
+        np.save(_path(path, 'offsets'), offsets)
+
+    members = [number[member] for segment, children in engine.branches for member in (segment, *children)]
+    np.save(_path(path, 'branch_members'), np.array(members, dtype=np.int64))
+    np.save(_path(path, 'branch_counts'), np.array([len(children) + 1 for _, children in engine.branches],
+                                                    dtype=np.int64))
+    meta = dict(format=FORMAT,
+                packed=engine.packed,
+                batch=engine.batch,
+                steps=engine.steps,
+                count=engine.count,
+                names=[segment.name for segment in segments],
+                tables=tables)
+    with open(os.path.join(path, META), 'w') as file:
+        json.dump(meta, file)
+
+
+def read_meta(path):
+    with open(os.path.join(path, META)) as file:
+        meta = json.load(file)
+    if meta['format'] != FORMAT:
+        raise ValueError(f"Unknown checkpoint format {meta['format']} in {path}")
+    return meta
+
+
+def restore(engine, path, mmap: bool = False):
+    """
+    Loads a checkpoint written by save() into engine, an empty engine created with the packed and batch settings of
+    read_meta(path).
+
+    @param mmap: Map the storages copy-on-write instead of reading them, pages are read when first touched
+    """
+    meta = read_meta(path)
+
+    def load(name):
+        return np.load(_path(path, name), mmap_mode='c' if mmap else None)
+
+    slices = np.load(_path(path, 'slices'))
+    ids = engine.parameters.append(torch.from_numpy(load('parameters')), torch.from_numpy(load('per_replica')),
+                                   torch.from_numpy(slices[:, 0]))
+    slices = slices.tolist()
+    segments = [DendriteSegment.handle(engine.parameters, i, name, length)
+                for i, name, (length, _, _) in zip(ids, meta['names'], slices)]
+
+    for key in meta['tables']:
+        data = torch.from_numpy(load(f'table_{key}'))
+        if engine.packed:
+            storage = engine.voltage_tables[key]
+        else:
+            storage = VoltageCacheTable(key, 0, engine.batch)
+            storage._free = set(range(data.shape[-3]))
+        storage._storage = storage.data = data
+        engine.voltage_tables[key] = storage
+        engine.voltage_cache_data[key] = data
+
+    if engine.packed:
+        buffer: PackedVoltageBuffer = engine.voltage_tables[0]
+        offsets = load('offsets').tolist()
+        buffer.end = buffer.data.shape[-1]
+        buffer._next = max((slice_index for _, _, slice_index in slices), default=-1) + 1
+        buffer._free = set(range(buffer._next))
+        buffer.holes = buffer.end - sum(length for _, length in offsets)
+        for slice_index, offset in zip((slice_index for _, _, slice_index in slices), offsets):
+            buffer.offsets[slice_index] = tuple(offset)
+    for segment, (_, key, slice_index) in zip(segments, slices):
+        storage = engine.voltage_tables[key]
+        storage.reserved[slice_index] = segment
+        storage._free.discard(slice_index)
+        segment.bind(storage, slice_index)
+        engine.slice_ids[segment] = slice_index
+        engine.segments.add(segment)
+    engine.count = meta['count']
+
+    members = load('branch_members').tolist()
+    start = 0
+    for count in load('branch_counts').tolist():
+        segment, *children = (segments[i] for i in members[start:start + count])
+        engine.junctions.add(segment, children)
+        engine.branches.append((segment, tuple(children)))
+        start += count
+    engine.steps = meta['steps']
+    engine._changed()
+    return segments
@@ -0,0 +1,183 @@
+from collections import defaultdict, deque
+from typing import Dict, List, Sequence, Tuple
+
+import torch
+
+from dendrites.exceptions import DendriteTopologyError
+
+
+class CompartmentGraph:
+    def __init__(self, voltage_tables: Dict[int, "VoltageCacheTable"], branches: Sequence[Tuple] = ()):
+        """
+        Interior compartments of all reserved segments as one tree of unknowns.
+
+        Boundary compartments (first and last of every segment) are not nodes, they are copies of their neighbours
+        set by the boundary strategy. Compartments coupled by a branch are merged into one node, since
+        boundary_branch sets all of them to the mean of the arm compartments next to the junction. Edges carry the
+        D / dx^2 coefficient of the compartment they start from, divided by the number of arms averaged into the
+        node. Nodes carry Cm, gl and El, averaged over merged compartments.
+
+        @param voltage_tables: Voltage storages of the engine (cache tables by segment length or the packed buffer)
+        @param branches: (segment, children) tuples of the engine
+        """
+        if any(table.batch for table in voltage_tables.values()):
+            raise ValueError("Compartment graphs are built for a single replica, not for an ensemble")
+        locations = {}
+        positions = []
+        capacitance = []
+        for key in sorted(voltage_tables):
+            table = voltage_tables[key]
+            for slice_index in sorted(table.reserved):
+                segment = table.reserved[slice_index]
+                row, start = table.locate(slice_index)
+                locations[segment] = (key, row, start, segment.length)
+                positions.extend((key, row, start + i) for i in range(1, segment.length - 1))
+                capacitance.extend([segment.Cm.item()] * (segment.length - 2))
+        position_ids = {position: i for i, position in enumerate(positions)}
+
+        union = list(range(len(positions)))
+
+        def find(i):
+            while union[i] != i:
+                union[i] = union[union[i]]
+                i = union[i]
+            return i
+
+        averaged = set()
+        for segment, children in branches:
+            key, row, start, length = locations[segment]
+            arms = [((key, row, start + length - 3), (key, row, start + length - 2))]
+            for child in children:
+                key, row, start, _ = locations[child]
+                arms.append(((key, row, start + 2), (key, row, start + 1)))
+            members = [position_ids[p] for arm in arms for p in arm if p in position_ids]
+            averaged.update(position_ids[arm[0]] for arm in arms if arm[0] in position_ids)
+            for member in members[1:]:
+                union[find(member)] = find(members[0])
+
+        roots = {}
+        node_of = [roots.setdefault(find(i), len(roots)) for i in range(len(positions))]
+        self.n = len(roots)
+
+        members = [0] * self.n
+        arms = [0] * self.n
+        for i in range(len(positions)):
+            members[node_of[i]] += 1
+            if i in averaged:
+                arms[node_of[i]] += 1
+
+        self.locations = locations
+        self._nodes = {position: node_of[i] for position, i in position_ids.items()}
+        self.index = {}
+        rows, cols, nodes = defaultdict(list), defaultdict(list), defaultdict(list)
+        for i, (key, row, col) in enumerate(positions):
+            rows[key].append(row)
+            cols[key].append(col)
+            nodes[key].append(node_of[i])
+        for key in rows:
+            self.index[key] = (torch.tensor(rows[key], dtype=torch.long),
+                               torch.tensor(cols[key], dtype=torch.long),
+                               torch.tensor(nodes[key], dtype=torch.long))
+        self.members = torch.tensor(members, dtype=torch.float)
+        self.Cm = torch.zeros(self.n, dtype=torch.float).index_add_(
+            0, torch.tensor(node_of, dtype=torch.long), torch.tensor(capacitance, dtype=torch.float)).div_(self.members)
+        self.gl = self.gather(voltage_tables, 4)
+        self.El = self.gather(voltage_tables, 5)
+
+        coefficients = defaultdict(float)
+        for i, (key, row, col) in enumerate(positions):
+            src = node_of[i]
+            A = voltage_tables[key].data[row, 3, col].item()
+            for neighbour in (col - 1, col + 1):
+                j = position_ids.get((key, row, neighbour))
+                if j is None or node_of[j] == src:
+                    continue
+                coefficients[(src, node_of[j])] += A / max(arms[src], 1)
+        edges = sorted(coefficients)
+        self.edge_src = torch.tensor([e[0] for e in edges], dtype=torch.long)
+        self.edge_dst = torch.tensor([e[1] for e in edges], dtype=torch.long)
+        self.edge_A = torch.tensor([coefficients[e] for e in edges], dtype=torch.float)
+        self._coefficients = coefficients
+        self._order(edges)
+
+    def _order(self, edges: List[Tuple[int, int]]):
+        """
+        Hines ordering: every connected tree is rooted at its centre and its nodes are grouped by depth, so
+        elimination can run level by level from the leaves towards the root.
+        """
+        adjacency = [[] for _ in range(self.n)]
+        for src, dst in edges:
+            if src < dst:
+                adjacency[src].append(dst)
+                adjacency[dst].append(src)
+
+        def bfs(start):
+            parent = {start: -1}
+            order = [start]
+            queue = deque([start])
+            while queue:
+                node = queue.popleft()
+                for neighbour in adjacency[node]:
+                    if neighbour == parent[node]:
+                        continue
+                    if neighbour in parent:
+                        raise DendriteTopologyError(f"Compartment {neighbour} closes a loop, branches must form a tree")
+                    parent[neighbour] = node
+                    order.append(neighbour)
+                    queue.append(neighbour)
+            return parent, order
+
+        self.parent = [-1] * self.n
+        self.depth = [0] * self.n
+        roots = []
+        visited = [False] * self.n
+        for start in range(self.n):
+            if visited[start]:
+                continue
+            _, order = bfs(start)
+            far_parent, far_order = bfs(order[-1])
+            path = [far_order[-1]]
+            while far_parent[path[-1]] != -1:
+                path.append(far_parent[path[-1]])
+            root = path[len(path) // 2]
+            parent, order = bfs(root)
+            roots.append(root)
+            for node in order:
+                visited[node] = True
+                self.parent[node] = parent[node]
+                if parent[node] != -1:
+                    self.depth[node] = self.depth[parent[node]] + 1
+
+        self.roots = torch.tensor(roots, dtype=torch.long)
+        levels = defaultdict(list)
+        for node in range(self.n):
+            if self.parent[node] != -1:
+                levels[self.depth[node]].append(node)
+        self.levels = [torch.tensor(levels[d], dtype=torch.long) for d in sorted(levels)]
+        self.level_parents = [torch.tensor([self.parent[node] for node in levels[d]], dtype=torch.long)
+                              for d in sorted(levels)]
+
+    def node(self, segment, i: int) -> int:
+        """
+        Node holding compartment i of segment, boundary compartments map to their interior neighbour.
+        """
+        key, row, start, length = self.locations[segment]
+        if i < 0:
+            i += length
+        return self._nodes[(key, row, start + min(max(i, 1), length - 2))]
+
+    def coefficient(self, src: int, dst: int) -> float:
+        return self._coefficients.get((src, dst), 0.0)
+
+    def gather(self, voltage_tables, channel: int = 0) -> torch.Tensor:
+        """
+        Voltages (or another channel) of all nodes, merged compartments are averaged.
+        """
+        V = torch.zeros(self.n, dtype=torch.float)
+        for key, (rows, cols, nodes) in self.index.items():
+            V.index_add_(0, nodes, voltage_tables[key].data[rows, channel, cols])
+        return V.div_(self.members)
+
+    def scatter(self, voltage_tables, V: torch.Tensor):
+        for key, (rows, cols, nodes) in self.index.items():
+            voltage_tables[key].data[rows, 0, cols] = V[nodes]
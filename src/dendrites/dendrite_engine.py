@@ -1,93 +1,587 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from contextlib import contextmanager
+
 import torch
 from config import MainConfig
 
+from dendrites import checkpoint
 from dendrites.boundary.boundary_context import BoundaryContext
+from dendrites.boundary.boundary_strategy_default import BoundaryStrategyDefault
+from dendrites.branch_junctions import BranchJunctions
+from dendrites.cable_operator import CableOperator
+from dendrites.exceptions import DendriteRadiusError
 from dendrites.forward.forward_context import ForwardContext
-from dendrites.segment import DendriteSegment
+from dendrites.forward.forward_strategy_default import ForwardStrategyDefault
+from dendrites.packed_voltage_buffer import PackedVoltageBuffer
+from dendrites.propagator import Propagator
+from dendrites.probe import Probe, probe_write_torchscript
+from dendrites.run_kernel import run_torchscript
+from dendrites.segment import DendriteSegment, D_many, coefficients_many, radius_many
+from dendrites.segment_parameters import COLUMNS, SegmentParameters
+from dendrites.steady_state import SteadyState
+from dendrites.stimulus import StimulusSchedule, apply_stimulus_torchscript, window
+from dendrites.trace_export import TraceExporter
 from dendrites.voltage_cache_table import VoltageCacheTable
 
 EXTEND_STEP = 128
+# Key of the packed buffer in voltage_tables, no segment has length 0
+PACKED = 0
+
+
+def _ragged(lengths: torch.Tensor):
+    """
+    Flattened positions of ragged rows with the given lengths: row number and position in the row of each element.
+    """
+    rows = torch.repeat_interleave(torch.arange(len(lengths)), lengths)
+    return rows, torch.arange(len(rows)) - torch.repeat_interleave(torch.cumsum(lengths, 0) - lengths, lengths)
+
+
+class EngineTransaction:
+    def __init__(self):
+        self.segments = []
+        self.grows = {}
+        self.branches = []
 
 
 class DendriteEngine:
     def __init__(self,
                  c: MainConfig,
                  forward_context: ForwardContext = None,
-                 boundary_context: BoundaryContext = None):
+                 boundary_context: BoundaryContext = None,
+                 packed: bool = False,
+                 batch: int = None):
+        """
+        @param packed: Keep all segments in one PackedVoltageBuffer instead of one VoltageCacheTable per length
+        @param batch: Ensemble of B independent replicas of the tree, advanced together by every forward(). Voltages
+            get a leading replica dimension (segment.V[b] is replica b) and segment parameters may be tensors of
+            shape (B,) with one value per replica
+        """
         self.c = c
+        self.packed = packed
+        self.batch = batch
+        # Every replica steps all rows of a table, so ensembles add fewer rows at a time
+        self._extend_step = EXTEND_STEP if batch is None else max(1, EXTEND_STEP // batch)
         self.segments = set()
         self.count = 0
         self.voltage_tables = {}
         self.voltage_cache_data = {}
         self.slice_ids = {}
-        self.branchesM = []
-        self.branchesL = []
-        self.branchesR = []
+        self.branches = []
+        self.junctions = BranchJunctions()
+        self.operator = CableOperator(self)
+        self._propagator = None
+        self._steady_state = None
+        self._transaction = None
+        self.structure = 0
+        self.steps = 0
+        self.stimulus = None
+        self._stimulus_index = None
+        self.probes = []
+        self._probe_index = {}
+        self.parameters = SegmentParameters(EXTEND_STEP)
+        self.parameters.on_change = self._parameters_changed
         self.forward_context = forward_context if forward_context is not None else ForwardContext(c)
         self.boundary_context = boundary_context if boundary_context is not None else BoundaryContext()
+        if packed:
+            self.voltage_tables[PACKED] = PackedVoltageBuffer(EXTEND_STEP, batch)
+            self.voltage_cache_data[PACKED] = self.voltage_tables[PACKED].data
+
+    def save(self, path):
+        """
+        Writes voltages, coefficients, segments and branches into the directory path, see checkpoint.save. Stimulus
+        schedules and probes are not saved.
+        """
+        checkpoint.save(self, path)
+
+    @classmethod
+    def load(cls, c: MainConfig, path, forward_context: ForwardContext = None, boundary_context: BoundaryContext = None,
+             mmap: bool = False):
+        """
+        Engine saved with save(), segments are in engine.slice_ids in the order they had when saved.
+
+        @param mmap: Map the voltage storages from the files copy-on-write instead of reading them at once
+        """
+        meta = checkpoint.read_meta(path)
+        engine = cls(c, forward_context, boundary_context, packed=meta['packed'], batch=meta['batch'])
+        checkpoint.restore(engine, path, mmap)
+        return engine
 
     def create_segment(self, *args, **kwargs) -> DendriteSegment:
-        segment = DendriteSegment(*args, **kwargs)
+        segment = DendriteSegment(*args, **kwargs, parameters=self.parameters)
         self.add_segment(segment)
         return segment
 
+    def create_segments(self, names, lengths, **parameters):
+        """
+        Creates and adds many segments at once, writing every parameter of all of them to the parameter store with
+        one indexed copy.
+
+        @param names: Name of every segment
+        @param lengths: Length of every segment
+        @param parameters: dx, dt, r0, k, gl, El, Cm and Ra, each a scalar for all segments, (n,) with one value per
+            segment or (n, B) with one value per segment and replica
+        @return: New segments
+        """
+        lengths = torch.as_tensor(lengths, dtype=torch.long)
+        missing = set(COLUMNS) - set(parameters)
+        if missing:
+            raise ValueError(f"Missing parameters {', '.join(sorted(missing))}")
+        ids = self.parameters.allocate(len(lengths))
+        for name in COLUMNS:
+            self.parameters.set(ids, name, parameters[name])
+        self.parameters.lengths[ids.start:ids.stop] = lengths
+        radius = self.parameters.radius(ids)
+        if (radius <= 0).any():
+            i = int((radius <= 0).nonzero()[0, 0])
+            raise DendriteRadiusError(f"Radius at length {int(lengths[i])} is {radius[i]}")
+        segments = [DendriteSegment.handle(self.parameters, i, name, length)
+                    for i, name, length in zip(ids, names, lengths.tolist())]
+        self.add_segments(segments)
+        return segments
+
+    def radii(self, segments=None) -> torch.Tensor:
+        """
+        Radius at their current length of segments (all segments of the engine if None), in one vectorized call.
+        """
+        segments = list(self.slice_ids) if segments is None else segments
+        return self.parameters.radius([segment._id for segment in segments])
+
     def add_segment(self, segment: DendriteSegment):
-        LEN = segment.length
-        slice_id = self.reserve_slice(segment, LEN)
-        self.slice_ids[segment] = slice_id
-        self.segments.add(segment)
+        self.add_segments([segment])
+
+    def add_segments(self, segments):
+        """
+        Adds segments with one capacity check per storage, so a storage is reallocated at most once.
+        """
+        if self._transaction is not None:
+            self._transaction.segments.extend(segments)
+            return
+        by_key = defaultdict(list)
+        for segment in segments:
+            segment.move_parameters(self.parameters)
+            by_key[self.storage_key(segment)].append(segment)
+        for key, group in by_key.items():
+            self._ensure(key, [segment.length for segment in group])
+            by_length = defaultdict(list)
+            for segment in group:
+                by_length[segment.length].append(segment)
+            # Coefficients of all segments with the same length computed and written at once
+            for length, same in by_length.items():
+                coefficients = coefficients_many(same, length)
+                if self.packed:
+                    slices = self.voltage_tables[PACKED].reserve_slices(same, length, coefficients)
+                    self.voltage_cache_data[PACKED] = self.voltage_tables[PACKED].data
+                else:
+                    slices = self.voltage_tables[key].reserve_slices(same, coefficients)
+                self.slice_ids.update(zip(same, slices))
+                self.segments.update(same)
+                self.count += len(same)
+        self._changed()
 
     def reserve_slice(self, segment: DendriteSegment, LEN):
-        if LEN not in self.voltage_tables:
-            cache_table = VoltageCacheTable(LEN, EXTEND_STEP)
-            self.voltage_tables[LEN] = cache_table
-            self.voltage_cache_data[LEN] = cache_table.data
-        if not self.voltage_tables[LEN].free:
-            self.voltage_tables[LEN].extend(EXTEND_STEP)
-            self.voltage_cache_data[LEN] = self.voltage_tables[LEN].data
-        slice_id = self.voltage_tables[LEN].reserve_slice(segment)
-        self.forward_context.strategy.cache_clear()
+        key = PACKED if self.packed else LEN
+        self._ensure(key, [LEN])
+        slice_id = self._reserve(segment, LEN)
+        self._changed()
+        return slice_id
+
+    def _ensure(self, key, lengths):
+        """
+        Makes room for segments of the given lengths in storage key, reallocating it at most once.
+        """
+        if self.packed:
+            storage = self.voltage_tables[PACKED]
+            generation = storage.generation
+            storage.ensure(sum(lengths))
+        else:
+            if key not in self.voltage_tables:
+                self.voltage_tables[key] = VoltageCacheTable(key, max(self._extend_step, len(lengths)), self.batch)
+            storage = self.voltage_tables[key]
+            generation = storage.generation
+            if storage.free < len(lengths):
+                storage.extend(max(self._extend_step, len(lengths) - storage.free))
+        self.voltage_cache_data[key] = storage.data
+        if storage.generation != generation:
+            self._bind_branches()
+
+    def _reserve(self, segment: DendriteSegment, LEN, D: torch.Tensor = None):
+        if self.packed:
+            slice_id = self.voltage_tables[PACKED].reserve_slice(segment, LEN, D)
+            self.voltage_cache_data[PACKED] = self.voltage_tables[PACKED].data
+        else:
+            slice_id = self.voltage_tables[LEN].reserve_slice(segment, D)
         self.count += 1
         return slice_id
 
     def free_slice(self, slice_id, LEN):
-        self.voltage_tables[LEN].free_slice(slice_id)
-        if len(self.voltage_tables[LEN].reserved) == 0:
-            del self.voltage_tables[LEN]
+        self._free(slice_id, LEN)
+        self._changed()
+
+    def _free(self, slice_id, LEN):
+        if self.packed:
+            self.voltage_tables[PACKED].free_slice(slice_id)
+        else:
+            self.voltage_tables[LEN].free_slice(slice_id)
+            if len(self.voltage_tables[LEN].reserved) == 0:
+                del self.voltage_tables[LEN]
+                del self.voltage_cache_data[LEN]
+
+    def storage_key(self, segment: DendriteSegment):
+        """
+        Key of the storage holding segment in voltage_tables.
+        """
+        return PACKED if self.packed else segment.length
+
+    def set_parameters(self, segment: DendriteSegment, **parameters):
+        """
+        Changes biophysical parameters of segment, see DendriteSegment.set_parameters.
+        """
+        segment.set_parameters(**parameters)
+
+    def _parameters_changed(self, segment: DendriteSegment):
+        """
+        on_change of the parameter store: the coefficients of segment were rewritten.
+        """
+        self.operator.invalidate(segment)
+        self._changed()
 
     def grow(self, segment: DendriteSegment):
+        if self._transaction is not None:
+            return self.grow_many([segment])[0]
         old_length = segment.length
         new_length = segment.length + 1
         old_slice_id = self.slice_ids[segment]
+        old_key = self.storage_key(segment)
+        old_V = segment.V.clone()
         new_slice_id = self.reserve_slice(segment, new_length)
-        self.voltage_tables[new_length].data[new_slice_id, 0, :old_length] = self.voltage_cache_data[old_length][
-            old_slice_id, 0]
-        self.voltage_tables[new_length].data[new_slice_id, 0, -1] = self.voltage_cache_data[new_length][
-            new_slice_id, 0, -2]
-        self.free_slice(old_slice_id, segment.length)
+        segment.V[..., :old_length] = old_V
+        segment.V[..., -1] = segment.V[..., -2]
+        self.free_slice(old_slice_id, old_key)
         self.slice_ids[segment] = new_slice_id
         segment.set_length(new_length)
+        self._bind_branches(segment)
         return new_length
 
-    def add_branch(self, segment: DendriteSegment, segment_L: DendriteSegment, segment_R: DendriteSegment):
-        self.branchesM.append(segment.V[-3:-1])
-        self.branchesL.append(segment_L.V[1:3])
-        self.branchesR.append(segment_R.V[1:3])
+    def grow_many(self, segments, deltas=1):
+        """
+        Grows segments by deltas compartments each (one int for all or one per segment). New compartments copy
+        the last one. A segment given more than once grows by the sum of its deltas, inside a transaction or not. Destination storages are reallocated at most once and voltages move with one gather/scatter
+        per pair of source and destination table (one for the whole packed buffer).
+
+        @return: New lengths
+        """
+        if isinstance(deltas, int):
+            deltas = [deltas] * len(segments)
+        if any(delta < 0 for delta in deltas):
+            raise ValueError("Segments can only grow")
+        if self._transaction is not None:
+            grows = self._transaction.grows
+            for segment, delta in zip(segments, deltas):
+                grows[segment] = grows.get(segment, 0) + delta
+            return [segment.length + grows[segment] for segment in segments]
+
+        total = {}
+        for segment, delta in zip(segments, deltas):
+            total[segment] = total.get(segment, 0) + delta
+        new_lengths = [segment.length + total[segment] for segment in segments]
+        moves = [(segment, segment.length + delta) for segment, delta in total.items() if delta]
+        if not moves:
+            return new_lengths
+        radius = radius_many([segment for segment, _ in moves], [new_length for _, new_length in moves])
+        if (radius <= 0).any():
+            i = int((radius <= 0).nonzero()[0, 0])
+            raise DendriteRadiusError(f"Radius at length {moves[i][1]} is {radius[i]}")
+
+        by_key = defaultdict(list)
+        for segment, new_length in moves:
+            by_key[PACKED if self.packed else new_length].append((segment, new_length))
+        for key, group in by_key.items():
+            self._ensure(key, [new_length for _, new_length in group])
+
+        old_slices = []
+        for key, group in by_key.items():
+            target = self.voltage_tables[key]
+            D = D_many([segment for segment, _ in group], max(new_length for _, new_length in group))
+            pairs = defaultdict(lambda: ([], [], [], [], [], []))
+            for (segment, new_length), D_segment in zip(group, D):
+                old_key = self.storage_key(segment)
+                old_slices.append((segment, new_length, self.slice_ids[segment], old_key))
+                old_row, old_start = self.voltage_tables[old_key].locate(self.slice_ids[segment])
+                self.slice_ids[segment] = self._reserve(segment, new_length, D_segment[..., :new_length])
+                new_row, new_start = target.locate(self.slice_ids[segment])
+                for values, value in zip(pairs[old_key], (old_row, old_start, segment.length,
+                                                          new_row, new_start, new_length)):
+                    values.append(value)
+            for old_key, index in pairs.items():
+                old_rows, old_starts, old_lengths, new_rows, new_starts, new_lengths_ = (
+                    torch.tensor(values, dtype=torch.long) for values in index)
+                i, position = _ragged(new_lengths_)
+                src = self.voltage_tables[old_key].data[..., 0, :]
+                dst = target.data[..., 0, :]
+                dst[..., new_rows[i], new_starts[i] + position] = src[
+                    ..., old_rows[i], old_starts[i] + torch.minimum(position, old_lengths[i] - 1)]
+
+        for segment, new_length, old_slice, old_key in old_slices:
+            self._free(old_slice, old_key)
+            # Radius at new_length is checked above for all segments at once
+            segment.length = new_length
+            self._bind_branches(segment)
+        self._changed()
+        return new_lengths
+
+    @contextmanager
+    def transaction(self):
+        """
+        Queues add_segment, grow, grow_many and add_branch until the block ends, then applies them in bulk: storages
+        are reallocated and caches cleared once. Segments added inside the block have no voltages until then, and
+        nothing is applied if the block raises, the parameter rows of the segments created in it are freed.
+        """
+        if self._transaction is not None:
+            yield self._transaction
+            return
+        self._transaction = EngineTransaction()
+        try:
+            yield self._transaction
+        except BaseException:
+            transaction, self._transaction = self._transaction, None
+            self.parameters.free_rows([segment._id for segment in transaction.segments
+                                       if segment._parameters is self.parameters])
+            raise
+        transaction, self._transaction = self._transaction, None
+        self.add_segments(transaction.segments)
+        self.grow_many(list(transaction.grows), list(transaction.grows.values()))
+        for segment, *children in transaction.branches:
+            self.junctions.add(segment, children)
+            self.branches.append((segment, tuple(children)))
+        if transaction.branches:
+            self._changed()
+
+    def add_branch(self, segment: DendriteSegment, *children: DendriteSegment):
+        """
+        Joins the end of segment to the start of every child, with any number of children.
+        """
+        if not children:
+            raise ValueError("A branch needs at least one child segment")
+        if self._transaction is not None:
+            self._transaction.branches.append((segment, *children))
+            return
+        self.junctions.add(segment, children)
+        self.branches.append((segment, children))
+        self._changed()
+
+    def _bind_branches(self, segment: DendriteSegment = None):
+        """
+        Locates branch arms again after segments moved or their storage was reallocated.
+
+        @param segment: Only the branches of this segment
+        """
+        self.junctions.move(segment)
+
+    def _changed(self):
+        """
+        Segments were added, moved or changed, indices and factorizations cached for the old tree are rebuilt.
+        """
+        self.structure += 1
+        self.forward_context.strategy.cache_clear()
+
+    def set_stimulus(self, schedule: StimulusSchedule = None):
+        """
+        Inputs applied before every step by forward() and run(), None to remove them.
+        """
+        self.stimulus = schedule
+        self._stimulus_index = None
+
+    def _compiled_stimulus(self):
+        version = (self.structure, self.stimulus.version)
+        if self._stimulus_index is None or self._stimulus_index[0] != version:
+            compiled = self.stimulus.compile(self.voltage_tables, self.batch)
+            self._stimulus_index = (version, compiled, {key: steps.tolist() for key, (steps, *_) in compiled.items()})
+        return self._stimulus_index[1], self._stimulus_index[2]
+
+    def add_probe(self, probe: Probe) -> Probe:
+        """
+        Records the probe after every probe.every-th step of forward() and run(). Probed segments may grow, the
+        probe then records their new compartments as well, see Probe.compile.
+        """
+        self.probes.append(probe)
+        return probe
+
+    def remove_probe(self, probe: Probe):
+        self.probes.remove(probe)
+        self._probe_index.pop(probe, None)
+
+    def export_traces(self, path, segments=None, *, n_steps: int, every: int = 1,
+                      capacity: int = 1024) -> TraceExporter:
+        """
+        Streams voltages of segments to memory-mapped files in path during the next n_steps steps, see TraceExporter.
+        Call close() on the returned exporter when done, read the files with load_traces(path).
+        """
+        return TraceExporter(self, path, segments, n_steps, every=every, capacity=capacity)
+
+    def _compiled_probe(self, probe: Probe):
+        if probe not in self._probe_index or self._probe_index[probe][0] != self.structure:
+            self._probe_index[probe] = (self.structure, probe.compile(self.voltage_tables, self.batch))
+        return self._probe_index[probe][1]
 
     def forward(self):
+        self._forward_stimulus()
         self._forward_core()
-        self._forward_boundary()
-        self._forward_branch()
+        if not self.forward_context.strategy.applies_boundaries:
+            self._forward_boundary()
+            self._forward_branch()
+        self.steps += 1
+        self._forward_probes()
+
+    def run(self, n_steps: int, stimuli=(), record=()):
+        """
+        Same as calling forward() n_steps times. With the default strategies the whole loop, stimuli and probes
+        included, runs as one scripted kernel instead of three scripted calls per step. Inputs of the engine's
+        stimulus schedule due during the run are applied and its probes record as well.
+
+        @param n_steps: Number of steps
+        @param stimuli: (segment, i, values) tuples, values[step] is added before every step like segment.signal(i, ...),
+            values of shape (n_steps, B) give every replica of an ensemble its own stimulus
+        @param record: Segments whose voltages are recorded after every step
+        @return: Dict segment -> tensor (n_steps, segment.length), (n_steps, B, segment.length) for an ensemble, with
+            recorded voltages
+        """
+        if (type(self.forward_context.strategy) is not ForwardStrategyDefault
+                or type(self.boundary_context.boundary_strategy) is not BoundaryStrategyDefault):
+            return self._run_forward(n_steps, stimuli, record)
+
+        if stimuli:
+            schedule = StimulusSchedule(self.c)
+            if self.stimulus is not None:
+                schedule.extend(self.stimulus)
+            for segment, i, values in stimuli:
+                schedule.add_waveform(segment, i, torch.as_tensor(values, dtype=torch.float)[:n_steps], self.steps)
+            compiled = schedule.compile(self.voltage_tables, self.batch)
+        elif self.stimulus is not None:
+            compiled, _ = self._compiled_stimulus()
+        else:
+            compiled = {}
+        probes = list(self.probes)
+        if record:
+            recorder = Probe(record, capacity=max(n_steps, 1))
+            self._compiled_probe(recorder)
+            probes.append(recorder)
+
+        done = 0
+        while done < n_steps:
+            # Probes with a sink are flushed when full, so a chunk ends when the first of them fills up
+            n = n_steps - done
+            for probe in probes:
+                if probe.sink is not None:
+                    if probe.pending == probe.capacity:
+                        probe.flush()
+                    free = probe.capacity - probe.pending
+                    n = min(n, (self.steps // probe.every + free) * probe.every - self.steps)
+            self._run_fused(n, compiled, probes)
+            done += n
+        if not record:
+            return {}
+        self._probe_index.pop(recorder)
+        _, values = recorder.flush()
+        return {segment: recorder.segment_values(values, segment) for segment in record}
+
+    def advance(self, t: float) -> int:
+        """
+        Advances by time t, a multiple of DT, jumping from input to input with powers of the cable operator instead
+        of stepping every DT, see Propagator. Results match run() with the default strategies up to rounding.
+
+        @return: Number of steps of DT advanced
+        """
+        if self._propagator is None:
+            self._propagator = Propagator(self)
+        return self._propagator.advance(t)
+
+    def steady_state(self) -> SteadyState:
+        """
+        Direct steady-state, input resistance and attenuation solver of the current tree, factorized once per change
+        of the tree, see SteadyState.
+        """
+        if self._steady_state is None or self._steady_state[0] != self.structure:
+            self._steady_state = (self.structure, SteadyState(self))
+        return self._steady_state[1]
+
+    def _run_fused(self, n_steps: int, compiled, probes):
+        table_ids = {key: i for i, key in enumerate(self.voltage_tables)}
+        probe_groups = []
+        groups = ([], [], [], [])
+        for probe in probes:
+            keys, rows, cols, columns = self._compiled_probe(probe)
+            probe_groups.append(list(range(len(groups[0]), len(groups[0]) + len(keys))))
+            for values, value in zip(groups, ([table_ids[key] for key in keys], rows, cols, columns)):
+                values.extend(value)
+
+        buffer = self.voltage_tables[PACKED] if self.packed else None
+        keys, rows, inner, outer, arms, junctions, counts = self.junctions.index(self.voltage_tables)
+        run_torchscript([table.data for table in self.voltage_tables.values()], n_steps, self.steps,
+                        table_ids.get(PACKED, -1),
+                        buffer.first if buffer is not None else None,
+                        buffer.last if buffer is not None else None,
+                        [table_ids[key] for key in keys], rows, inner, outer, arms, junctions, counts,
+                        [table_ids[key] for key in compiled],
+                        [window(steps, self.steps, n_steps) for steps, _, _, _ in compiled.values()],
+                        [rows for _, rows, _, _ in compiled.values()], [cols for _, _, cols, _ in compiled.values()],
+                        [amplitudes for _, _, _, amplitudes in compiled.values()],
+                        [probe.values for probe in probes], [probe.steps for probe in probes],
+                        [probe.every for probe in probes], [probe.count for probe in probes], probe_groups, *groups)
+        for probe in probes:
+            probe.count += (self.steps + n_steps) // probe.every - self.steps // probe.every
+        self.steps += n_steps
+
+    def _run_forward(self, n_steps: int, stimuli, record):
+        batch = () if self.batch is None else (self.batch,)
+        recorded = {segment: torch.zeros((n_steps, *batch, segment.length), dtype=torch.float) for segment in record}
+        for step in range(n_steps):
+            for segment, i, values in stimuli:
+                segment.signal(i, values[step:step + 1])
+            self.forward()
+            for segment in record:
+                recorded[segment][step] = segment.V
+        return recorded
 
     def _forward_boundary(self):
-        self.boundary_context.boundary_strategy.boundary(self.voltage_cache_data)
+        if self.packed:
+            buffer = self.voltage_tables[PACKED]
+            self.boundary_context.boundary_strategy.boundary_packed(buffer.data, buffer.first, buffer.last)
+        else:
+            self.boundary_context.boundary_strategy.boundary(self.voltage_cache_data)
 
     def _forward_branch(self):
-        if self.branchesM and self.branchesL and self.branchesR:
-            self.boundary_context.boundary_strategy.boundary_branch(self.branchesM, self.branchesL, self.branchesR)
+        if self.forward_context.strategy.solves_branches:
+            return
+        if len(self.junctions):
+            keys, rows, inner, outer, arms, junctions, counts = self.junctions.index(self.voltage_tables)
+            self.boundary_context.boundary_strategy.boundary_branch([self.voltage_cache_data[key] for key in keys],
+                                                                    rows, inner, outer, arms, junctions, counts)
+
+    def _forward_stimulus(self):
+        if self.stimulus is None:
+            return
+        compiled, steps = self._compiled_stimulus()
+        for key, (_, rows, cols, amplitudes) in compiled.items():
+            lo, hi = bisect_left(steps[key], self.steps), bisect_right(steps[key], self.steps)
+            if hi > lo:
+                apply_stimulus_torchscript(self.voltage_cache_data[key], rows[lo:hi], cols[lo:hi], amplitudes[lo:hi])
+
+    def _forward_probes(self):
+        for probe in self.probes:
+            if self.steps % probe.every:
+                continue
+            if probe.sink is not None and probe.pending == probe.capacity:
+                probe.flush()
+            keys, rows, cols, columns = self._compiled_probe(probe)
+            probe_write_torchscript([self.voltage_cache_data[key] for key in keys], list(range(len(keys))),
+                                    list(range(len(keys))), rows, cols, columns, probe.values, probe.steps,
+                                    probe.count % probe.capacity, self.steps)
+            probe.count += 1
 
     def _forward_core(self):
-        self.forward_context.forward(self.voltage_tables)
+        self.forward_context.forward(self.voltage_tables, branches=self.branches, junctions=self.junctions,
+                                     operator=self.operator)
 
     def log_to_tensorboard(self, writer, step):
         for segment in self.segments:
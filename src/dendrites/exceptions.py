@@ -8,3 +8,7 @@ class DendriteCacheFull(BaseException):
 
 class DendriteRadiusError(BaseException):
     pass
+
+
+class DendriteTopologyError(BaseException):
+    pass
@@ -1,8 +1,26 @@
 from abc import ABC, abstractmethod
 from config import *
 
+# Arguments the strategies took before dx, dt, gl, El and Cm became parameters of the segments
+SEGMENT_PARAMETERS = ('dx', 'dt', 'gl', 'El', 'Cm')
+
+
+def reject_segment_parameters(strategy: str, kwargs: dict):
+    """
+    Raises TypeError for arguments of strategy in kwargs that are segment parameters now, instead of ignoring them.
+    """
+    given = [name for name in SEGMENT_PARAMETERS if name in kwargs]
+    if given:
+        raise TypeError(f"{strategy} does not take {', '.join(given)} any more, they are parameters of the "
+                        f"segments, see DendriteEngine.set_parameters")
+
 
 class ForwardStrategyABC(ABC):
+    # Strategies that couple branch points themselves tell the engine to skip boundary_branch
+    solves_branches = False
+    # Strategies that set boundary compartments and branch points within their step tell the engine to skip both
+    applies_boundaries = False
+
     @staticmethod
     @abstractmethod
     def forward(*args, **kwargs):
@@ -0,0 +1,158 @@
+import warnings
+from typing import List
+
+import torch
+from torch import Tensor
+
+from config import *
+from dendrites.boundary.boundary_strategy_default import boundary_branch_torchscript, boundary_packed_torchscript, \
+    boundary_torchscript
+from dendrites.forward.forward_strategy_abc import ForwardStrategyABC
+from dendrites.forward.forward_strategy_default import ForwardStrategyDefault
+from dendrites.packed_voltage_buffer import PackedVoltageBuffer
+
+
+def junction_members(junctions: Tensor, counts: Tensor) -> Tensor:
+    """
+    Arms of every junction (junctions, most arms), padded with the number of arms.
+    """
+    order = torch.argsort(junctions, stable=True)
+    starts = torch.cumsum(counts.long(), 0) - counts.long()
+    members = torch.full((len(counts), int(counts.max().item()) if len(counts) else 0), len(junctions),
+                         dtype=torch.long)
+    members[junctions[order], torch.arange(len(order)) - starts[junctions[order]]] = order
+    return members
+
+
+def junction_mean(values: Tensor, junctions: Tensor, counts: Tensor, members: Tensor) -> Tensor:
+    """
+    Mean of values (B, arms) over the arms of each junction, for every arm. Gathers the arms of every junction
+    instead of a scatter-add, which Inductor fuses with the gather of its result and reads partial sums.
+    """
+    padded = torch.cat((values, values.new_zeros((values.shape[0], 1))), 1)
+    return (padded[:, members].sum(-1) / counts)[:, junctions]
+
+
+def step(voltages: List[Tensor], packed: int, first: Tensor, last: Tensor, branch_ids: List[int], rows: List[Tensor],
+         inner: List[Tensor], outer: List[Tensor], arms: List[Tensor], junctions: Tensor, counts: Tensor,
+         members: Tensor):
+    """
+    One explicit Euler step of all storages followed by their boundary compartments and branch points, the same
+    arithmetic as ForwardStrategyDefault.update_voltages, boundary_torchscript (boundary_packed_torchscript for the
+    storage at index packed) and boundary_branch_torchscript. Plain PyTorch so that torch.compile traces it as a
+    whole; branch_ids[i] is the index in voltages of the storage of the arms arms[i] and members comes from
+    junction_members.
+    """
+    batched = [voltage if voltage.dim() == 4 else voltage.unsqueeze(0) for voltage in voltages]
+    # New voltages are built out of place and written back once, in-place updates of views of the inputs chained
+    # through indexing are not always ordered correctly by the compiler
+    updated = []
+    for i, data in enumerate(batched):
+        V = data[:, :, 0]
+        V = V[..., 1:-1] + data[:, :, 2, 1:-1] * (
+            data[:, :, 3, 1:-1] * (V[..., 0:-2] - 2 * V[..., 1:-1] + V[..., 2:]) - data[:, :, 4, 1:-1] * (
+                V[..., 1:-1] - data[:, :, 5, 1:-1])
+        )
+        if i == packed:
+            V = torch.cat((data[:, :, 0, :1], V, data[:, :, 0, -1:]), -1)
+            V[:, 0, first] = V[:, 0, first + 1]
+            V[:, 0, last] = V[:, 0, last - 1]
+        else:
+            V = torch.cat((V[..., :1], V, V[..., -1:]), -1)
+        updated.append(V)
+
+    if len(branch_ids) > 0:
+        B = batched[0].shape[0]
+        values = torch.zeros((B, junctions.shape[0]), dtype=counts.dtype)
+        for i, j in enumerate(branch_ids):
+            values[:, arms[i]] = updated[j][:, rows[i], inner[i]]
+        mean_value = junction_mean(values, junctions, counts, members)
+        I = mean_value - values
+        values = values + (I - junction_mean(I, junctions, counts, members))
+        for i, j in enumerate(branch_ids):
+            updated[j][:, rows[i], outer[i]] = mean_value[:, arms[i]]
+            updated[j][:, rows[i], inner[i]] = values[:, arms[i]]
+
+    for data, V in zip(batched, updated):
+        data[:, :, 0] = V
+
+
+def step_torchscript(voltages: List[Tensor], packed: int, first: Tensor, last: Tensor, branch_ids: List[int],
+                     rows: List[Tensor], inner: List[Tensor], outer: List[Tensor], arms: List[Tensor],
+                     junctions: Tensor, counts: Tensor, members: Tensor):
+    """
+    Same as step with the scripted functions of the default strategies, the path of forward() without this strategy.
+    """
+    for i, data in enumerate(voltages):
+        ForwardStrategyDefault.update_voltages(data)
+    if packed >= 0:
+        boundary_packed_torchscript(voltages[packed], first, last)
+    else:
+        boundary_torchscript({i: data for i, data in enumerate(voltages)})
+    if branch_ids:
+        boundary_branch_torchscript([voltages[j] for j in branch_ids], rows, inner, outer, arms, junctions, counts)
+
+
+class ForwardStrategyCompiled(ForwardStrategyABC):
+    __slots__ = ('options', 'compiled', '_step', '_verified', '_members')
+    solves_branches = True
+    applies_boundaries = True
+
+    def __init__(self, c, *, mode: str = None, dynamic: bool = None, **kwargs):
+        """
+        Explicit Euler step, boundary compartments and branch points in one function compiled with torch.compile
+        (Inductor on CPU), which fuses the stencil and the boundary copies of every storage into one loop nest
+        instead of three scripted calls per step and one forked task per table.
+
+        The first steps compile the step for the current shapes and again after the tree grows, Inductor needs a C++
+        compiler for CPU. Where torch.compile is missing or compiling fails the strategy warns once and runs the
+        scripted path of ForwardStrategyDefault and BoundaryStrategyDefault instead, compiled tells which one runs.
+        Results match the default strategies up to floating point reassociation by the compiler.
+
+        @param mode: Mode passed to torch.compile, e.g. 'max-autotune-no-cudagraphs'
+        @param dynamic: Passed to torch.compile, None lets it mark sizes dynamic once they change
+        """
+        super().__init__()
+        self.options = dict(mode=mode, dynamic=dynamic)
+        self.compiled = hasattr(torch, 'compile')
+        self._step = torch.compile(step, **self.options) if self.compiled else step_torchscript
+        # Set after the first compiled step ran, failures after it are not compiler failures
+        self._verified = False
+        # Junctions index tensor -> junction_members of it, rebuilt when the junctions change
+        self._members = (None, None)
+
+    def cache_clear(self):
+        self._members = (None, None)
+
+    def forward(self, voltage_tables, junctions=None, **kwargs):
+        keys = list(voltage_tables)
+        ids = {key: i for i, key in enumerate(keys)}
+        packed = next((i for i, key in enumerate(keys) if isinstance(voltage_tables[key], PackedVoltageBuffer)), -1)
+        first = last = torch.zeros(0, dtype=torch.long)
+        if packed >= 0:
+            first, last = voltage_tables[keys[packed]].first, voltage_tables[keys[packed]].last
+        branch_ids, rows, inner, outer, arms = [], [], [], [], []
+        junction, counts, members = torch.zeros(0, dtype=torch.long), torch.zeros(0), torch.zeros((0, 0))
+        if junctions is not None and len(junctions):
+            branch_keys, rows, inner, outer, arms, junction, counts = junctions.index(voltage_tables)
+            branch_ids = [ids[key] for key in branch_keys]
+            if self._members[0] is not junction:
+                self._members = (junction, junction_members(junction, counts))
+            members = self._members[1]
+        arguments = ([voltage_tables[key].data for key in keys], packed, first, last, branch_ids, rows, inner, outer,
+                     arms, junction, counts, members)
+        if self._verified or not self.compiled:
+            self._step(*arguments)
+            return
+        try:
+            self._step(*arguments)
+        except Exception as error:
+            warnings.warn(f"torch.compile failed, running the scripted step instead: {error}", RuntimeWarning)
+            self.compiled = False
+            self._step = step_torchscript
+            self._step(*arguments)
+            return
+        self._verified = True
+
+    def __str__(self):
+        return "Compiled" if self.compiled else "Compiled (scripted fallback)"
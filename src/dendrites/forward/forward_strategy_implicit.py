@@ -0,0 +1,200 @@
+import math
+from typing import List
+
+import torch
+
+from config import *
+from dendrites.compartment_graph import CompartmentGraph
+from dendrites.forward.forward_strategy_abc import ForwardStrategyABC, reject_segment_parameters
+
+GAMMA = 2 - math.sqrt(2)
+
+# Implicit weight of each method, the system solved every stage is (I - weight * dt / Cm * A)
+THETA = {
+    'backward_euler': 1.0,
+    'crank_nicolson': 0.5,
+    'tr_bdf2': GAMMA / 2,
+}
+
+# Below this many nodes per level on average the solve runs node by node instead of level by level
+SERIAL_WIDTH = 32
+
+
+@torch.jit.script
+def hines_solve(rhs: torch.Tensor,
+                diag: torch.Tensor,
+                roots: torch.Tensor,
+                levels: List[torch.Tensor],
+                parents: List[torch.Tensor],
+                lower: List[torch.Tensor],
+                upper: List[torch.Tensor]):
+    """
+    Solves a factorized tree system level by level, leaves first, then back-substitutes from the roots. rhs is (n,)
+    or (n, k) with k right-hand sides solved together.
+    """
+    shape = [-1] + [1] * (rhs.dim() - 1)
+    for i in range(len(levels) - 1, -1, -1):
+        rhs.index_add_(0, parents[i], -lower[i].view(shape) * rhs[levels[i]])
+    x = torch.empty_like(rhs)
+    x[roots] = rhs[roots] / diag[roots].view(shape)
+    for i in range(len(levels)):
+        x[levels[i]] = (rhs[levels[i]] - upper[i].view(shape) * x[parents[i]]) / diag[levels[i]].view(shape)
+    return x
+
+
+def hines_factorize(graph: CompartmentGraph, scale: torch.Tensor, shift: float = 1.0):
+    """
+    Eliminates the tree matrix shift * I + scale * (gl - A), scale per node, from the leaves to the roots. The tree
+    has no fill-in, so the factorization is the eliminated diagonal plus one lower and one upper factor per non-root
+    node, in the dtype of scale.
+    """
+    diag = shift + scale * graph.gl
+    diag.index_add_(0, graph.edge_src, scale[graph.edge_src] * graph.edge_A)
+    values = scale.tolist()
+    lower, upper = [], []
+    for nodes, parents in zip(graph.levels, graph.level_parents):
+        upper.append(torch.tensor([-values[n] * graph.coefficient(n, p) for n, p in
+                                   zip(nodes.tolist(), parents.tolist())], dtype=scale.dtype))
+        lower.append(torch.tensor([-values[p] * graph.coefficient(p, n) for n, p in
+                                   zip(nodes.tolist(), parents.tolist())], dtype=scale.dtype))
+    for i in range(len(graph.levels) - 1, -1, -1):
+        lower[i] = lower[i] / diag[graph.levels[i]]
+        diag.index_add_(0, graph.level_parents[i], -lower[i] * upper[i])
+    return diag, lower, upper
+
+
+def hines_solve_serial(rhs: torch.Tensor, diag: List[float], roots: List[int], nodes: List[int], parents: List[int],
+                       lower: List[float], upper: List[float]):
+    """
+    Same as hines_solve, one node at a time. Deep narrow trees (long unbranched segments) have a handful of nodes per
+    level, where per-node Python arithmetic is cheaper than launching tensor ops for every level.
+    """
+    r = rhs.tolist()
+    for i in range(len(nodes) - 1, -1, -1):
+        r[parents[i]] -= lower[i] * r[nodes[i]]
+    x = [0.0] * len(r)
+    for root in roots:
+        x[root] = r[root] / diag[root]
+    for i in range(len(nodes)):
+        x[nodes[i]] = (r[nodes[i]] - upper[i] * x[parents[i]]) / diag[nodes[i]]
+    return torch.tensor(x, dtype=rhs.dtype)
+
+
+class ForwardStrategyImplicit(ForwardStrategyABC):
+    __slots__ = ('dt', 'method', 'theta', '_graph', '_factors')
+    solves_branches = True
+
+    def __init__(self, c, *, method='tr_bdf2', dt=None, **kwargs):
+        """
+        Implicit step: backward Euler, Crank-Nicolson or TR-BDF2 (a Crank-Nicolson stage followed by a BDF2 stage,
+        both using the same matrix). The whole tree, branch points included, is one tridiagonal-like system solved
+        in O(N) with Hines ordering, which stays stable for DT far beyond the explicit limit.
+
+        Crank-Nicolson does not damp the stiffest modes, so with large DT a sharp stimulus rings from step to step.
+        TR-BDF2 is second order as well but L-stable, use it when DT is 10x or more above the explicit limit.
+
+        Cm, gl, El and D / dx^2 come from the segments, per compartment, only the time step is set here.
+
+        @param method: 'tr_bdf2' (default), 'crank_nicolson' or 'backward_euler'
+        """
+        super().__init__()
+        reject_segment_parameters('ForwardStrategyImplicit', kwargs)
+        if method not in THETA:
+            raise ValueError(f"Unknown method {method}, expected one of {', '.join(THETA)}")
+        if dt is None:
+            dt = c.dendrites.DT
+        self.method = method
+        self.theta = THETA[method]
+        self.dt = dt if isinstance(dt, torch.Tensor) else torch.tensor(dt, dtype=torch.float)
+        self._graph = None
+        # Time step -> factorization and its serial copy, one per step size used since the tree last changed
+        self._factors = {}
+
+    def cache_clear(self):
+        self._graph = None
+        self._factors = {}
+
+    def forward(self, voltage_tables, branches=(), **kwargs):
+        graph = self.graph(voltage_tables, branches)
+        if graph.n == 0:
+            return
+        V, _ = self.step(graph.gather(voltage_tables), self.dt)
+        graph.scatter(voltage_tables, V)
+
+    def graph(self, voltage_tables, branches=()) -> CompartmentGraph:
+        """
+        Compartment graph of the storages, built on first use after cache_clear().
+        """
+        if self._graph is None:
+            self._graph = CompartmentGraph(voltage_tables, branches)
+        return self._graph
+
+    def step(self, V: torch.Tensor, dt, estimate: bool = False):
+        """
+        Voltages of all nodes of the graph after one step of dt from V.
+
+        @param estimate: Also return the local error of the step, from the embedded pair of TR-BDF2 (Hosea and
+            Shampine, 1996). Only TR-BDF2 has one
+        @return: New voltages and the error estimate per node, None without estimate
+        """
+        graph = self._graph
+        dt = dt if isinstance(dt, torch.Tensor) else torch.tensor(dt, dtype=torch.float)
+        h = dt / graph.Cm
+        b = h * graph.gl * graph.El
+        hAV = self.derivative(V, h)
+        if self.method == 'tr_bdf2':
+            U = self.solve(V + self.theta * hAV + GAMMA * b, dt)
+            rhs = (U - (1 - GAMMA) ** 2 * V) / (GAMMA * (2 - GAMMA)) + self.theta * b
+        else:
+            if estimate:
+                raise ValueError(f"{self.method} has no error estimate, use tr_bdf2")
+            rhs = V + (1 - self.theta) * hAV + b
+        V_new = self.solve(rhs, dt)
+        if not estimate:
+            return V_new, None
+        # Weights of the stage derivatives in the difference of TR-BDF2 and its embedded third order companion
+        w = math.sqrt(2) / 4
+        error = ((w - (1 - w) / 3) * hAV + (w - (3 * w + 1) / 3) * self.derivative(U, h)
+                 + 2 * self.theta / 3 * self.derivative(V_new, h))
+        return V_new, error
+
+    def derivative(self, V: torch.Tensor, h: torch.Tensor) -> torch.Tensor:
+        """
+        h times the part of dV/dt linear in V: coupling to the neighbours and leak, without the El term. The El term
+        is the same for every stage and its weights in the error estimate sum to zero.
+        """
+        graph = self._graph
+        AV = torch.zeros_like(V).index_add_(0, graph.edge_src, graph.edge_A * (V[graph.edge_dst] - V[graph.edge_src]))
+        return h * (AV - graph.gl * V)
+
+    def solve(self, rhs: torch.Tensor, dt=None):
+        graph = self._graph
+        factor, serial = self.factors(self.dt if dt is None else dt)
+        diag, lower, upper = factor
+        if graph.n >= SERIAL_WIDTH * len(graph.levels):
+            return hines_solve(rhs, diag, graph.roots, graph.levels, graph.level_parents, lower, upper)
+        return hines_solve_serial(rhs, *serial)
+
+    def factors(self, dt):
+        """
+        Factorization of the graph for time step dt and its copy as Python lists for hines_solve_serial, cached.
+        """
+        key = float(dt)
+        if key not in self._factors:
+            graph = self._graph
+            factor = self.factorize(graph, dt)
+            diag, lower, upper = factor
+            serial = (diag.tolist(), graph.roots.tolist(), torch.cat(graph.levels).tolist(),
+                      torch.cat(graph.level_parents).tolist(), torch.cat(lower).tolist(),
+                      torch.cat(upper).tolist()) if graph.levels else None
+            self._factors[key] = factor, serial
+        return self._factors[key]
+
+    def factorize(self, graph: CompartmentGraph, dt=None):
+        """
+        Eliminates the tree matrix (I - weight * dt / Cm * A), Cm per node, see hines_factorize.
+        """
+        return hines_factorize(graph, self.theta * (self.dt if dt is None else dt) / graph.Cm)
+
+    def __str__(self):
+        return f"Implicit {self.method}"
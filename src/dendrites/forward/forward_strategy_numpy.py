@@ -0,0 +1,85 @@
+import numpy as np
+import torch
+
+from config import *
+from dendrites import numpy_kernels
+from dendrites.forward.forward_strategy_abc import ForwardStrategyABC
+from dendrites.packed_voltage_buffer import PackedVoltageBuffer
+
+
+def as_numpy(data: torch.Tensor) -> np.ndarray:
+    """
+    NumPy view of a storage with its batch dimension, sharing memory with the tensor.
+    """
+    array = data.numpy()
+    return array if array.ndim == 4 else array[np.newaxis]
+
+
+class ForwardStrategyNumpy(ForwardStrategyABC):
+    __slots__ = ('jit', '_signature', '_arguments')
+    solves_branches = True
+    applies_boundaries = True
+
+    def __init__(self, c, *, jit: bool = None, **kwargs):
+        """
+        NumPy backend for small trees: stencil, boundary compartments and branch points in one function on NumPy
+        views of the storages, with no torch dispatch per step. With Numba the function is compiled into one pass
+        over the compartments, without it every term is a NumPy array operation.
+
+        Voltages stay in the storages of the engine, the views share their memory, so stimuli, probes and segment.V
+        work as with the torch strategies. Results are the same float32 arithmetic in the same order as
+        ForwardStrategyDefault and BoundaryStrategyDefault and match them exactly.
+
+        @param jit: Compile the step with Numba, by default when Numba is installed
+        """
+        super().__init__()
+        if jit and numpy_kernels.numba is None:
+            raise ImportError("jit=True needs Numba, install it with pip install numba")
+        self.jit = numpy_kernels.numba is not None if jit is None else jit
+        self._signature = None
+        self._arguments = None
+
+    def cache_clear(self):
+        self._signature = None
+        self._arguments = None
+
+    def forward(self, voltage_tables, junctions=None, **kwargs):
+        index = junctions.index(voltage_tables) if junctions is not None and len(junctions) else None
+        packed = [table for table in voltage_tables.values() if isinstance(table, PackedVoltageBuffer)]
+        # Storages are reallocated when they grow and the index is rebuilt when junctions change
+        signature = ([(key, table.data.data_ptr(), table.data.shape) for key, table in voltage_tables.items()],
+                     id(index[-1]) if index is not None else None, id(packed[0].first) if packed else None)
+        if signature != self._signature:
+            self._arguments = self.arguments(voltage_tables, index)
+            self._signature = signature
+        if self.jit:
+            numpy_kernels.step_jit(*self._arguments[:-1])
+        else:
+            numpy_kernels.step(*self._arguments)
+
+    def arguments(self, voltage_tables, index):
+        """
+        Arguments of numpy_kernels.step, as typed lists for step_jit.
+        """
+        keys = list(voltage_tables)
+        datas = [as_numpy(voltage_tables[key].data) for key in keys]
+        packed = next((i for i, key in enumerate(keys) if isinstance(voltage_tables[key], PackedVoltageBuffer)), -1)
+        first = voltage_tables[keys[packed]].first.numpy() if packed >= 0 else np.zeros(0, dtype=np.int64)
+        last = voltage_tables[keys[packed]].last.numpy() if packed >= 0 else np.zeros(0, dtype=np.int64)
+        branch_ids, rows, inner, outer, arms = [], [], [], [], []
+        junctions, counts = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if index is not None:
+            branch_keys, rows, inner, outer, arms, junctions, counts = index
+            branch_ids = [keys.index(key) for key in branch_keys]
+            rows, inner, outer, arms = ([value.numpy() for value in values] for values in (rows, inner, outer, arms))
+            junctions, counts = junctions.numpy(), counts.numpy()
+        members = numpy_kernels.junction_members(junctions, counts)
+        branch_ids = np.array(branch_ids, dtype=np.int64)
+        if self.jit:
+            datas = numpy_kernels.typed_list(datas, np.float32, 4)
+            rows, inner, outer, arms = (numpy_kernels.typed_list(values, np.int64, 1)
+                                        for values in (rows, inner, outer, arms))
+        return datas, packed, first, last, branch_ids, rows, inner, outer, arms, junctions, counts, members
+
+    def __str__(self):
+        return "Numba" if self.jit else "NumPy"
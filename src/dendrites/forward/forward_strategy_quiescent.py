@@ -0,0 +1,126 @@
+from typing import Dict, Tuple
+
+import torch
+
+from config import *
+from dendrites.boundary.boundary_strategy_default import _batched
+from dendrites.forward.forward_strategy_abc import ForwardStrategyABC
+from dendrites.forward.forward_strategy_default import ForwardStrategyDefault
+
+_update_voltages = ForwardStrategyDefault.update_voltages
+
+
+@torch.jit.script
+def active_blocks(data: torch.Tensor, deviation: torch.Tensor, width: int, tolerance: float) -> torch.Tensor:
+    """
+    Blocks of width interior compartments of a storage, (B, rows, blocks), that are active: a compartment of the block
+    or one of its two neighbours is more than tolerance away from its El.
+
+    @param deviation: Work buffer (B, rows, blocks * width + 2), zero past the length of the storage
+    """
+    data = _batched(data)
+    length = data.shape[-1]
+    deviation[:, :, :length].copy_(data[:, :, 0]).sub_(data[:, :, 5]).abs_()
+    return deviation.unfold(-1, width + 2, width).amax(-1) > tolerance
+
+
+@torch.jit.script
+def update_blocks(data: torch.Tensor, index: torch.Tensor, starts: torch.Tensor, width: int):
+    """
+    Explicit Euler step of the blocks index (k, 3) of active_blocks, the same update as
+    ForwardStrategyDefault.update_voltages. Block j covers the compartments starts[j] + 1 to starts[j] + width.
+    """
+    data = _batched(data)
+    b, r, j = index.unbind(1)
+    columns = starts[j].unsqueeze(1) + torch.arange(width + 2, device=data.device)
+    channels = torch.arange(data.shape[2], device=data.device)
+    blocks = data[b[:, None, None], r[:, None, None], channels[None, :, None], columns[:, None, :]]
+    _update_voltages(blocks)
+    data[b[:, None], r[:, None], 0, columns[:, 1:-1]] = blocks[:, 0, 1:-1]
+
+
+class ForwardStrategyQuiescent(ForwardStrategyABC):
+    __slots__ = ('tolerance', 'width', 'dense_fraction', 'updated', 'total', '_blocks')
+
+    def __init__(self, c, *, tolerance: float = None, width: int = None, dense_fraction: float = 0.5, **kwargs):
+        """
+        Activity-gated explicit Euler step: blocks of compartments at rest are skipped. A block is at rest when its
+        compartments and both neighbours are within tolerance of their El, so inputs (stimuli, signal) wake a block on
+        the next step and activity spreads into the next block as it reaches its edge, through branch junctions as
+        well since the junction update writes the ends of quiet segments. Active blocks get exactly the update of
+        ForwardStrategyDefault.
+
+        Bound: a skipped compartment misses an update of at most dt / Cm * (4 D / dx^2 + gl) * tolerance per step.
+        Where the step is stable (dt / Cm * (2 D / dx^2 + gl) <= 1) the update does not expand differences in the max
+        norm, so after n steps voltages are within n times that of the full update; in practice within about
+        tolerance, as skipped regions stay within tolerance of rest. tolerance = 0 skips only blocks exactly at El and
+        gives the same voltages as the full update.
+
+        Rest is measured from the El of each compartment, so trees whose El varies along connected compartments
+        settle away from El and stay active.
+
+        @param tolerance: Deviation from El below which compartments are skipped, DendritesConfig.QUIESCENCE_TOLERANCE
+            by default
+        @param width: Compartments per block, DendritesConfig.QUIESCENCE_WIDTH by default. Rows of tables up to this
+            length are one block
+        @param dense_fraction: Above this fraction of active blocks a storage gets the full update, which is cheaper
+            than gathering them
+        """
+        super().__init__()
+        self.tolerance = float(c.dendrites.QUIESCENCE_TOLERANCE if tolerance is None else tolerance)
+        self.width = int(c.dendrites.QUIESCENCE_WIDTH if width is None else width)
+        self.dense_fraction = dense_fraction
+        # Blocks updated and blocks in all storages during the last step
+        self.updated = 0
+        self.total = 0
+        # Storage key -> (shape of its data, block width, block starts, deviation buffer)
+        self._blocks: Dict[object, Tuple[torch.Size, int, torch.Tensor, torch.Tensor]] = {}
+
+    def cache_clear(self):
+        self._blocks = {}
+
+    def blocks(self, key, data: torch.Tensor) -> Tuple[int, torch.Tensor, torch.Tensor]:
+        """
+        Block width, block starts and deviation buffer of the storage key with data, rebuilt when its shape changes.
+        """
+        data = _batched(data)
+        cached = self._blocks.get(key)
+        if cached is not None and cached[0] == data.shape:
+            return cached[1:]
+        interior = data.shape[-1] - 2
+        width = min(self.width, interior)
+        n = -(-interior // width)
+        # The last block ends at the last interior compartment, overlapping the one before if width does not divide
+        starts = torch.arange(n, device=data.device) * width
+        starts[-1] = interior - width
+        deviation = torch.zeros(data.shape[:2] + (n * width + 2,), dtype=data.dtype, device=data.device)
+        self._blocks[key] = data.shape, width, starts, deviation
+        return width, starts, deviation
+
+    def forward(self, voltage_tables, **kwargs):
+        self.updated = 0
+        self.total = 0
+        for key, table in voltage_tables.items():
+            if table.data.shape[-1] < 3 or table.data.numel() == 0:
+                continue
+            width, starts, deviation = self.blocks(key, table.data)
+            active = active_blocks(table.data, deviation, width, self.tolerance)
+            index = active.nonzero()
+            n = len(index)
+            if n > self.dense_fraction * active.numel():
+                ForwardStrategyDefault.update_voltages(table.data)
+                n = active.numel()
+            elif n:
+                update_blocks(table.data, index, starts, width)
+            self.updated += n
+            self.total += active.numel()
+
+    @property
+    def active_fraction(self):
+        """
+        Fraction of blocks updated during the last step.
+        """
+        return self.updated / self.total if self.total else 0.0
+
+    def __str__(self):
+        return "Quiescent"
@@ -0,0 +1,29 @@
+from config import *
+from dendrites.forward.forward_strategy_abc import ForwardStrategyABC
+
+
+class ForwardStrategySparse(ForwardStrategyABC):
+    __slots__ = ()
+    solves_branches = True
+    applies_boundaries = True
+
+    def __init__(self, c, **kwargs):
+        """
+        Whole step as one sparse matrix product with the CableOperator of the engine: stencil, sealed ends and
+        junctions are rows of the same matrix, so the engine runs no boundary or branch pass. The operator is
+        assembled again only after the tree changed, and only the stencils of new, grown or changed segments are
+        computed again. Matches ForwardStrategyDefault up to float32 rounding, all replicas of an ensemble share the
+        operator and need equal parameters.
+        """
+        super().__init__()
+
+    def cache_clear(self):
+        pass
+
+    def forward(self, voltage_tables, operator=None, **kwargs):
+        if operator is None:
+            raise ValueError("ForwardStrategySparse needs the CableOperator of the engine")
+        operator.step(voltage_tables)
+
+    def __str__(self):
+        return "Sparse"
@@ -0,0 +1,91 @@
+import torch
+
+from dendrites.compartment_graph import CompartmentGraph
+from dendrites.segment import DendriteSegment
+
+
+class GreensFunction:
+    def __init__(self, engine):
+        """
+        Closed-form solution of the engine's cable equation without input:
+
+            V(t) = V_rest + G(t) (V(0) - V_rest),   G(t) = exp(t / Cm * A) = Phi exp(t Lambda) Phi^-1
+
+        where A is the tapered cable operator of the whole tree (the same one the forward strategies step, sealed
+        ends and branch points included), Cm is per compartment and V_rest solves A V_rest = -gl El, equal to El
+        when El is the same everywhere. G(t)[i, j] is the Green's function: the voltage at compartment i, time t,
+        after a unit pulse at compartment j. The eigendecomposition is computed once, after that V(x, t) costs one
+        small matrix product for any t, instead of t / DT calls to forward().
+
+        A, Phi and Phi^-1 are dense n x n matrices over all n compartments of the tree and the eigendecomposition
+        costs O(n^3): about 1 s at n = 1000 and 4 s at n = 2000 on one core, with 16 n^2 bytes per complex matrix.
+        Use it for trees of up to a few thousand compartments. For larger trees, SteadyState solves the stationary
+        case in O(n) with the Hines factorization, and ForwardStrategyImplicit steps with large DT.
+
+        The tree must not change while the evaluator is used, build a new one after add_segment, grow or add_branch.
+
+        @param engine: DendriteEngine with the tree
+        """
+        self.engine = engine
+        self.graph = CompartmentGraph(engine.voltage_tables, engine.branches)
+
+        A = torch.zeros((self.graph.n, self.graph.n), dtype=torch.double)
+        coefficient = self.graph.edge_A.double()
+        A.index_put_((self.graph.edge_src, self.graph.edge_dst), coefficient, accumulate=True)
+        A.index_put_((self.graph.edge_src, self.graph.edge_src), -coefficient, accumulate=True)
+        gl = self.graph.gl.double()
+        A.diagonal().sub_(gl)
+        self.A = A
+        self.V_rest = torch.linalg.solve(A, -gl * self.graph.El.double()) if self.graph.n else A.new_zeros(0)
+        eigenvalues, self.Phi = torch.linalg.eig(A / self.graph.Cm.double()[:, None])
+        self.eigenvalues = eigenvalues
+        self.Phi_inv = torch.linalg.inv(self.Phi)
+        self.set_state()
+
+    def set_state(self, V0: torch.Tensor = None):
+        """
+        Sets the initial condition at t = 0, by default the current voltages of the engine.
+        """
+        if V0 is None:
+            V0 = self.graph.gather(self.engine.voltage_tables)
+        self._modes = self.Phi_inv @ (V0.double() - self.V_rest).to(self.Phi.dtype)
+
+    def kernel(self, t: float) -> torch.Tensor:
+        """
+        G(t) for all pairs of compartments, shape (n, n).
+        """
+        return ((self.Phi * torch.exp(self.eigenvalues * t)) @ self.Phi_inv).real.float()
+
+    def voltage(self, t) -> torch.Tensor:
+        """
+        Voltages of all nodes at time t (scalar or 1-D tensor of times), shape (n,) or (len(t), n).
+        """
+        t = torch.as_tensor(t, dtype=torch.double)
+        decay = torch.exp(t.unsqueeze(-1) * self.eigenvalues)
+        return (((decay * self._modes) @ self.Phi.T).real + self.V_rest).float()
+
+    def at(self, segment: DendriteSegment, x, t) -> torch.Tensor:
+        """
+        V(x, t) along a segment. Positions x (scalar or 1-D tensor, same units as segment.dx) are interpolated
+        linearly between compartments.
+
+        @return: Tensor of shape (len(t), len(x)), scalar dimensions are squeezed
+        """
+        t = torch.as_tensor(t, dtype=torch.double)
+        x = torch.as_tensor(x, dtype=torch.double) / segment.dx.item()
+        V = self.voltage(t.reshape(-1))
+        nodes = torch.tensor([self.graph.node(segment, i) for i in range(segment.length)], dtype=torch.long)
+        i = x.reshape(-1).clamp(0, segment.length - 1)
+        left = i.floor().long().clamp(max=segment.length - 2)
+        w = (i - left).float()
+        out = V[:, nodes[left]] * (1 - w) + V[:, nodes[left + 1]] * w
+        return out.reshape(t.shape + x.shape)
+
+    def impulse_response(self, segment: DendriteSegment, i: int, t) -> torch.Tensor:
+        """
+        Response of all nodes to a unit pulse at compartment i of segment, shape (n,) or (len(t), n).
+        """
+        t = torch.as_tensor(t, dtype=torch.double)
+        j = self.graph.node(segment, i)
+        decay = torch.exp(t.unsqueeze(-1) * self.eigenvalues)
+        return ((decay * self.Phi_inv[:, j]) @ self.Phi.T).real.float()
@@ -1,11 +1,27 @@
-import numpy
 import numpy as np
-from matplotlib import pyplot, pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from config import AsyncWriter
 
 
 def log_matshow(tensors, writer, step, titles=None):
+    """
+    Logs tensors (n, T, L) as one image of n voltage maps. With an AsyncWriter the figure is rendered on its worker
+    thread.
+    """
+    if isinstance(writer, AsyncWriter):
+        writer.submit(_log_matshow, tensors, step, titles)
+    else:
+        _log_matshow(writer, tensors, step, titles)
+
+
+def _log_matshow(writer, tensors, step, titles):
     num_tensors = tensors.shape[0]
-    fig, axs = plt.subplots(num_tensors, 1, figsize=(20, 2 * num_tensors))
+    # Figure without pyplot: no GUI backend, safe to render on a worker thread
+    fig = Figure(figsize=(20, 2 * num_tensors))
+    canvas = FigureCanvasAgg(fig)
+    axs = fig.subplots(num_tensors, 1)
     if titles is None:
         titles = [f"Plot {i + 1}" for i in range(num_tensors)]
 
@@ -15,17 +31,14 @@ def log_matshow(tensors, writer, step, titles=None):
         else:
             ax = axs
         aspect_ratio = 10
-        cax = ax.imshow(tensors[i].T, cmap='jet', aspect=aspect_ratio)
+        cax = ax.imshow(np.asarray(tensors[i]).T, cmap='jet', aspect=aspect_ratio)
         cax.set_clim(-1.0, 1.0)
 
         if i == 0:
             ax.set_title(titles[i])
 
     # Convert plot to tensor and log to TensorBoard
-    fig.canvas.draw()
-    image = np.frombuffer(fig.canvas.tostring_rgb(), dtype='uint8')
-    image = image.reshape(fig.canvas.get_width_height()[::-1] + (3,))
+    canvas.draw()
+    image = np.asarray(canvas.buffer_rgba())[..., :3]
     image = np.moveaxis(image, 2, 0)  # PyTorch expects CxHxW
     writer.add_image(f'Voltage {titles[0]}', image, global_step=step)
-    plt.show()
-    plt.close(fig)
@@ -0,0 +1,97 @@
+import numpy as np
+import torch
+
+from dendrites.segment import dendrite_default_configuration
+
+# Structure identifiers of the SWC format, used to name segments
+SWC_TYPES = {1: 'soma', 2: 'axon', 3: 'basal', 4: 'apical'}
+
+
+def read_swc(source) -> np.ndarray:
+    """
+    Samples of an SWC file (or open file or lines), one row per sample: id, type, x, y, z, radius, parent id.
+    """
+    return np.loadtxt(source, comments='#', ndmin=2)
+
+
+def _jump(pointer: np.ndarray, value: np.ndarray, reduce):
+    """
+    Combines value along the pointers of a forest by pointer jumping, in O(log depth) vectorized passes: the result
+    at i is reduce(value[i], result at pointer[i]), pointers of -1 end a chain.
+    """
+    pointer, value = pointer.copy(), value.copy()
+    for _ in range(64):
+        valid = pointer >= 0
+        if not valid.any():
+            return value
+        value[valid] = reduce(value[valid], value[pointer[valid]])
+        pointer[valid] = pointer[pointer[valid]]
+    raise ValueError("SWC samples form a cycle")
+
+
+def load_swc(engine, source, *, radius_scale: float = 1.0, min_length: int = None, **parameters):
+    """
+    Builds the tree of an SWC reconstruction in engine. Unbranched runs of samples become one segment each, with a
+    length in compartments given by their path length and a radius tapering linearly from the first to the last
+    sample. Every branch point becomes one junction. A root with more than one child becomes a segment of its own
+    that all of them branch from.
+
+    The tree is analyzed with vectorized passes over all samples and added with create_segments in one engine
+    transaction, so parameters are written, storages allocated and coefficients computed in bulk.
+
+    @param engine: DendriteEngine to add the segments to
+    @param source: Path of the SWC file, an open file or lines
+    @param radius_scale: Factor from SWC radii to the radius unit of the segments
+    @param min_length: Fewest compartments of a segment, DendritesConfig.LEN by default
+    @param parameters: Overrides of dendrite_default_configuration for all segments, except r0, k and LEN
+    @return: Segments, parents before children
+    """
+    configuration = {**dendrite_default_configuration(engine.c), **parameters}
+    min_length = engine.c.dendrites.LEN if min_length is None else min_length
+    dx = float(configuration['dx'])
+    swc = read_swc(source)
+    n = len(swc)
+    ids = swc[:, 0].astype(np.int64)
+    order = np.argsort(ids)
+    parent_ids = swc[:, 6].astype(np.int64)
+    parent = np.where(parent_ids < 0, -1, order[np.searchsorted(ids, parent_ids, sorter=order) % max(n, 1)])
+    if ((parent >= 0) & (ids[np.maximum(parent, 0)] != parent_ids)).any():
+        raise ValueError("SWC sample with an unknown parent")
+
+    # Parents before children
+    depth = _jump(parent, (parent >= 0).astype(np.int64), np.add)
+    rank = np.argsort(depth, kind='stable')
+    swc, parent = swc[rank], parent[rank]
+    position = np.empty(n, dtype=np.int64)
+    position[rank] = np.arange(n)
+    parent = np.where(parent < 0, -1, position[np.maximum(parent, 0)])
+
+    children = np.bincount(parent[parent >= 0], minlength=n)
+    starts = (parent < 0) | (children[np.maximum(parent, 0)] != 1)
+    head = _jump(np.where(starts, -1, parent), np.where(starts, np.arange(n), -1), np.maximum)
+    segment_of = (np.cumsum(starts) - 1)[head]
+    first = np.flatnonzero(starts)
+    ends = np.flatnonzero(children != 1)
+
+    edges = np.where(parent >= 0, np.linalg.norm(swc[:, 2:5] - swc[np.maximum(parent, 0), 2:5], axis=1), 0.0)
+    path = np.bincount(segment_of, weights=edges, minlength=len(first))
+    lengths = np.maximum(min_length, np.round(path / dx)).astype(np.int64)
+    r0 = radius_scale * swc[first, 5]
+    r_end = np.empty(len(first))
+    r_end[segment_of[ends]] = radius_scale * swc[ends, 5]
+    k = np.where(r_end > 0, (r0 - r_end) / (lengths * dx), 0.0)
+    parent_segment = np.where(parent[first] < 0, -1, segment_of[np.maximum(parent[first], 0)])
+    types = swc[first, 1].astype(np.int64)
+
+    configuration.update(r0=torch.from_numpy(r0.astype(np.float32)), k=torch.from_numpy(k.astype(np.float32)))
+    del configuration['LEN']
+    names = [f"{SWC_TYPES.get(kind, 'custom')}_{i}" for i, kind in enumerate(types.tolist())]
+    with engine.transaction():
+        segments = engine.create_segments(names, torch.from_numpy(lengths), **configuration)
+        branches = {}
+        for i, j in enumerate(parent_segment.tolist()):
+            if j >= 0:
+                branches.setdefault(j, []).append(segments[i])
+        for j, branch_children in branches.items():
+            engine.add_branch(segments[j], *branch_children)
+    return segments
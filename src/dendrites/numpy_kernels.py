@@ -0,0 +1,150 @@
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def stencil(data: np.ndarray):
+    """
+    Explicit Euler step of a storage (B, rows, CHANNELS, length) in place, the same arithmetic in float32 as
+    ForwardStrategyDefault.update_voltages.
+    """
+    V = data[:, :, 0]
+    delta_v = data[:, :, 2, 1:-1] * (
+        data[:, :, 3, 1:-1] * (V[..., 0:-2] - 2 * V[..., 1:-1] + V[..., 2:]) - data[:, :, 4, 1:-1] * (
+            V[..., 1:-1] - data[:, :, 5, 1:-1])
+    )
+    V[..., 1:-1] += delta_v
+
+
+def boundary(data: np.ndarray):
+    data[:, :, 0, 0] = data[:, :, 0, 1]
+    data[:, :, 0, -1] = data[:, :, 0, -2]
+
+
+def boundary_packed(data: np.ndarray, first: np.ndarray, last: np.ndarray):
+    data[:, 0, 0, first] = data[:, 0, 0, first + 1]
+    data[:, 0, 0, last] = data[:, 0, 0, last - 1]
+
+
+def junction_members(junctions: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Arms of every junction in arm order (junctions, most arms), padded with the number of arms.
+    """
+    order = np.argsort(junctions, kind='stable')
+    counts = counts.astype(np.int64)
+    starts = np.cumsum(counts) - counts
+    members = np.full((len(counts), counts.max() if len(counts) else 0), len(junctions), dtype=np.int64)
+    members[junctions[order], np.arange(len(order)) - starts[junctions[order]]] = order
+    return members
+
+
+def branch(datas, rows, inner, outer, arms, junctions: np.ndarray, counts: np.ndarray, members: np.ndarray):
+    """
+    All junctions at once like boundary_branch_torchscript, datas[i] holds the arms arms[i]. The arms of a junction
+    are summed in arm order, as index_add_ does.
+    """
+    B = datas[0].shape[0]
+    values = np.zeros((B, len(junctions) + 1), dtype=np.float32)
+    for data, row, column, arm in zip(datas, rows, inner, arms):
+        values[:, arm] = data[:, row, 0, column]
+    mean_value = (values[:, members].sum(-1) / counts)[:, junctions]
+    values = values[:, :-1]
+    I = np.zeros((B, len(junctions) + 1), dtype=np.float32)
+    I[:, :-1] = mean_value - values
+    values += I[:, :-1] - (I[:, members].sum(-1) / counts)[:, junctions]
+    for data, row, column_inner, column_outer, arm in zip(datas, rows, inner, outer, arms):
+        data[:, row, 0, column_outer] = mean_value[:, arm]
+        data[:, row, 0, column_inner] = values[:, arm]
+
+
+def step(datas, packed: int, first, last, branch_ids, rows, inner, outer, arms, junctions, counts, members):
+    """
+    Whole step of all storages datas: stencil, boundary compartments (datas[packed] is a packed buffer with
+    boundaries first and last) and branch points, branch_ids[i] is the storage of the arms arms[i].
+    """
+    for i, data in enumerate(datas):
+        stencil(data)
+        if i == packed:
+            boundary_packed(data, first, last)
+        else:
+            boundary(data)
+    if len(branch_ids):
+        branch([datas[i] for i in branch_ids], rows, inner, outer, arms, junctions, counts, members)
+
+
+def _step_jit(datas, packed, first, last, branch_ids, rows, inner, outer, arms, junctions, counts):
+    """
+    step() as explicit loops for Numba, one pass over every row instead of one array operation per term.
+    """
+    two = np.float32(2.0)
+    for t in range(len(datas)):
+        data = datas[t]
+        B, R, _, L = data.shape
+        new = np.empty(L, dtype=np.float32)
+        for b in range(B):
+            for r in range(R):
+                for i in range(1, L - 1):
+                    V = data[b, r, 0, i]
+                    new[i] = V + data[b, r, 2, i] * (
+                        data[b, r, 3, i] * (data[b, r, 0, i - 1] - two * V + data[b, r, 0, i + 1])
+                        - data[b, r, 4, i] * (V - data[b, r, 5, i]))
+                for i in range(1, L - 1):
+                    data[b, r, 0, i] = new[i]
+                if t != packed:
+                    data[b, r, 0, 0] = data[b, r, 0, 1]
+                    data[b, r, 0, L - 1] = data[b, r, 0, L - 2]
+            if t == packed:
+                for i in range(len(first)):
+                    data[b, 0, 0, first[i]] = data[b, 0, 0, first[i] + 1]
+                for i in range(len(last)):
+                    data[b, 0, 0, last[i]] = data[b, 0, 0, last[i] - 1]
+
+    if len(branch_ids) == 0:
+        return
+    B = datas[0].shape[0]
+    A = len(junctions)
+    J = len(counts)
+    values = np.zeros(A, dtype=np.float32)
+    I = np.zeros(A, dtype=np.float32)
+    mean_value = np.zeros(J, dtype=np.float32)
+    I_mean = np.zeros(J, dtype=np.float32)
+    for b in range(B):
+        for g in range(len(branch_ids)):
+            data = datas[branch_ids[g]]
+            for k in range(len(arms[g])):
+                values[arms[g][k]] = data[b, rows[g][k], 0, inner[g][k]]
+        mean_value[:] = 0
+        I_mean[:] = 0
+        for a in range(A):
+            mean_value[junctions[a]] += values[a]
+        for j in range(J):
+            mean_value[j] = mean_value[j] / counts[j]
+        for a in range(A):
+            I[a] = mean_value[junctions[a]] - values[a]
+            I_mean[junctions[a]] += I[a]
+        for j in range(J):
+            I_mean[j] = I_mean[j] / counts[j]
+        for a in range(A):
+            values[a] = values[a] + (I[a] - I_mean[junctions[a]])
+        for g in range(len(branch_ids)):
+            data = datas[branch_ids[g]]
+            for k in range(len(arms[g])):
+                arm = arms[g][k]
+                data[b, rows[g][k], 0, outer[g][k]] = mean_value[junctions[arm]]
+                data[b, rows[g][k], 0, inner[g][k]] = values[arm]
+
+
+step_jit = numba.njit(cache=True)(_step_jit) if numba is not None else None
+
+
+def typed_list(arrays, dtype, ndim: int):
+    """
+    Arrays of dtype with ndim dimensions as a list Numba can pass to step_jit, also when empty.
+    """
+    result = numba.typed.List.empty_list(numba.types.Array(numba.from_dtype(np.dtype(dtype)), ndim, 'A'))
+    for array in arrays:
+        result.append(array)
+    return result
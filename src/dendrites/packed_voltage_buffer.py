@@ -0,0 +1,160 @@
+import torch
+
+from dendrites.segment import DendriteSegment
+from dendrites.voltage_cache_table import CHANNELS
+
+
+class PackedVoltageBuffer:
+    def __init__(self, initial_size: int, batch: int = None):
+        """
+        All segments, whatever their length, packed one after another into a single buffer of shape
+        (1, CHANNELS, size). Channels are the same as in a VoltageCacheTable with one row, so one stencil pass
+        updates the whole tree. Boundary compartments of every segment are listed in first and last.
+
+        Space of freed segments is reclaimed by compacting the buffer once more than half of it is unused.
+
+        @param initial_size: Number of compartments to preallocate
+        @param batch: Number of replicas B, adds a leading dimension like in VoltageCacheTable
+        """
+        self.batch = () if batch is None else (batch,)
+        self.reserved = dict()
+        self.offsets = dict()
+        self._storage = torch.zeros(self.batch + (1, CHANNELS, initial_size), dtype=torch.float)
+        self._free = set()
+        self._next = 0
+        self.end = 0
+        self.holes = 0
+        self.generation = 0
+        self.data = self._storage[..., :0]
+        self._first = None
+        self._last = None
+
+    @property
+    def total(self):
+        return self._storage.shape[-1]
+
+    @property
+    def free(self):
+        return self.total - self.end
+
+    @property
+    def first(self):
+        if self._first is None:
+            self._index()
+        return self._first
+
+    @property
+    def last(self):
+        if self._last is None:
+            self._index()
+        return self._last
+
+    def _index(self):
+        offsets = torch.tensor([self.offsets[slice_index] for slice_index in self.reserved],
+                               dtype=torch.long).reshape(-1, 2)
+        self._first = offsets[:, 0]
+        self._last = offsets[:, 0] + offsets[:, 1] - 1
+
+    def ensure(self, length: int):
+        """
+        Makes room for length more compartments at the end, compacting or reallocating at most once.
+        """
+        if self.end + length > self.total and self.holes * 2 > self.end:
+            self.compact()
+        if self.end + length > self.total:
+            self.reallocate(max(2 * self.total, self.end + length))
+
+    def reserve_slice(self, dendrite: DendriteSegment, length: int, D: torch.Tensor = None):
+        self.ensure(length)
+        if self._free:
+            slice_index = self._free.pop()
+        else:
+            slice_index = self._next
+            self._next += 1
+        self.offsets[slice_index] = (self.end, length)
+        self.end += length
+        self.data = self._storage[..., :self.end]
+        self.reserved[slice_index] = dendrite
+        self._first = self._last = None
+        self.set_dendrite(slice_index, D)
+        return slice_index
+
+    def reserve_slices(self, dendrites, length: int, coefficients: torch.Tensor):
+        """
+        Reserves consecutive slices of the same length for dendrites and writes their coefficients, (n, 5, length)
+        or (n, B, 5, length), with one copy.
+        """
+        self.ensure(len(dendrites) * length)
+        start = self.end
+        slices = []
+        for dendrite in dendrites:
+            slice_index = self._free.pop() if self._free else self._next
+            if slice_index == self._next:
+                self._next += 1
+            self.offsets[slice_index] = (self.end, length)
+            self.end += length
+            self.reserved[slice_index] = dendrite
+            dendrite.bind(self, slice_index)
+            slices.append(slice_index)
+        self.data = self._storage[..., :self.end]
+        self._first = self._last = None
+        block = self._storage[..., 0, :, start:self.end]
+        block[..., 0, :] = 0.0
+        # (n, [B,] 5, length) -> ([B,] 5, n * length)
+        coefficients = coefficients.movedim(0, -2)
+        block[..., 1:, :] = coefficients.reshape(coefficients.shape[:-2] + (-1,))
+        return slices
+
+    def free_slice(self, slice_index):
+        del self.reserved[slice_index]
+        _, length = self.offsets.pop(slice_index)
+        self._free.add(slice_index)
+        self.holes += length
+        self._first = self._last = None
+        return slice_index
+
+    def set_dendrite(self, slice_index, D: torch.Tensor = None):
+        offset, length = self.offsets[slice_index]
+        self.reserved[slice_index].bind(self, slice_index)
+        self._storage[..., 0, 0, offset:offset + length] = 0.0
+        self.set_coefficients(slice_index, D)
+
+    def set_coefficients(self, slice_index, D: torch.Tensor = None):
+        offset, length = self.offsets[slice_index]
+        self._storage[..., 0, 1:, offset:offset + length] = self.reserved[slice_index].coefficients(length, D)
+
+    def view(self, slice_index):
+        offset, length = self.offsets[slice_index]
+        return self._storage[..., 0, 0, offset:offset + length]
+
+    def locate(self, slice_index):
+        """
+        Row and first column of a slice in data.
+        """
+        return 0, self.offsets[slice_index][0]
+
+    def reallocate(self, size: int):
+        storage = torch.zeros(self.batch + (1, CHANNELS, size), dtype=torch.float)
+        storage[..., :self.end] = self._storage[..., :self.end]
+        self._storage = storage
+        self.data = self._storage[..., :self.end]
+        self.generation += 1
+
+    def compact(self):
+        """
+        Moves reserved segments to the front of the buffer, in their current order, with one gather.
+        """
+        slices = sorted(self.offsets, key=lambda slice_index: self.offsets[slice_index][0])
+        index = [torch.arange(self.offsets[s][0], self.offsets[s][0] + self.offsets[s][1]) for s in slices]
+        index = torch.cat(index) if index else torch.zeros(0, dtype=torch.long)
+        self._storage[..., :len(index)] = self._storage[..., index]
+        offset = 0
+        for slice_index in slices:
+            length = self.offsets[slice_index][1]
+            self.offsets[slice_index] = (offset, length)
+            offset += length
+        self.end = offset
+        self.holes = 0
+        self.data = self._storage[..., :self.end]
+        self._first = self._last = None
+        self.generation += 1
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Callable, List
+
+import torch
+
+from dendrites.boundary.boundary_strategy_default import _batched
+
+
+@torch.jit.script
+def probe_write_torchscript(tables: List[torch.Tensor], groups: List[int], table_ids: List[int],
+                            rows: List[torch.Tensor], cols: List[torch.Tensor], columns: List[torch.Tensor],
+                            values: torch.Tensor, steps: torch.Tensor, slot: int, step: int):
+    """
+    Copies the probed compartments of groups into row slot of a probe's ring buffer.
+    """
+    for group in groups:
+        values[slot][:, columns[group]] = _batched(tables[table_ids[group]])[:, rows[group], 0, cols[group]]
+    steps[slot] = step
+
+
+class Probe:
+    def __init__(self, segments=(), positions=None, *, table=None, every: int = 1, capacity: int = 1024,
+                 sink: Callable = None):
+        """
+        Records voltages into a preallocated ring buffer from inside the step, every k steps, without a Python value
+        per compartment. The buffer keeps the last capacity samples, flush() returns them in bulk.
+
+        @param segments: Segments to record
+        @param positions: Positions along every segment like in DendriteSegment.signal, all compartments if None
+        @param table: Key of a voltage storage to record whole instead of segments, with the rows it has when the
+            probe is first used
+        @param every: Record after every k-th step of the engine
+        @param capacity: Number of samples in the ring buffer
+        @param sink: Called as sink(steps, values) with the samples when the buffer is full, instead of overwriting
+            the oldest ones, and by flush()
+        """
+        if every < 1 or capacity < 1:
+            raise ValueError("every and capacity must be positive")
+        self.segments = list(segments)
+        self.positions = positions
+        self.table = table
+        self.every = every
+        self.capacity = capacity
+        self.sink = sink
+        self.values = None
+        self.steps = None
+        self.count = 0
+        self.flushed = 0
+        self.columns = {}
+        self._batched = False
+
+    @property
+    def pending(self):
+        """
+        Samples in the buffer not flushed yet.
+        """
+        return min(self.count - self.flushed, self.capacity)
+
+    def compile(self, voltage_tables, batch: int = None):
+        """
+        Storage indices of the probed compartments, grouped by storage: (keys, rows, cols, columns). Allocates the
+        ring buffer on the device of the storages when first called.
+
+        When a probed segment grew since, the buffer is reallocated with the new number of columns after the samples
+        of the old layout went to the sink. A probe without a sink must be flushed before its segments grow, its
+        samples of the old layout would be lost otherwise.
+        """
+        groups = defaultdict(lambda: ([], [], []))
+        segment_columns = {}
+        n = 0
+        if self.table is not None:
+            data = voltage_tables[self.table].data
+            total, length = data.shape[-3], data.shape[-1]
+            rows, cols, columns = groups[self.table]
+            rows.extend(row for row in range(total) for _ in range(length))
+            cols.extend(list(range(length)) * total)
+            columns.extend(range(total * length))
+            n = total * length
+        keys = {id(storage): key for key, storage in voltage_tables.items()}
+        for segment in self.segments:
+            storage, row, start = segment.locate()
+            if self.positions is None:
+                compartments = range(segment.length)
+            else:
+                compartments = [segment.compartment(position) for position in self.positions]
+            rows, cols, columns = groups[keys[id(storage)]]
+            rows.extend([row] * len(compartments))
+            cols.extend(start + i for i in compartments)
+            columns.extend(range(n, n + len(compartments)))
+            segment_columns[segment] = slice(n, n + len(compartments))
+            n += len(compartments)
+        if self.values is not None and self.values.shape[-1] != n:
+            if self.sink is not None:
+                self.flush()
+            elif self.pending:
+                raise ValueError("Probed segments changed length with samples not flushed, flush() the probe before "
+                                 "growing them")
+            self.values = torch.zeros(self.values.shape[:-1] + (n,), dtype=torch.float, device=self.values.device)
+        if self.values is None:
+            device = next(iter(voltage_tables.values())).data.device
+            self.values = torch.zeros((self.capacity, batch or 1, n), dtype=torch.float, device=device)
+            self.steps = torch.zeros(self.capacity, dtype=torch.long, device=device)
+            self._batched = batch is not None
+        self.columns = segment_columns
+
+        def index(i):
+            return [torch.tensor(group[i], dtype=torch.long) for group in groups.values()]
+
+        return list(groups), index(0), index(1), index(2)
+
+    def flush(self):
+        """
+        Samples taken since the last flush, oldest first, and passes them to the sink if there is one. Samples
+        overwritten before the flush are lost.
+
+        @return: steps (k,) and values (k, n), (k, B, n) for an ensemble
+        """
+        k = self.pending
+        if self.values is None:
+            return torch.zeros(0, dtype=torch.long), torch.zeros(0)
+        slots = torch.arange(self.count - k, self.count, device=self.values.device) % self.capacity
+        steps, values = self.steps[slots], self.values[slots]
+        if not self._batched:
+            values = values[:, 0]
+        self.flushed = self.count
+        if self.sink is not None:
+            self.sink(steps, values)
+        return steps, values
+
+    def segment_values(self, values: torch.Tensor, segment) -> torch.Tensor:
+        """
+        Columns of segment in values returned by flush().
+        """
+        return values[..., self.columns[segment]]
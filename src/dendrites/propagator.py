@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import torch
+
+from dendrites.adaptive_stepper import apply_due_inputs, steps_to_event
+
+
+class Propagator:
+    def __init__(self, engine, *, cache_size: int = None):
+        """
+        Jumps an engine over many steps at once. Between inputs a step is the affine map V' = M V + c of
+        engine.operator, so n steps are the n-th power of the augmented matrix [[M, c], [0, 1]]. It is computed by
+        repeated squaring over the compartments of all segments, dense and in float64, from cached powers M^(2^j).
+        The result is the same as n calls of forward() with the default strategies up to rounding, with no
+        stability limit on n.
+
+        Jumps stop at every step at which an input is due or a probe records, so a simulation with sparse inputs
+        costs time in the number of events rather than the number of steps. Products for the last cache_size
+        lengths of jumps are kept, all cached powers are dropped when the tree changes.
+
+        Each cached matrix has (compartments + 1)^2 entries, which limits jumps to trees of a few thousand
+        compartments. Ensembles share the operator, see CableOperator.
+
+        @param cache_size: Number of jump lengths whose propagators are kept, DendritesConfig.PROPAGATOR_CACHE by
+            default
+        """
+        self.engine = engine
+        self.dt = float(engine.c.dendrites.DT)
+        self.cache_size = int(engine.c.dendrites.PROPAGATOR_CACHE if cache_size is None else cache_size)
+        self._powers = []
+        self._cache = OrderedDict()
+        self._structure = None
+        # Jumps made so far, one per stretch between events
+        self.jumps = 0
+
+    def cache_clear(self):
+        self._powers = []
+        self._cache.clear()
+        self._structure = None
+
+    def advance(self, t: float) -> int:
+        """
+        Advances the engine by time t, a multiple of DT.
+
+        @return: Number of steps of DT advanced
+        """
+        n_steps = round(t / self.dt)
+        if n_steps < 0 or abs(n_steps * self.dt - t) > 1e-9 * max(1.0, abs(t)):
+            raise ValueError(f"Time {t} is not a non-negative multiple of DT = {self.dt}")
+        self.run(n_steps)
+        return n_steps
+
+    def run(self, n_steps: int):
+        """
+        Advances the engine by n_steps steps of DT.
+        """
+        engine = self.engine
+        end = engine.steps + n_steps
+        while engine.steps < end:
+            apply_due_inputs(engine)
+            m = steps_to_event(engine, end)
+            self.jump(m)
+            engine.steps += m
+            engine._forward_probes()
+
+    def jump(self, n_steps: int):
+        """
+        Propagates the voltages n_steps steps without inputs, engine.steps is left to the caller.
+        """
+        operator = self.engine.operator.assemble()
+        voltage_tables = self.engine.voltage_tables
+        propagator = self.propagator(n_steps)
+        positions = operator.positions
+        V = operator.gather(voltage_tables)
+        V[:, positions] = torch.addmm(propagator[:-1, -1], V[:, positions].double(), propagator[:-1, :-1].t()).float()
+        operator.scatter(voltage_tables, V)
+        self.jumps += 1
+
+    def propagator(self, n_steps: int) -> torch.Tensor:
+        """
+        Augmented matrix of n_steps steps, (compartments + 1, compartments + 1) over operator.positions.
+        """
+        if self._structure != self.engine.structure:
+            self.cache_clear()
+            self._structure = self.engine.structure
+        if n_steps in self._cache:
+            self._cache.move_to_end(n_steps)
+            return self._cache[n_steps]
+        if not self._powers:
+            self._powers.append(self._step())
+        result = None
+        for j in range(n_steps.bit_length()):
+            if j == len(self._powers):
+                self._powers.append(self._powers[-1] @ self._powers[-1])
+            if n_steps >> j & 1:
+                result = self._powers[j] if result is None else self._powers[j] @ result
+        if result is None:
+            result = torch.eye(len(self._powers[0]), dtype=torch.double)
+        self._cache[n_steps] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _step(self) -> torch.Tensor:
+        """
+        Augmented matrix of one step over the compartments of all segments, whose rows only reach each other.
+        """
+        operator = self.engine.operator.assemble()
+        positions = operator.positions
+        k = len(positions)
+        local = torch.full((operator.n,), -1, dtype=torch.long)
+        local[positions] = torch.arange(k)
+        matrix = operator.matrix.to_sparse_coo().coalesce()
+        rows, cols = local[matrix.indices()]
+        keep = rows >= 0
+        step = torch.zeros((k + 1, k + 1), dtype=torch.double)
+        step[rows[keep], cols[keep]] = matrix.values()[keep].double()
+        step[:k, k] = operator.affine[positions].double()
+        step[k, k] = 1.0
+        return step
@@ -0,0 +1,84 @@
+from typing import List, Optional
+
+import torch
+
+from dendrites.boundary.boundary_strategy_default import _batched, _boundary, boundary_branch_torchscript, \
+    boundary_packed_torchscript
+from dendrites.probe import probe_write_torchscript
+from dendrites.stimulus import apply_stimulus_torchscript
+
+
+@torch.jit.script
+def run_torchscript(tables: List[torch.Tensor],
+                    n_steps: int,
+                    start_step: int,
+                    packed: int,
+                    packed_first: Optional[torch.Tensor],
+                    packed_last: Optional[torch.Tensor],
+                    branch_tables: List[int],
+                    branch_rows: List[torch.Tensor],
+                    branch_inner: List[torch.Tensor],
+                    branch_outer: List[torch.Tensor],
+                    branch_arms: List[torch.Tensor],
+                    junctions: torch.Tensor,
+                    junction_counts: torch.Tensor,
+                    stimulus_tables: List[int],
+                    stimulus_offsets: List[List[int]],
+                    stimulus_rows: List[torch.Tensor],
+                    stimulus_cols: List[torch.Tensor],
+                    stimulus_amplitudes: List[torch.Tensor],
+                    probe_values: List[torch.Tensor],
+                    probe_steps: List[torch.Tensor],
+                    probe_every: List[int],
+                    probe_count: List[int],
+                    probe_groups: List[List[int]],
+                    group_tables: List[int],
+                    group_rows: List[torch.Tensor],
+                    group_cols: List[torch.Tensor],
+                    group_columns: List[torch.Tensor]):
+    """
+    n_steps of DendriteEngine.forward() with the default strategies in one scripted loop, the core update is the same
+    stencil as ForwardStrategyDefault.update_voltages.
+
+    Stimuli and probes are grouped by table: inputs stimulus_offsets[i][step]:stimulus_offsets[i][step + 1] of a
+    compiled StimulusSchedule are added to tables[stimulus_tables[i]] before every step. After every probe_every[p]-th
+    step of the engine (counted from start_step) the groups probe_groups[p] of probe p are written to the next slot
+    of its ring buffer probe_values[p], which already holds probe_count[p] samples. Table number packed (-1 if none)
+    is a PackedVoltageBuffer with boundary compartments packed_first and packed_last. Branch arguments are the index of
+    BranchJunctions, with tables[branch_tables[i]] the storage of branch_rows[i].
+    """
+    # Views and coefficients are constant for the whole run, only the voltages change
+    tables = [_batched(table) for table in tables]
+    V_mid = [table[:, :, 0, 1:-1] for table in tables]
+    V_left = [table[:, :, 0, 0:-2] for table in tables]
+    V_right = [table[:, :, 0, 2:] for table in tables]
+    h = [table[:, :, 2, 1:-1] for table in tables]
+    D = [table[:, :, 3, 1:-1] for table in tables]
+    gl = [table[:, :, 4, 1:-1] for table in tables]
+    El = [table[:, :, 5, 1:-1] for table in tables]
+    branch_voltages = [tables[i] for i in branch_tables]
+    for step in range(n_steps):
+        for i in range(len(stimulus_tables)):
+            lo = stimulus_offsets[i][step]
+            hi = stimulus_offsets[i][step + 1]
+            if hi > lo:
+                apply_stimulus_torchscript(tables[stimulus_tables[i]], stimulus_rows[i][lo:hi],
+                                           stimulus_cols[i][lo:hi], stimulus_amplitudes[i][lo:hi])
+        for i in range(len(tables)):
+            V_mid[i] += h[i] * (D[i] * (V_left[i] - 2 * V_mid[i] + V_right[i]) - gl[i] * (V_mid[i] - El[i]))
+        for i in range(len(tables)):
+            if i == packed:
+                assert packed_first is not None and packed_last is not None
+                boundary_packed_torchscript(tables[i], packed_first, packed_last)
+            else:
+                _boundary(tables[i])
+        if len(branch_voltages) > 0:
+            boundary_branch_torchscript(branch_voltages, branch_rows, branch_inner, branch_outer, branch_arms,
+                                        junctions, junction_counts)
+        s = start_step + step + 1
+        for p in range(len(probe_values)):
+            if s % probe_every[p] == 0:
+                sample = probe_count[p] + s // probe_every[p] - start_step // probe_every[p] - 1
+                slot = sample % probe_values[p].shape[0]
+                probe_write_torchscript(tables, probe_groups[p], group_tables, group_rows, group_cols, group_columns,
+                                        probe_values[p], probe_steps[p], slot, s)
@@ -4,9 +4,34 @@ import torch
 
 from config import *
 from dendrites.exceptions import DendriteRadiusError
+from dendrites.segment_parameters import SegmentParameters
+
+
+# Parameters that can change after the segment is created, dx and LEN are fixed by the compartments
+PARAMETERS = ('Ra', 'r0', 'k', 'Cm', 'gl', 'El', 'dt')
+
+
+def _parameter(name: str):
+    def get(self):
+        return self._parameters.get(self._id, name)
+
+    def set(self, value):
+        self._parameters.set(self._id, name, value)
+
+    return property(get, set, doc=f"{name} of the segment, a view of its row in the parameter store")
+
+
+def _log_voltages(writer, name: str, V: torch.Tensor, step):
+    if V.dim() == 1:
+        writer.add_scalars(f'{name}/V', {f'{i}': value for i, value in enumerate(V.tolist())}, step)
+        return
+    for b, replica in enumerate(V.tolist()):
+        writer.add_scalars(f'{name}/V/{b}', {f'{i}': value for i, value in enumerate(replica)}, step)
 
 
 class DendriteSegment:
+    __slots__ = ('_parameters', '_id', '_length', 'name', '_storage', '_slice_index')
+
     def __init__(self,
                  *,
                  dx,
@@ -19,10 +44,15 @@ class DendriteSegment:
                  Ra,
                  name,
                  LEN,
+                 parameters: SegmentParameters = None,
                  ):
         """
         Dendrite segment initialization. For details see paper:
 
+        The parameters are kept in row _id of a SegmentParameters store, the segment itself is only a handle onto
+        it. Without a store the segment gets its own, the engine copies the row into its store when the segment is
+        added.
+
         @param dx: Dx (length interval)
         @param dt: Dt (time interval)
         @param r0: Radius at start
@@ -33,42 +63,151 @@ class DendriteSegment:
         @param Ra: Resistance factor
         @param name: Name
         @param LEN: Length
+        @param parameters: Store to keep the parameters in
         """
-        self.dx = dx.clone().detach() if isinstance(dx, torch.Tensor) else torch.tensor(dx, dtype=torch.float)
-        self.dt = dt.clone().detach() if isinstance(dt, torch.Tensor) else torch.tensor(dt, dtype=torch.float)
-        self.r0 = r0.clone().detach() if isinstance(r0, torch.Tensor) else torch.tensor(r0, dtype=torch.float)
-        self.k = k.clone().detach() if isinstance(k, torch.Tensor) else torch.tensor(k, dtype=torch.float)
-        self.gl = gl.clone().detach() if isinstance(gl, torch.Tensor) else torch.tensor(gl, dtype=torch.float)
-        self.El = El.clone().detach() if isinstance(El, torch.Tensor) else torch.tensor(El, dtype=torch.float)
-        self.Cm = Cm.clone().detach() if isinstance(Cm, torch.Tensor) else torch.tensor(Cm, dtype=torch.float)
-        self.Ra = Ra.clone().detach() if isinstance(Ra, torch.Tensor) else torch.tensor(Ra, dtype=torch.float)
+        self._parameters = parameters if parameters is not None else SegmentParameters()
+        self._id = self._parameters.allocate(1).start
+        self._parameters.set_row(self._id, (dx, dt, r0, k, gl, El, Cm, Ra), LEN)
+        self._length = LEN
         self.name = name
-        self.V = None
-        self.length = LEN
+        self._storage = None
+        self._slice_index = None
+
+    @classmethod
+    def handle(cls, parameters: SegmentParameters, i: int, name, length: int) -> DendriteSegment:
+        """
+        Segment for row i of parameters, already filled in, without writing to the store.
+        """
+        segment = cls.__new__(cls)
+        segment._parameters = parameters
+        segment._id = i
+        segment._length = length
+        segment.name = name
+        segment._storage = None
+        segment._slice_index = None
+        return segment
+
+    dx = _parameter('dx')
+    dt = _parameter('dt')
+    r0 = _parameter('r0')
+    k = _parameter('k')
+    gl = _parameter('gl')
+    El = _parameter('El')
+    Cm = _parameter('Cm')
+    Ra = _parameter('Ra')
+
+    @property
+    def length(self):
+        return self._length
+
+    @length.setter
+    def length(self, value: int):
+        self._length = value
+        self._parameters.lengths[self._id] = value
+
+    def move_parameters(self, parameters: SegmentParameters):
+        """
+        Copies the parameters of the segment into a row of another store and keeps them there, its row in the old
+        store is freed.
+        """
+        if parameters is not self._parameters:
+            old, old_id = self._parameters, self._id
+            self._id = parameters.copy(old, old_id)
+            self._parameters = parameters
+            old.free_rows(old_id)
+
+    @property
+    def V(self):
+        """
+        Voltages of the segment, a view into the storage it is bound to. The view is taken on every access, so it
+        stays valid when the storage reallocates or moves the segment. Shape (length,), or (B, length) in an engine
+        with an ensemble of B replicas, where V[b] are the voltages of replica b.
+        """
+        if self._storage is None:
+            return None
+        return self._storage.view(self._slice_index)
+
+    def bind(self, storage, slice_index):
+        self._storage = storage
+        self._slice_index = slice_index
+
+    def locate(self):
+        """
+        Storage the segment is bound to, with the row and first column of its slice in storage.data.
+        """
+        row, start = self._storage.locate(self._slice_index)
+        return self._storage, row, start
 
     def set_length(self, new_length: int):
         if new_length == self.length:
             return
-        if self.radius(new_length) <= 0:
+        if (self.radius(new_length) <= 0).any():
             raise DendriteRadiusError(f"Radius at length {new_length} is {self.radius(new_length)}")
         self.length = new_length
 
     def radius(self, i: int):
-        return self.r0 - self.k * i * self.dx
+        r0, k, dx = self._parameters.row(self._id, ('r0', 'k', 'dx'))
+        return r0 - k * i * dx
 
-    def signal(self, i, dV):
+    def compartment(self, i) -> int:
         _i = int(i // self.dx)
         if _i < 0:
-            _i = len(self.V) + _i
+            _i = self.length + _i
         assert self.length > _i >= 0
-        self.V[_i].add_(dV[0]).clamp_(-1.0, 1.0)
+        return _i
+
+    def signal(self, i, dV):
+        self.V[..., self.compartment(i)].add_(dV[0]).clamp_(-1.0, 1.0)
 
     def D_batch(self, length: int):
-        x = torch.arange(0, length, self.dx.item())
-        return ((self.r0 - self.k * x) ** 2) / (2 * torch.pi * (self.r0 - self.k * x) * self.Ra)
+        dx, r0, k, Ra = self._parameters.row(self._id, ('dx', 'r0', 'k', 'Ra'))
+        x = torch.arange(0, length, dx.item())
+        r = r0.unsqueeze(-1) - k.unsqueeze(-1) * x
+        return (r ** 2) / (2 * torch.pi * r * Ra.unsqueeze(-1))
+
+    def coefficients(self, length: int, D: torch.Tensor = None):
+        """
+        Per-compartment coefficients of the stencil, shape (5, length): D, dt / Cm, D / dx^2, gl and El. Parameters
+        given per replica of an ensemble, as tensors of shape (B,), give coefficients of shape (B, 5, length).
+
+        @param D: D_batch(length), if already computed
+        """
+        if D is None:
+            D = self.D_batch(length)
+        dt, Cm, dx, gl, El = self._parameters.row(self._id, ('dt', 'Cm', 'dx', 'gl', 'El'))
+        return torch.stack(torch.broadcast_tensors(D, (dt / Cm).unsqueeze(-1), D / dx ** 2, gl.unsqueeze(-1),
+                                                   El.unsqueeze(-1)), dim=-2)
+
+    def set_parameters(self, **parameters):
+        """
+        Changes biophysical parameters (Ra, r0, k, Cm, gl, El or dt) and rewrites the coefficients of the segment in
+        its storage, the only time they are recomputed. The engine holding the segment is notified through the
+        on_change of its parameter store, so it rebuilds the operators and factorizations it cached.
+        """
+        unknown = set(parameters) - set(PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown parameters {', '.join(sorted(unknown))}, expected some of {', '.join(PARAMETERS)}")
+        values = {name: torch.as_tensor(value, dtype=torch.float) for name, value in parameters.items()}
+        r0 = values.get('r0', self.r0)
+        k = values.get('k', self.k)
+        if (r0 - k * self.length * self.dx <= 0).any():
+            raise DendriteRadiusError(f"Radius at length {self.length} is {r0 - k * self.length * self.dx}")
+        for name, value in values.items():
+            self._parameters.set(self._id, name, value)
+        if self._storage is not None:
+            self._storage.set_coefficients(self._slice_index)
+        if self._parameters.on_change is not None:
+            self._parameters.on_change(self)
 
     def log_to_tensorboard(self, writer: SummaryWriter, step):
-        writer.add_scalars(f'{self.name}/V', {f'{i}': self.V[i] for i in range(self.length)}, step)
+        """
+        Logs the voltage of every compartment, one chart per replica of an ensemble. With an AsyncWriter only a copy
+        of V is queued, the scalars are built on its worker thread.
+        """
+        if isinstance(writer, AsyncWriter):
+            writer.submit(_log_voltages, self.name, self.V, step)
+        else:
+            _log_voltages(writer, self.name, self.V, step)
 
     @property
     def configuration(self):
@@ -88,6 +227,64 @@ class DendriteSegment:
         return self.name
 
 
+def _stack_many(segments, names) -> list:
+    """
+    Parameters names of all segments, each of shape (len(segments),) or (len(segments), B) if any is given per
+    replica. One gather when the segments share a parameter store.
+    """
+    parameters = segments[0]._parameters if len(segments) else None
+    if parameters is not None and all(segment._parameters is parameters for segment in segments):
+        return parameters.columns([segment._id for segment in segments], names)
+    return [torch.stack(torch.broadcast_tensors(*[getattr(segment, name) for segment in segments]))
+            for name in names]
+
+
+def _stack(segments, name: str) -> torch.Tensor:
+    return _stack_many(segments, (name,))[0]
+
+
+def radius_many(segments, lengths) -> torch.Tensor:
+    """
+    Radius of every segment at its length in lengths, as one vectorized call.
+    """
+    r0, dx, k = _stack_many(segments, ('r0', 'dx', 'k'))
+    x = torch.as_tensor(lengths, dtype=torch.float) * dx
+    return r0 - k * x.reshape(x.shape + (1,) * (r0.dim() - 1))
+
+
+def _D(segments, length: int, dx, r0, k, Ra):
+    if not (dx == dx[0]).all():
+        return [segment.D_batch(length) for segment in segments]
+    x = torch.arange(0, length, dx[0].item())
+    r = r0.unsqueeze(-1) - k.unsqueeze(-1) * x
+    return (r ** 2) / (2 * torch.pi * r * Ra.unsqueeze(-1))
+
+
+def D_many(segments, length: int) -> torch.Tensor:
+    """
+    D_batch of many segments, one row per segment. Rows of segments shorter than length are cut with
+    [..., :their length].
+    """
+    return _D(segments, length, *_stack_many(segments, ('dx', 'r0', 'k', 'Ra')))
+
+
+def coefficients_many(segments, length: int) -> torch.Tensor:
+    """
+    DendriteSegment.coefficients of many segments with the same length, shape (n, 5, length) or (n, B, 5, length).
+    """
+    dx, r0, k, Ra, dt, Cm, gl, El = _stack_many(segments, ('dx', 'r0', 'k', 'Ra', 'dt', 'Cm', 'gl', 'El'))
+    D = _D(segments, length, dx, r0, k, Ra)
+    if isinstance(D, list):
+        return torch.stack(torch.broadcast_tensors(*[segment.coefficients(length, D_segment)
+                                                     for segment, D_segment in zip(segments, D)]))
+
+    values = (dx, dt, Cm, gl, El)
+    if D.dim() == 2 and any(value.dim() == 2 for value in values):
+        D = D.unsqueeze(-2)
+    dx, dt, Cm, gl, El = (value.reshape(value.shape + (1,) * (D.dim() - value.dim())) for value in values)
+    return torch.stack(torch.broadcast_tensors(D, dt / Cm, D / dx ** 2, gl, El), dim=-2)
+
+
 def dendrite_default_configuration(c):
     return {
         'Ra': c.dendrites.RA,
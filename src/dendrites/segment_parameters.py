@@ -0,0 +1,215 @@
+import torch
+
+# Parameters of every segment, in the order of the columns of SegmentParameters.values
+COLUMNS = ('dx', 'dt', 'r0', 'k', 'gl', 'El', 'Cm', 'Ra')
+COLUMN = {name: j for j, name in enumerate(COLUMNS)}
+
+
+class SegmentParameters:
+    def __init__(self, capacity: int = 1):
+        """
+        Parameters of many segments as struct of arrays: row i of values holds the COLUMNS of segment id i and
+        lengths[i] its length, so queries over all segments are single tensor operations. The arrays double their
+        capacity when allocate runs out of rows.
+
+        values has shape (capacity, len(COLUMNS), W). W is 1 until a parameter is given per replica of an ensemble
+        of B replicas, then B, and per_replica marks the entries that use all W values instead of the first one.
+        Scalar entries are written to all W values, so a gather of any entries broadcasts correctly.
+
+        Rows of segments that leave the store are freed with free_rows and reused by allocate, like the slices of the
+        voltage storages.
+
+        @param capacity: Number of rows to preallocate
+        """
+        self.values = torch.zeros((capacity, len(COLUMNS), 1), dtype=torch.float)
+        self.per_replica = torch.zeros((capacity, len(COLUMNS)), dtype=torch.bool)
+        self.lengths = torch.zeros(capacity, dtype=torch.long)
+        self.count = 0
+        self._free = set()
+        # (id, column) of per-replica entries, so get() decides without reading a tensor
+        self._replica = set()
+        # Called as on_change(segment) after DendriteSegment.set_parameters, set by the engine owning the store
+        self.on_change = None
+
+    @property
+    def capacity(self):
+        return self.values.shape[0]
+
+    @property
+    def width(self):
+        return self.values.shape[-1]
+
+    @property
+    def free(self):
+        return len(self._free)
+
+    def allocate(self, n: int) -> range:
+        """
+        Ids of n new rows, consecutive free rows if there are n of them, else rows after the last one in use.
+        """
+        reused = self._free_run(n)
+        if reused is not None:
+            self._free.difference_update(reused)
+            return reused
+        if self.count + n > self.capacity:
+            capacity = max(2 * self.capacity, self.count + n)
+            values = torch.zeros((capacity, len(COLUMNS), self.width), dtype=torch.float)
+            per_replica = torch.zeros((capacity, len(COLUMNS)), dtype=torch.bool)
+            lengths = torch.zeros(capacity, dtype=torch.long)
+            values[:self.count] = self.values[:self.count]
+            per_replica[:self.count] = self.per_replica[:self.count]
+            lengths[:self.count] = self.lengths[:self.count]
+            self.values, self.per_replica, self.lengths = values, per_replica, lengths
+        ids = range(self.count, self.count + n)
+        self.count += n
+        return ids
+
+    def free_rows(self, ids):
+        """
+        Frees the rows of segments ids (an int, a range or a list) for reuse by allocate.
+        """
+        ids = {ids} if isinstance(ids, int) else set(ids)
+        rows = torch.as_tensor(sorted(ids), dtype=torch.long)
+        self.per_replica[rows] = False
+        self.lengths[rows] = 0
+        self._replica = {(i, j) for i, j in self._replica if i not in ids}
+        self._free |= ids
+
+    def _free_run(self, n: int):
+        """
+        First range of n consecutive free rows, None if there is none.
+        """
+        if n < 1 or len(self._free) < n:
+            return None
+        if n == 1:
+            start = min(self._free)
+            return range(start, start + 1)
+        rows = sorted(self._free)
+        start = 0
+        for k in range(1, len(rows) + 1):
+            if k == len(rows) or rows[k] != rows[k - 1] + 1:
+                if k - start >= n:
+                    return range(rows[start], rows[start] + n)
+                start = k
+        return None
+
+    def _widen(self, B: int):
+        if self.width == B:
+            return
+        if self.width != 1:
+            raise ValueError(f"Parameters given for {B} replicas, others for {self.width}")
+        self.values = self.values.expand(-1, -1, B).clone()
+
+    def get(self, i: int, name: str) -> torch.Tensor:
+        """
+        Parameter name of segment id i, a 0-d tensor or (B,) if given per replica.
+        """
+        j = COLUMN[name]
+        if (i, j) in self._replica:
+            return self.values[i, j]
+        return self.values[i, j, 0]
+
+    def row(self, i: int, names) -> list:
+        """
+        get() of several parameters of segment id i from one read of its row.
+        """
+        row = self.values[i]
+        scalars = row[:, 0].unbind()
+        return [row[COLUMN[name]] if (i, COLUMN[name]) in self._replica else scalars[COLUMN[name]] for name in names]
+
+    def set(self, ids, name: str, value):
+        """
+        Sets parameter name of segments ids (an int, a range or a list).
+
+        @param value: Scalar, (n,) with one value per segment, (B,) per replica or (n, B), each like ids
+        """
+        j = COLUMN[name]
+        value = torch.as_tensor(value, dtype=torch.float)
+        single = isinstance(ids, int)
+        per_replica = value.dim() == (1 if single else 2)
+        rows = torch.as_tensor([ids] if single else list(ids), dtype=torch.long)
+        if per_replica:
+            self._widen(value.shape[-1])
+            value = value.reshape(len(rows), self.width)
+        else:
+            value = value.reshape(-1, 1)
+        self.values[rows, j] = value
+        self.per_replica[rows, j] = per_replica
+        entries = {(i, j) for i in rows.tolist()}
+        if per_replica:
+            self._replica |= entries
+        else:
+            self._replica -= entries
+
+    def set_row(self, i: int, values, length: int):
+        """
+        Fills the new row i with values, one per column, in one write for all scalar values.
+        """
+        scalars = [value for value in values if not isinstance(value, torch.Tensor) or value.dim() == 0]
+        if len(scalars) == len(COLUMNS):
+            self.values[i] = torch.tensor([float(value) for value in scalars], dtype=torch.float).unsqueeze(-1)
+        else:
+            for name, value in zip(COLUMNS, values):
+                self.set(i, name, value)
+        self.lengths[i] = length
+
+    def column(self, ids, name: str) -> torch.Tensor:
+        """
+        Parameter name of segments ids in one gather, (n,) or (n, B) if any of them is given per replica.
+        """
+        j = COLUMN[name]
+        ids = torch.as_tensor(ids, dtype=torch.long)
+        if self._replica and self.per_replica[ids, j].any():
+            return self.values[ids, j]
+        return self.values[ids, j, 0]
+
+    def columns(self, ids, names) -> list:
+        """
+        column() of several parameters from one gather of the rows of ids.
+        """
+        ids = torch.as_tensor(ids, dtype=torch.long)
+        rows = self.values[ids]
+        replica = self.per_replica[ids].any(0).tolist() if self._replica else [False] * len(COLUMNS)
+        return [rows[:, COLUMN[name]] if replica[COLUMN[name]] else rows[:, COLUMN[name], 0] for name in names]
+
+    def radius(self, ids, lengths=None) -> torch.Tensor:
+        """
+        Radius of segments ids at lengths, at their current lengths if None.
+        """
+        ids = torch.as_tensor(ids, dtype=torch.long)
+        lengths = self.lengths[ids] if lengths is None else torch.as_tensor(lengths)
+        columns = self.columns(ids, ('r0', 'k', 'dx'))
+        batched = any(column.dim() == 2 for column in columns)
+        r0, k, dx = (column.unsqueeze(-1) if batched and column.dim() == 1 else column for column in columns)
+        x = lengths.float().reshape(dx.shape[:1] + (1,) * (dx.dim() - 1)) * dx
+        return r0 - k * x
+
+    def copy(self, source: "SegmentParameters", i: int) -> int:
+        """
+        Copies the row of segment id i of source into a new row.
+
+        @return: Id of the new row
+        """
+        new = self.allocate(1).start
+        if source.width != 1:
+            self._widen(source.width)
+        self.values[new] = source.values[i]
+        self.per_replica[new] = source.per_replica[i]
+        self.lengths[new] = source.lengths[i]
+        self._replica |= {(new, j) for i_, j in source._replica if i_ == i}
+        return new
+
+    def append(self, values: torch.Tensor, per_replica: torch.Tensor, lengths: torch.Tensor) -> range:
+        """
+        New rows copied from arrays shaped like values, per_replica and lengths, e.g. rows of another store.
+
+        @return: Ids of the new rows
+        """
+        ids = self.allocate(len(lengths))
+        if values.shape[-1] != 1:
+            self._widen(values.shape[-1])
+        self.values[ids.start:ids.stop] = values
+        self.per_replica[ids.start:ids.stop] = per_replica
+        self.lengths[ids.start:ids.stop] = lengths
+        self._replica |= {(ids.start + i, j) for i, j in per_replica.nonzero().tolist()}
+        return ids
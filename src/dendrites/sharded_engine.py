@@ -0,0 +1,297 @@
+import math
+import os
+import traceback
+
+import torch
+import torch.multiprocessing as mp
+
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.segment_parameters import COLUMNS
+
+
+def partition(engine: DendriteEngine, n_shards: int):
+    """
+    Splits the segments of engine into at most n_shards lists of about the same number of compartments. Trees no larger than
+    a shard are kept whole, larger trees are cut in depth-first order into pieces of about a shard, so they are split
+    at a few junctions only. Trees and pieces go largest first to the shard with the fewest compartments.
+    """
+    children = {}
+    is_child = set()
+    for segment, kids in engine.branches:
+        children.setdefault(segment, []).extend(kids)
+        is_child.update(kids)
+    trees, visited = [], set()
+    for root in [segment for segment in engine.slice_ids if segment not in is_child] + list(engine.slice_ids):
+        order, stack = [], [root]
+        while stack:
+            segment = stack.pop()
+            if segment in visited:
+                continue
+            visited.add(segment)
+            order.append(segment)
+            stack.extend(reversed(children.get(segment, ())))
+        if order:
+            trees.append(order)
+
+    target = sum(segment.length for segment in engine.slice_ids) / n_shards
+    units = []
+    for tree in trees:
+        size = sum(segment.length for segment in tree)
+        pieces = math.ceil(size / target) if size > target else 1
+        chunks = [[] for _ in range(pieces)]
+        done = 0
+        for segment in tree:
+            chunks[min(int(done * pieces // size), pieces - 1)].append(segment)
+            done += segment.length
+        units.extend(chunk for chunk in chunks if chunk)
+    units.sort(key=lambda unit: -sum(segment.length for segment in unit))
+    shards = [[] for _ in range(n_shards)]
+    loads = [0] * n_shards
+    for unit in units:
+        s = loads.index(min(loads))
+        shards[s].extend(unit)
+        loads[s] += sum(segment.length for segment in unit)
+    return [shard for shard in shards if shard]
+
+
+def _build(c, packed: bool, spec):
+    """
+    Engine of one shard from its spec: names, lengths, parameters (n, len(COLUMNS)), voltages and local branches.
+    """
+    engine = DendriteEngine(c, packed=packed)
+    names, lengths, parameters, voltages, branches = spec
+    segments = engine.create_segments(names, lengths, **{name: parameters[:, j] for j, name in enumerate(COLUMNS)})
+    for segment, V in zip(segments, voltages):
+        segment.V.copy_(V)
+    for parent, kids in branches:
+        engine.add_branch(segments[parent], *[segments[kid] for kid in kids])
+    return engine, segments
+
+
+def _worker(c, packed: bool, threads: int, spec, halo_spec, halo: torch.Tensor, result: torch.Tensor, offsets,
+            barrier, connection):
+    """
+    Loop of a worker process: builds its shard, then answers commands from the ShardedEngine until 'stop'.
+    """
+    torch.set_num_threads(threads)
+    try:
+        engine, segments = _build(c, packed, spec)
+        own, needed, junction_of, counts = halo_spec
+        own = [(arm, segments[i], *rest) for arm, i, *rest in own]
+        connection.send(('ok', None))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+        return
+    while True:
+        command, *arguments = connection.recv()
+        try:
+            if command == 'stop':
+                connection.send(('ok', None))
+                return
+            if command == 'run':
+                for _ in range(arguments[0]):
+                    if barrier is None:
+                        engine.forward()
+                    else:
+                        _step(engine, engine.steps % 2, halo, barrier, own, needed, junction_of, counts)
+                connection.send(('ok', engine.steps))
+            elif command == 'signal':
+                i, position, dV = arguments
+                segments[i].signal(position, dV)
+                connection.send(('ok', None))
+            elif command == 'gather':
+                for segment, offset in zip(segments, offsets):
+                    result[offset:offset + segment.length] = segment.V
+                connection.send(('ok', None))
+            else:
+                raise ValueError(f"Unknown command {command}")
+        except Exception:
+            if barrier is not None:
+                barrier.abort()
+            connection.send(('error', traceback.format_exc()))
+
+
+def _step(engine: DendriteEngine, parity: int, halo: torch.Tensor, barrier, own, needed: torch.Tensor,
+          junction_of: torch.Tensor, counts: torch.Tensor):
+    """
+    engine.forward() of a shard with junctions split between shards. As in boundary_branch, every junction reads
+    the inner compartments of its arms before any junction writes: after the stencil step each shard publishes the
+    inner compartments of its split arms into its half of the double-buffered halo, waits for the others and
+    computes the split junctions, then sets its local junctions and only then its split arms. The arms of a
+    junction are summed in arm order, and an inner compartment shared by two arms (segments of length 5) keeps the
+    value of the arm added last, both as in a single engine.
+    """
+    engine._forward_stimulus()
+    engine._forward_core()
+    engine._forward_boundary()
+    for arm, segment, inner, _, _, _ in own:
+        halo[parity, arm] = segment.V[inner]
+    barrier.wait()
+    if own:
+        values = halo[parity, needed]
+        mean_value = torch.zeros(len(counts)).index_add_(0, junction_of, values).div_(counts)[junction_of]
+        I = mean_value - values
+        I_mean = torch.zeros(len(counts)).index_add_(0, junction_of, I).div_(counts)[junction_of]
+        values = values + (I - I_mean)
+    engine._forward_branch()
+    for _, segment, inner, outer, position, last in own:
+        segment.V[outer] = mean_value[position]
+        if last:
+            segment.V[inner] = values[position]
+    engine.steps += 1
+    engine._forward_probes()
+
+
+class ShardedEngine:
+    def __init__(self, engine: DendriteEngine, n_shards: int = None, *, threads: int = None):
+        """
+        Runs the tree of engine (any number of trees, or one large tree) split across worker processes on one
+        machine. Every worker builds a DendriteEngine with its own voltage storages from its share of the segments
+        and steps it independently. Junctions whose arms are in different shards are set after every step from a
+        halo in shared memory holding only their inner compartments, with one barrier per step. Forests split
+        between trees exchange nothing and need no barrier.
+
+        engine describes the model and is not changed, sync() copies the voltages back into it. Stimulus schedules
+        and probes stay with engine, inputs reach the shards through signal(). Ensembles are not supported.
+
+        @param engine: DendriteEngine with the segments, branches and voltages to start from
+        @param n_shards: Number of worker processes, os.cpu_count() by default
+        @param threads: torch threads per worker, DendritesConfig.SHARD_THREADS by default
+        """
+        if engine.batch is not None:
+            raise ValueError("Sharding is not supported for ensembles")
+        c = engine.c
+        self.engine = engine
+        n_shards = max(1, min(os.cpu_count() if n_shards is None else n_shards, len(engine.slice_ids)))
+        threads = int(c.dendrites.SHARD_THREADS if threads is None else threads)
+        self.shards = partition(engine, n_shards)
+        self.steps = engine.steps
+        self._where = {segment: (s, i) for s, shard in enumerate(self.shards) for i, segment in enumerate(shard)}
+        self._offsets = {}
+        total = 0
+        for segment in engine.slice_ids:
+            self._offsets[segment] = total
+            total += segment.length
+        self._result = torch.zeros(total).share_memory_()
+
+        # Junctions with arms in more than one shard, their arms numbered in the order of engine.branches
+        split = [g for g, (segment, kids) in enumerate(engine.branches)
+                 if len({self._where[member][0] for member in (segment, *kids)}) > 1]
+        cross = [engine.branches[g] for g in split]
+        self.cross_junctions = len(cross)
+        # Of the arms writing the same inner compartment, boundary_branch keeps the last one in engine.junctions. A
+        # split arm written after the local junctions skips its inner compartment if a local arm comes after it.
+        global_arm, last_local = {}, {}
+        for a, (g, member, end) in enumerate(engine.junctions.arms):
+            global_arm[g, member] = a
+            if g not in split:
+                last_local[member, member.length - 3 if end else 2] = a
+        arms = [(j, member, member is segment) for j, (segment, kids) in enumerate(cross)
+                for member in (segment, *kids)]
+        self._halo = torch.zeros((2, len(arms))).share_memory_()
+        barrier = None
+        ctx = mp.get_context('spawn')
+        if cross:
+            barrier = ctx.Barrier(len(self.shards))
+        counts = torch.tensor([len(kids) + 1 for _, kids in cross], dtype=torch.float)
+
+        self._connections = []
+        self._processes = []
+        try:
+            for s, shard in enumerate(self.shards):
+                number = {segment: i for i, segment in enumerate(shard)}
+                branches = [(number[segment], [number[kid] for kid in kids]) for segment, kids in engine.branches
+                            if all(member in number for member in (segment, *kids))]
+                ids = torch.tensor([segment._id for segment in shard], dtype=torch.long)
+                spec = ([segment.name for segment in shard], [segment.length for segment in shard],
+                        engine.parameters.values[ids, :, 0], [segment.V.clone() for segment in shard], branches)
+                junctions = sorted({j for j, member, _ in arms if member in number})
+                needed = [a for a, (j, _, _) in enumerate(arms) if j in junctions]
+                own = []
+                for a, (j, member, end) in enumerate(arms):
+                    if member in number:
+                        inner, outer = (member.length - 3, member.length - 2) if end else (2, 1)
+                        last = last_local.get((member, inner), -1) < global_arm[split[j], member]
+                        own.append((a, number[member], inner, outer, needed.index(a), last))
+                halo_spec = (own, torch.tensor(needed, dtype=torch.long),
+                             torch.tensor([junctions.index(arms[a][0]) for a in needed], dtype=torch.long),
+                             counts[junctions])
+                parent, child = ctx.Pipe()
+                process = ctx.Process(target=_worker, daemon=True,
+                                      args=(c, engine.packed, threads, spec, halo_spec, self._halo,
+                                            self._result, [self._offsets[segment] for segment in shard], barrier,
+                                            child))
+                process.start()
+                self._connections.append(parent)
+                self._processes.append(process)
+            self._wait()
+        except BaseException:
+            self.close()
+            raise
+
+    def run(self, n_steps: int):
+        """
+        Advances all shards by n_steps steps, like engine.forward() n_steps times.
+        """
+        self._broadcast(('run', n_steps))
+        self.steps += n_steps
+
+    def signal(self, segment, i, dV: torch.Tensor):
+        """
+        segment.signal(i, dV) in the shard holding segment.
+        """
+        s, index = self._where[segment]
+        self._connections[s].send(('signal', index, i, dV))
+        self._wait([self._connections[s]])
+
+    def voltages(self) -> dict:
+        """
+        Voltages of every segment of engine, {segment: V (length,)}.
+        """
+        self._broadcast(('gather',))
+        return {segment: self._result[offset:offset + segment.length].clone()
+                for segment, offset in self._offsets.items()}
+
+    def sync(self):
+        """
+        Copies the voltages of the shards into engine and sets engine.steps.
+        """
+        for segment, V in self.voltages().items():
+            segment.V.copy_(V)
+        self.engine.steps = self.steps
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send(('stop',))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _broadcast(self, message):
+        for connection in self._connections:
+            connection.send(message)
+        self._wait()
+
+    def _wait(self, connections=None):
+        """
+        Collects one answer from every worker, raising the first error after all answered.
+        """
+        errors = []
+        for connection in self._connections if connections is None else connections:
+            status, value = connection.recv()
+            if status == 'error':
+                errors.append(value)
+        if errors:
+            raise RuntimeError(f"Shard failed:\n{errors[0]}")
@@ -0,0 +1,130 @@
+import torch
+
+from dendrites.compartment_graph import CompartmentGraph
+from dendrites.forward.forward_strategy_implicit import hines_factorize, hines_solve
+from dendrites.segment import DendriteSegment
+
+
+class SteadyState:
+    def __init__(self, engine, *, block: int = None):
+        """
+        Steady state of the engine's cable equation under constant inputs, solved directly instead of stepping until
+        the voltages settle:
+
+            G V = gl El + Cm I,   G = gl - A
+
+        with A the tapered coupling of the whole tree (sealed ends and branch points included, as in
+        ForwardStrategyImplicit) and I the constant inputs as voltage added per unit of time. G is factorized once in
+        float64 with Hines ordering, every solve after that is O(n) per right-hand side and many right-hand sides are
+        solved together.
+
+        The transfer impedance Z = G^-1 gives input resistances (its diagonal) and attenuation between compartments.
+        Both are computed block columns of Z at a time, block right-hand sides per solve, without keeping Z.
+
+        Results are per segment, one value per compartment, boundary compartments take the value of their
+        neighbour and compartments merged at a branch point share one value. An input into one of the compartments
+        merged at a branch point reaches the node divided by their number, as CompartmentGraph.gather averages them.
+        Ensembles are not supported, like CompartmentGraph. The tree must not change while the solver is used,
+        engine.steady_state() builds a new one after it did.
+
+        @param engine: DendriteEngine with the tree
+        @param block: Right-hand sides per solve, DendritesConfig.STEADY_STATE_BLOCK by default
+        """
+        self.engine = engine
+        self.block = int(engine.c.dendrites.STEADY_STATE_BLOCK if block is None else block)
+        self.graph = CompartmentGraph(engine.voltage_tables, engine.branches)
+        graph = self.graph
+        self.factor = hines_factorize(graph, torch.ones(graph.n, dtype=torch.double), 0.0)
+        self.nodes = {segment: torch.tensor([graph.node(segment, i) for i in range(segment.length)],
+                                            dtype=torch.long) for segment in graph.locations}
+
+    def solve(self, rhs: torch.Tensor) -> torch.Tensor:
+        """
+        G^-1 rhs for rhs (n,) or (n, k), in float64.
+        """
+        diag, lower, upper = self.factor
+        graph = self.graph
+        return hines_solve(rhs.double().clone(), diag, graph.roots, graph.levels, graph.level_parents, lower, upper)
+
+    def voltages(self, inputs=()) -> torch.Tensor:
+        """
+        Steady state of all nodes of the graph.
+
+        @param inputs: (segment, position, amplitude) tuples, amplitude is the voltage added before every step (of
+            the dt of segment) at position, like a constant StimulusSchedule waveform
+        """
+        graph = self.graph
+        rhs = (graph.gl * graph.El).double()
+        for segment, position, amplitude in inputs:
+            node = self._node(segment, position)
+            rhs[node] += graph.Cm[node].item() * float(amplitude) / segment.dt.item() / graph.members[node].item()
+        return self.solve(rhs)
+
+    def steady_state(self, inputs=(), apply: bool = False):
+        """
+        Steady state per segment.
+
+        @param inputs: See voltages
+        @param apply: Also set the voltages of the engine to it
+        @return: {segment: voltages (length,)}
+        """
+        V = self.voltages(inputs)
+        if apply:
+            self.graph.scatter(self.engine.voltage_tables, V.float())
+            self.engine._forward_boundary()
+        return self.by_segment(V)
+
+    def impedance(self, segment: DendriteSegment, position) -> dict:
+        """
+        Transfer impedance from a compartment to all others: the steady-state deviation from rest everywhere per unit
+        of constant input (voltage per unit of time and Cm) at position of segment.
+
+        @return: {segment: impedance (length,)}
+        """
+        column = torch.zeros(self.graph.n, dtype=torch.double)
+        node = self._node(segment, position)
+        column[node] = 1.0 / self.graph.members[node].item()
+        return self.by_segment(self.solve(column))
+
+    def input_resistance(self) -> dict:
+        """
+        Input resistance of every compartment, the diagonal of Z.
+
+        @return: {segment: input resistance (length,)}
+        """
+        return self.by_segment(self._columns()[0])
+
+    def attenuation(self, segment: DendriteSegment, position) -> dict:
+        """
+        Voltage attenuation from every compartment to a reference one (the soma for example): the steady-state
+        deviation at the reference over the one at the compartment of a constant input, Z[r, k] / Z[k, k].
+
+        @return: {segment: attenuation (length,)}, 1 at the reference
+        """
+        reference = self._node(segment, position)
+        diagonal, rows = self._columns(torch.tensor([reference]))
+        return self.by_segment(rows[0] / diagonal)
+
+    def by_segment(self, values: torch.Tensor) -> dict:
+        return {segment: values[nodes].float() for segment, nodes in self.nodes.items()}
+
+    def _node(self, segment: DendriteSegment, position) -> int:
+        return self.graph.node(segment, segment.compartment(position))
+
+    def _columns(self, rows: torch.Tensor = None):
+        """
+        Diagonal of Z and its given rows, solved block columns at a time. Column k is the response to a unit input
+        into one compartment of node k, so it is divided by the number of compartments merged into k.
+        """
+        n = self.graph.n
+        rows = torch.zeros(0, dtype=torch.long) if rows is None else rows
+        diagonal = torch.zeros(n, dtype=torch.double)
+        selected = torch.zeros((len(rows), n), dtype=torch.double)
+        for start in range(0, n, self.block):
+            columns = torch.arange(start, min(start + self.block, n))
+            identity = torch.zeros((n, len(columns)), dtype=torch.double)
+            identity[columns, torch.arange(len(columns))] = 1.0 / self.graph.members[columns].double()
+            Z = self.solve(identity)
+            diagonal[columns] = Z[columns, torch.arange(len(columns))]
+            selected[:, columns] = Z[rows]
+        return diagonal, selected
@@ -0,0 +1,122 @@
+from collections import defaultdict
+from typing import List
+
+import torch
+
+from dendrites.boundary.boundary_strategy_default import _batched
+from dendrites.segment import DendriteSegment
+
+
+@torch.jit.script
+def apply_stimulus_torchscript(voltages: torch.Tensor, rows: torch.Tensor, cols: torch.Tensor,
+                               amplitudes: torch.Tensor):
+    """
+    Adds amplitudes (n, B) to compartments (rows, cols) of a storage with one scatter-add, then clamps them to [-1, 1]
+    like DendriteSegment.signal. Inputs to the same compartment are summed.
+    """
+    V = _batched(voltages)[:, :, 0].permute(1, 2, 0)
+    V.index_put_((rows, cols), amplitudes, accumulate=True)
+    V[rows, cols] = V[rows, cols].clamp(-1.0, 1.0)
+
+
+class StimulusSchedule:
+    def __init__(self, c, *, dt=None):
+        """
+        Inputs planned ahead: discrete events (time, segment, position, amplitude) and continuous waveforms sampled
+        every step. The engine compiles the schedule into storage indices sorted by step, every step then applies all
+        inputs due with one scatter-add per storage instead of one DendriteSegment.signal call per input.
+
+        Inputs due at step s are applied before the s-th forward() of the engine, counted from its creation.
+
+        @param dt: Time step used to convert event times to steps, DendritesConfig.DT by default
+        """
+        self.dt = float(c.dendrites.DT if dt is None else dt)
+        self._blocks = []
+        self.version = 0
+
+    def add_events(self, segments, times, positions, amplitudes, index: torch.Tensor = None):
+        """
+        @param segments: Segment of all events, or a list of segments picked by index
+        @param times: Event times (n,), rounded to the nearest step
+        @param positions: Positions along the segment like in DendriteSegment.signal, scalar or (n,)
+        @param amplitudes: Voltage added by each event, scalar, (n,) or (n, B) with one amplitude per replica
+        @param index: Segment of every event as indices into segments (n,)
+        """
+        times = torch.as_tensor(times, dtype=torch.float).reshape(-1)
+        steps = torch.round(times / self.dt).long()
+        self._add(segments, steps, positions, amplitudes, index)
+
+    def add_waveform(self, segment: DendriteSegment, position, values, start: int = 0):
+        """
+        Continuous input: values[i] is added before step start + i.
+
+        @param values: (n_steps,) or (n_steps, B) with one waveform per replica
+        """
+        values = torch.as_tensor(values, dtype=torch.float)
+        steps = start + torch.arange(values.shape[0])
+        self._add(segment, steps, position, values, None)
+
+    def extend(self, schedule: "StimulusSchedule"):
+        """
+        Adds all inputs of another schedule.
+        """
+        self._blocks.extend(schedule._blocks)
+        self.version += 1
+
+    def _add(self, segments, steps, positions, amplitudes, index):
+        if isinstance(segments, DendriteSegment):
+            segments = [segments]
+        if index is None:
+            if len(segments) != 1:
+                raise ValueError("Events on more than one segment need an index")
+            index = torch.zeros_like(steps)
+        n = len(steps)
+        index = torch.as_tensor(index, dtype=torch.long).expand(n)
+        positions = torch.as_tensor(positions, dtype=torch.float).expand(n)
+        amplitudes = torch.as_tensor(amplitudes, dtype=torch.float)
+        amplitudes = amplitudes.reshape(n, -1) if amplitudes.dim() > 1 else amplitudes.expand(n).reshape(n, 1)
+        self._blocks.append((list(segments), index, steps, positions, amplitudes))
+        self.version += 1
+
+    def compile(self, voltage_tables, batch: int = None):
+        """
+        Storage indices of all inputs, grouped by storage and sorted by step.
+
+        @param voltage_tables: Voltage storages of the engine holding the segments
+        @param batch: Number of replicas of the engine
+        @return: Dict storage key -> (steps, rows, cols, amplitudes (n, B))
+        """
+        keys = {id(storage): key for key, storage in voltage_tables.items()}
+        groups = defaultdict(lambda: ([], [], [], []))
+        for segments, index, steps, positions, amplitudes in self._blocks:
+            located = [segment.locate() for segment in segments]
+            segment_keys = torch.tensor([keys[id(storage)] for storage, _, _ in located], dtype=torch.long)[index]
+            rows = torch.tensor([row for _, row, _ in located], dtype=torch.long)[index]
+            starts = torch.tensor([start for _, _, start in located], dtype=torch.long)[index]
+            lengths = torch.tensor([segment.length for segment in segments], dtype=torch.long)[index]
+            dx = torch.stack([segment.dx for segment in segments])[index]
+            compartments = torch.floor(positions / dx).long()
+            compartments = torch.where(compartments < 0, compartments + lengths, compartments)
+            if ((compartments < 0) | (compartments >= lengths)).any():
+                raise ValueError("Stimulus position outside of its segment")
+            amplitudes = amplitudes.expand(-1, batch or 1)
+            for key in segment_keys.unique().tolist():
+                selected = segment_keys == key
+                for values, value in zip(groups[key], (steps, rows, starts + compartments, amplitudes)):
+                    values.append(value[selected])
+
+        compiled = {}
+        for key, (steps, rows, cols, amplitudes) in groups.items():
+            steps = torch.cat(steps)
+            order = torch.argsort(steps, stable=True)
+            compiled[key] = (steps[order], torch.cat(rows)[order], torch.cat(cols)[order],
+                             torch.cat(amplitudes)[order])
+        return compiled
+
+
+def window(steps: torch.Tensor, start: int, n_steps: int) -> List[int]:
+    """
+    Offsets of inputs due at steps start to start + n_steps in sorted steps: inputs of step start + i are
+    offsets[i]:offsets[i + 1].
+    """
+    return torch.searchsorted(steps, torch.arange(start, start + n_steps + 1)).tolist()
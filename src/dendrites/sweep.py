@@ -0,0 +1,246 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.probe import Probe
+from dendrites.segment import PARAMETERS, dendrite_default_configuration
+from dendrites.stimulus import StimulusSchedule
+
+FEATURES = 'features.npy'
+TRACES = 'traces.npy'
+DONE = 'done.npy'
+META = 'meta.json'
+
+# State of a warm worker: the model built once and the files it writes to, set by _start
+_worker = None
+
+
+def grid(**axes) -> List[dict]:
+    """
+    Every combination of the values of axes, the last axis varying fastest: grid(gl=[1, 2], r0=[10, 15]) gives
+    [{gl: 1, r0: 10}, {gl: 1, r0: 15}, {gl: 2, r0: 10}, {gl: 2, r0: 15}].
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def sample(n: int, *, seed: int = 0, **ranges) -> List[dict]:
+    """
+    n points drawn uniformly from ranges, (low, high) per parameter, the same points for the same seed.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    u = torch.rand((n, len(ranges)), generator=generator, dtype=torch.double)
+    return [{name: low + (high - low) * u[i, j].item() for j, (name, (low, high)) in enumerate(ranges.items())}
+            for i in range(n)]
+
+
+def branching_tree(c: MainConfig):
+    """
+    Default model of a sweep, the tree of main.py: one segment branching into two, with an input every 100 steps
+    into the first.
+
+    @return: Engine and the segments to record
+    """
+    engine = DendriteEngine(c)
+    configuration = dendrite_default_configuration(c)
+    main = engine.create_segment(**configuration, name="D_main")
+    left = engine.create_segment(**configuration, name="D_branch_L")
+    right = engine.create_segment(**configuration, name="D_branch_R")
+    engine.add_branch(main, left, right)
+    schedule = StimulusSchedule(c)
+    schedule.add_events(main, torch.arange(1, 1000, 100) * c.dendrites.DT, 1, 1 / 8)
+    engine.set_stimulus(schedule)
+    return engine, [main, left, right]
+
+
+def peak_features(values: torch.Tensor, steps: torch.Tensor, dt: float) -> torch.Tensor:
+    """
+    Default features of a sweep point: peak voltage, time of the peak and final voltage of every recorded compartment.
+
+    @param values: Samples (samples, compartments)
+    @param steps: Step of every sample (samples,)
+    """
+    peak, i = values.max(0)
+    return torch.cat((peak, steps[i].float() * dt, values[-1]))
+
+
+class SweepRunner:
+    def __init__(self, c: MainConfig, points, path, n_steps: int, *, build: Callable = branching_tree,
+                 features: Callable = peak_features, every: int = 1, traces: bool = False, workers: int = None,
+                 threads: int = None, progress: Callable = None):
+        """
+        Runs one simulation per point of a parameter sweep across a pool of worker processes. Every worker builds
+        the model once and then only changes the parameters of its segments and restores the initial voltages
+        between points, so coefficients, stimulus and storages are reused.
+
+        Results go into memory-mapped .npy files in the directory path, shared by all workers: features.npy
+        (points, features) with row i for points[i] whatever the order points finish in, traces.npy (points, samples,
+        compartments) with the recorded voltages if traces is set, and done.npy marking finished points. A sweep
+        interrupted by a crash is resumed by running the same sweep on the same path, only unfinished points run
+        again.
+
+        @param points: Parameters of every point, dicts of segment parameters (Ra, r0, k, Cm, gl, El, dt) set on all
+            segments of the model, see grid and sample
+        @param path: Directory of the result files
+        @param n_steps: Steps simulated per point, at least every so every point records a sample
+        @param build: Called as build(c) in every worker, returns the engine with its inputs and the segments to
+            record. Must be picklable, a function defined at module level
+        @param features: Called as features(values, steps, dt) with the samples of every point, returns a 1-D tensor
+            of the same length for every point. Must be picklable
+        @param every: Record after every k-th step, for features and traces
+        @param traces: Also keep the recorded voltages of every point
+        @param workers: Number of worker processes, os.cpu_count() by default, 0 runs the points in this process
+        @param threads: torch threads per worker, DendritesConfig.SWEEP_THREADS by default
+        @param progress: Called as progress(done, total) in this process after every finished point
+        """
+        if every < 1 or n_steps < every:
+            raise ValueError(f"n_steps={n_steps} with every={every} records no sample, n_steps must be at least every")
+        self.c = c
+        self.points = [dict(point) for point in points]
+        self.path = path
+        self.n_steps = n_steps
+        self.build = build
+        self.features_function = features
+        self.every = every
+        self.workers = os.cpu_count() if workers is None else workers
+        self.threads = int(c.dendrites.SWEEP_THREADS if threads is None else threads)
+        self.progress = progress
+
+        engine, record = build(c)
+        probe = Probe(record, every=every)
+        probe.compile(engine.voltage_tables, engine.batch)
+        n_samples = n_steps // every
+        n_features = len(features(torch.zeros((1, probe.values.shape[-1])), torch.zeros(1, dtype=torch.long),
+                                  float(c.dendrites.DT)))
+        meta = dict(points=[{name: _plain(value) for name, value in point.items()} for point in self.points],
+                    n_steps=n_steps, every=every, features=n_features, traces=traces,
+                    compartments=probe.values.shape[-1])
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META)
+        shapes = {FEATURES: (len(self.points), n_features), DONE: (len(self.points),)}
+        if traces:
+            shapes[TRACES] = (len(self.points), n_samples, probe.values.shape[-1])
+        if os.path.exists(meta_path):
+            with open(meta_path) as file:
+                if json.load(file) != meta:
+                    raise ValueError(f"{path} holds results of a different sweep")
+            mode = 'r+'
+        else:
+            mode = 'w+'
+        self.files = {name: np.lib.format.open_memmap(os.path.join(path, name), mode=mode,
+                                                      dtype=np.bool_ if name == DONE else np.float32, shape=shape)
+                      for name, shape in shapes.items()}
+        if mode == 'w+':
+            for array in self.files.values():
+                array.flush()
+            with open(meta_path, 'w') as file:
+                json.dump(meta, file)
+
+    @property
+    def features(self) -> np.ndarray:
+        return self.files[FEATURES]
+
+    @property
+    def traces(self) -> np.ndarray:
+        return self.files.get(TRACES)
+
+    @property
+    def done(self) -> np.ndarray:
+        return self.files[DONE]
+
+    def run(self) -> np.ndarray:
+        """
+        Runs every point not done yet.
+
+        @return: Features of all points (points, features)
+        """
+        pending = [i for i in range(len(self.points)) if not self.done[i]]
+        finished = len(self.points) - len(pending)
+        arguments = (self.c, self.build, self.features_function, self.path, self.n_steps, self.every,
+                     TRACES in self.files, self.threads)
+        if self.workers == 0:
+            _start(*arguments)
+            for i in pending:
+                _run_point(i, self.points[i])
+                finished += 1
+                self._report(finished)
+        elif pending:
+            with ProcessPoolExecutor(min(self.workers, len(pending)), mp_context=mp.get_context('spawn'),
+                                     initializer=_start, initargs=arguments) as pool:
+                futures = [pool.submit(_run_point, i, self.points[i]) for i in pending]
+                for future in as_completed(futures):
+                    future.result()
+                    finished += 1
+                    self._report(finished)
+        # Rows were written through the mappings of the workers
+        for name in self.files:
+            self.files[name] = np.load(os.path.join(self.path, name), mmap_mode='r+')
+        return self.features
+
+    def _report(self, finished: int):
+        if self.progress is not None:
+            self.progress(finished, len(self.points))
+
+
+def _plain(value):
+    """
+    value of a point as written to meta.json, tensors and numpy arrays as (nested) lists of numbers.
+    """
+    if isinstance(value, (torch.Tensor, np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def _start(c, build, features, path, n_steps: int, every: int, traces: bool, threads: int):
+    """
+    Initializer of a worker: builds the model, keeps its initial voltages and parameters and opens the result files.
+    """
+    global _worker
+    torch.set_num_threads(threads)
+    engine, record = build(c)
+    files = {name: np.load(os.path.join(path, name), mmap_mode='r+')
+             for name in (FEATURES, DONE) + ((TRACES,) if traces else ())}
+    _worker = dict(engine=engine, record=record, features=features, files=files, n_steps=n_steps, every=every,
+                   initial={segment: segment.V.clone() for segment in engine.slice_ids},
+                   parameters={segment: {name: getattr(segment, name).clone() for name in PARAMETERS}
+                               for segment in engine.slice_ids})
+
+
+def _run_point(i: int, point: dict) -> int:
+    """
+    Simulates point i in the model of this worker from its initial voltages and writes its row of the result files.
+    Parameters not in point keep the values the model was built with, whatever points ran before in this worker.
+    """
+    engine = _worker['engine']
+    files = _worker['files']
+    for segment, parameters in _worker['parameters'].items():
+        engine.set_parameters(segment, **{**parameters, **point})
+    for segment, V in _worker['initial'].items():
+        segment.V.copy_(V)
+    engine.steps = 0
+    probe = engine.add_probe(Probe(_worker['record'], every=_worker['every'],
+                                   capacity=max(1, _worker['n_steps'] // _worker['every'])))
+    try:
+        engine.run(_worker['n_steps'])
+        steps, values = probe.flush()
+    finally:
+        engine.remove_probe(probe)
+    files[FEATURES][i] = _worker['features'](values, steps, float(engine.c.dendrites.DT)).numpy()
+    if TRACES in files:
+        files[TRACES][i] = values.numpy()
+        files[TRACES].flush()
+    files[FEATURES].flush()
+    # Marked done only once its results are on disk
+    files[DONE][i] = True
+    files[DONE].flush()
+    return i
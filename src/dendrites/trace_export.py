@@ -0,0 +1,107 @@
+import json
+import os
+
+import numpy as np
+
+from dendrites.probe import Probe
+
+VALUES = 'values.npy'
+STEPS = 'steps.npy'
+META = 'meta.json'
+
+
+class TraceExporter:
+    def __init__(self, engine, path, segments, n_steps: int, *, every: int = 1, capacity: int = 1024):
+        """
+        Streams the voltages of segments into memory-mapped .npy files preallocated for n_steps steps, through a probe
+        whose buffer is written out whenever it is full. The directory path gets values.npy (samples, n) or
+        (samples, B, n), steps.npy and meta.json with the columns of every segment, read it back with load_traces.
+        The columns are fixed, recorded segments must not grow while exporting.
+
+        @param engine: DendriteEngine the segments belong to
+        @param segments: Segments to record, all segments of the engine if None
+        @param n_steps: Number of engine steps the files have room for
+        @param every: Record after every k-th step
+        @param capacity: Samples kept in memory between two writes
+        """
+        if n_steps < 1:
+            raise ValueError(f"Traces need room for at least one step, got n_steps={n_steps}")
+        if segments is None:
+            segments = sorted(engine.segments, key=lambda segment: segment.name)
+        self.engine = engine
+        self.path = path
+        self.count = 0
+        self.probe = Probe(segments, every=every, capacity=capacity, sink=self.write)
+        engine.add_probe(self.probe)
+        engine._compiled_probe(self.probe)
+
+        os.makedirs(path, exist_ok=True)
+        n_samples = (engine.steps + n_steps) // every - engine.steps // every
+        shape = (n_samples, *self.probe.values.shape[1:]) if engine.batch is not None else \
+            (n_samples, self.probe.values.shape[-1])
+        self.values = np.lib.format.open_memmap(os.path.join(path, VALUES), mode='w+', dtype=np.float32, shape=shape)
+        self.steps = np.lib.format.open_memmap(os.path.join(path, STEPS), mode='w+', dtype=np.int64,
+                                               shape=(n_samples,))
+        self.meta = dict(segments=[dict(name=segment.name, start=columns.start, stop=columns.stop)
+                                   for segment, columns in self.probe.columns.items()],
+                         every=every,
+                         dt=float(engine.c.dendrites.DT),
+                         batch=engine.batch,
+                         count=0)
+        self._write_meta()
+
+    def write(self, steps, values):
+        """
+        Sink of the probe: appends the flushed samples to the files.
+        """
+        k = len(steps)
+        if values.shape[-1] != self.values.shape[-1]:
+            raise ValueError(f"Recorded segments changed length, the trace files at {self.path} hold the samples "
+                             f"before, export the rest with a new exporter")
+        if self.count + k > len(self.steps):
+            raise ValueError(f"Trace files at {self.path} are full after {len(self.steps)} samples")
+        self.values[self.count:self.count + k] = values.cpu().numpy()
+        self.steps[self.count:self.count + k] = steps.cpu().numpy()
+        self.count += k
+
+    def close(self):
+        """
+        Writes the samples still in the probe, stops recording and records the sample count in meta.json.
+        """
+        self.probe.flush()
+        self.engine.remove_probe(self.probe)
+        self.values.flush()
+        self.steps.flush()
+        self._write_meta()
+
+    def _write_meta(self):
+        self.meta['count'] = self.count
+        with open(os.path.join(self.path, META), 'w') as file:
+            json.dump(self.meta, file, indent=2)
+
+
+class Traces:
+    def __init__(self, path):
+        """
+        Traces written by a TraceExporter, memory-mapped read-only: slicing reads only the pages it touches.
+        """
+        with open(os.path.join(path, META)) as file:
+            self.meta = json.load(file)
+        count = self.meta['count']
+        self.values = np.load(os.path.join(path, VALUES), mmap_mode='r')[:count]
+        self.steps = np.load(os.path.join(path, STEPS), mmap_mode='r')[:count]
+        self.columns = {segment['name']: slice(segment['start'], segment['stop']) for segment in self.meta['segments']}
+
+    @property
+    def times(self):
+        return self.steps * self.meta['dt']
+
+    def __getitem__(self, name) -> np.ndarray:
+        """
+        Voltages of the segment with the given name, a view of the mapped file.
+        """
+        return self.values[..., self.columns[name]]
+
+
+def load_traces(path) -> Traces:
+    return Traces(path)
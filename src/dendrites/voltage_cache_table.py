@@ -3,42 +3,98 @@ import torch
 from dendrites.exceptions import DendriteCacheFull
 from dendrites.segment import DendriteSegment
 
+# Channels of every compartment: voltage, then the coefficients from DendriteSegment.coefficients
+CHANNELS = 6
+
 
 class VoltageCacheTable:
-    def __init__(self, length: int, initial_size: int):
+    def __init__(self, length: int, initial_size: int, batch: int = None):
+        """
+        Slices of all segments with the same length, data has shape (total, CHANNELS, length). Channel 0 holds the
+        voltages, channels 1 to 5 D, dt / Cm, D / dx^2, gl and El of every compartment. data is a view of the first
+        total rows of a preallocated storage, which doubles its capacity when extend runs out of it, so extending
+        costs O(1) amortized and reserved slices keep their rows and D coefficients.
+
+        With batch, data has a leading dimension of B independent replicas, shape (B, total, CHANNELS, length), each
+        with its own voltages and coefficients.
+
+        @param length: Length of segments in the table
+        @param initial_size: Number of slices
+        @param batch: Number of replicas B, None for a single one without the leading dimension
+        """
         self.length = length
+        self.batch = () if batch is None else (batch,)
         self.reserved = dict()
-        self.data = torch.zeros((initial_size, 2, length), dtype=torch.float)
+        self._storage = torch.zeros(self.batch + (initial_size, CHANNELS, length), dtype=torch.float)
+        self.data = self._storage[..., :initial_size, :, :]
         self._free = set(range(initial_size))
+        self.generation = 0
 
     @property
     def total(self):
-        return self.data.shape[0]
+        return self.data.shape[-3]
+
+    @property
+    def capacity(self):
+        return self._storage.shape[-3]
 
     @property
     def free(self):
         return len(self._free)
 
     def extend(self, num: int):
-        self._free.update(range(self.total, self.total + num))
-        self.data = torch.cat((self.data, torch.zeros((num, 2, self.length), dtype=torch.float)), dim=0)
-        for slice_index in self.reserved:
-            self.set_dendrite(slice_index)
+        total = self.total
+        if total + num > self.capacity:
+            storage = torch.zeros(self.batch + (max(2 * self.capacity, total + num), CHANNELS, self.length),
+                                  dtype=torch.float)
+            storage[..., :total, :, :] = self._storage[..., :total, :, :]
+            self._storage = storage
+            self.generation += 1
+        self._free.update(range(total, total + num))
+        self.data = self._storage[..., :total + num, :, :]
 
-    def reserve_slice(self, dendrite: DendriteSegment):
+    def reserve_slice(self, dendrite: DendriteSegment, D: torch.Tensor = None):
         try:
             slice_index = self._free.pop()
         except KeyError:
             raise DendriteCacheFull
         self.reserved[slice_index] = dendrite
-        self.set_dendrite(slice_index)
+        self.set_dendrite(slice_index, D)
         return slice_index
 
+    def reserve_slices(self, dendrites, coefficients: torch.Tensor):
+        """
+        Reserves a slice for each of dendrites and writes their coefficients, (n, 5, length) or (n, B, 5, length),
+        with one indexed copy.
+        """
+        if len(dendrites) > self.free:
+            raise DendriteCacheFull
+        slices = [self._free.pop() for _ in dendrites]
+        for slice_index, dendrite in zip(slices, dendrites):
+            self.reserved[slice_index] = dendrite
+            dendrite.bind(self, slice_index)
+        if coefficients.dim() == 4:
+            coefficients = coefficients.transpose(0, 1)
+        self.data[..., torch.tensor(slices, dtype=torch.long), 1:, :] = coefficients
+        return slices
+
     def free_slice(self, slice_index):
         del self.reserved[slice_index]
         self._free.add(slice_index)
         return slice_index
 
-    def set_dendrite(self, slice_index):
-        self.reserved[slice_index].V = self.data[slice_index, 0]
-        self.data[slice_index, 1] = self.reserved[slice_index].D_batch(self.length)
+    def set_dendrite(self, slice_index, D: torch.Tensor = None):
+        self.reserved[slice_index].bind(self, slice_index)
+        self.set_coefficients(slice_index, D)
+
+    def set_coefficients(self, slice_index, D: torch.Tensor = None):
+        self.data[..., slice_index, 1:, :] = self.reserved[slice_index].coefficients(self.length, D)
+
+    def view(self, slice_index):
+        return self.data[..., slice_index, 0, :]
+
+    def locate(self, slice_index):
+        """
+        Row and first column of a slice in data.
+        """
+        return slice_index, 0
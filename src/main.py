@@ -1,6 +1,9 @@
+import torch
+
 from config import MainConfig, create_tensorboard_writer
 from dendrites.dendrite_engine import DendriteEngine
 from dendrites.segment import dendrite_default_configuration
+from dendrites.stimulus import StimulusSchedule
 
 
 class DendriteApp:
@@ -24,13 +27,16 @@ class DendriteApp:
 if __name__ == '__main__':
     c = MainConfig()
     app = DendriteApp(c)
-    writer = create_tensorboard_writer()
+    writer = create_tensorboard_writer(background=True)
     N = 1000
+    schedule = StimulusSchedule(c)
+    schedule.add_events(app.dendrite_main, torch.arange(1, N, 100) * c.dendrites.DT, 1, 1 / 8)
+    app.dendrite_engine.set_stimulus(schedule)
     for step in range(N):
         app.forward()
         app.log_to_tensorboard(writer, step)
         if (step % 100) == 0:
-            print(f"Step: {step}, signaling..")
-            app.dendrite_main.signal(1, [1/8])
+            print(f"Step: {step}")
+    writer.close()
     print(f"Done, check tensorboard run {writer.run} (tensorboard --logdir=runs)")
 
@@ -0,0 +1,87 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.adaptive_stepper import AdaptiveStepper
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+from dendrites.probe import Probe
+from dendrites.segment import dendrite_default_configuration
+from dendrites.stimulus import StimulusSchedule
+
+N = 2000
+EVERY = 50
+
+
+class TestAdaptiveStepper(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.DT = self.c.dendrites.DT
+
+    def _engine(self, strategy=None):
+        forward_context = ForwardContext(self.c, strategy) if strategy is not None else None
+        engine = DendriteEngine(self.c, forward_context=forward_context)
+        configuration = dendrite_default_configuration(self.c)
+        configuration["LEN"] = 20
+        segments = [engine.create_segment(**configuration, name=f"S{i}") for i in range(3)]
+        engine.add_branch(segments[0], segments[1], segments[2])
+        schedule = StimulusSchedule(self.c)
+        schedule.add_events(segments[1], torch.tensor([0.0, 5.0, 5.5]) + 3 * self.DT, 4, 0.5)
+        engine.set_stimulus(schedule)
+        probe = engine.add_probe(Probe(segments[:1], every=EVERY))
+        return engine, segments, probe
+
+    def test_matches_fixed_step(self):
+        reference, copies, _ = self._engine(ForwardStrategyImplicit(self.c))
+        reference.run(N)
+        engine, segments, _ = self._engine()
+        stepper = AdaptiveStepper(engine)
+        stepper.run(N)
+        self.assertEqual(engine.steps, N)
+        self.assertLess(stepper.accepted, N / 4)
+        self.assertEqual(sum(m * n for m, n in stepper.multiples.items()), N)
+        for segment, copy in zip(segments, copies):
+            self.assertTrue(torch.allclose(segment.V, copy.V, atol=1e-5))
+
+    def test_inputs_and_samples_line_up(self):
+        reference, _, reference_probe = self._engine(ForwardStrategyImplicit(self.c))
+        for _ in range(N):
+            reference.forward()
+        expected_steps, expected = reference_probe.flush()
+        engine, _, probe = self._engine()
+        stepper = AdaptiveStepper(engine)
+        stepper.run(N // 2)
+        stepper.run(N - N // 2)
+        steps, values = probe.flush()
+        self.assertTrue(torch.equal(steps, expected_steps))
+        self.assertTrue(torch.allclose(values, expected, atol=1e-5))
+        self.assertGreater(max(stepper.multiples), 1)
+
+    def test_rejects_steps_above_tolerance(self):
+        engine, segments, _ = self._engine()
+        engine.remove_probe(engine.probes[0])
+        stepper = AdaptiveStepper(engine, max_multiple=256)
+        stepper.run(N)
+        reference, copies, _ = self._engine(ForwardStrategyImplicit(self.c))
+        reference.run(N)
+        for engine_, segments_ in ((engine, segments), (reference, copies)):
+            segments_[0].signal(10, torch.tensor([0.5]))
+        rejected = stepper.rejected
+        stepper.run(N)
+        reference.run(N)
+        self.assertGreater(stepper.rejected, rejected)
+        for segment, copy in zip(segments, copies):
+            self.assertTrue(torch.allclose(segment.V, copy.V, atol=1e-5))
+
+    def test_estimate_only_for_tr_bdf2(self):
+        engine, _, _ = self._engine()
+        strategy = ForwardStrategyImplicit(self.c, method='backward_euler')
+        graph = strategy.graph(engine.voltage_tables, engine.branches)
+        with self.assertRaises(ValueError):
+            strategy.step(graph.gather(engine.voltage_tables), self.DT, estimate=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import threading
+import unittest
+
+import torch
+
+from config import AsyncWriter, MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.log_matshow import log_matshow
+from dendrites.segment import dendrite_default_configuration
+
+
+class RecordingWriter:
+    """
+    Writer that keeps its calls, optionally waiting for an event before each one.
+    """
+
+    def __init__(self, gate: threading.Event = None):
+        self.calls = []
+        self.gate = gate
+        self.run = "test"
+        self.closed = False
+
+    def add_scalar(self, tag, value, step):
+        if self.gate is not None:
+            self.gate.wait()
+        self.calls.append((tag, value, step))
+
+    def add_scalars(self, tag, values, step):
+        self.calls.append((tag, values, step, threading.get_ident()))
+
+    def add_image(self, tag, image, global_step=None):
+        self.calls.append((tag, image, global_step))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class TestAsyncWriter(unittest.TestCase):
+    def test_order_and_snapshot(self):
+        writer = AsyncWriter(RecordingWriter())
+        V = torch.zeros(3)
+        for step in range(10):
+            V += 1
+            writer.add_scalar("V", V, step)
+        writer.close()
+        self.assertTrue(writer.writer.closed)
+        self.assertEqual([step for _, _, step in writer.writer.calls], list(range(10)))
+        self.assertEqual([value[0].item() for _, value, _ in writer.writer.calls], list(range(1, 11)))
+
+    def test_drop_newest(self):
+        gate = threading.Event()
+        writer = AsyncWriter(RecordingWriter(gate), maxsize=2, policy='drop_newest')
+        for step in range(10):
+            writer.add_scalar("V", step, step)
+        gate.set()
+        writer.flush()
+        steps = [step for _, _, step in writer.writer.calls]
+        self.assertEqual(len(steps) + writer.dropped, 10)
+        self.assertEqual(steps, sorted(steps))
+        self.assertEqual(steps[:1], [0])
+
+    def test_drop_oldest(self):
+        gate = threading.Event()
+        writer = AsyncWriter(RecordingWriter(gate), maxsize=2, policy='drop_oldest')
+        for step in range(10):
+            writer.add_scalar("V", step, step)
+        gate.set()
+        writer.flush()
+        steps = [step for _, _, step in writer.writer.calls]
+        self.assertEqual(len(steps) + writer.dropped, 10)
+        self.assertEqual(steps[-2:], [8, 9])
+
+    def test_error_raised_on_flush(self):
+        writer = AsyncWriter(RecordingWriter())
+        writer.add_scalar("V")
+        with self.assertRaises(TypeError):
+            writer.flush()
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            AsyncWriter(RecordingWriter(), policy='drop')
+
+    def test_log_matshow(self):
+        writer = AsyncWriter(RecordingWriter())
+        log_matshow(torch.rand((2, 30, 5)), writer, 3, titles=["D0", "L"])
+        writer.flush()
+        tag, image, step = writer.writer.calls[0]
+        self.assertEqual((tag, step), ("Voltage D0", 3))
+        self.assertEqual(image.shape[0], 3)
+
+    def test_log_voltages(self):
+        # Only a copy of V is queued, the scalars are built on the worker thread
+        c = MainConfig()
+        for batch in (None, 2):
+            engine = DendriteEngine(c, batch=batch)
+            segment = engine.create_segment(**dendrite_default_configuration(c), name="D0")
+            segment.V.fill_(0.5)
+            writer = AsyncWriter(RecordingWriter())
+            engine.log_to_tensorboard(writer, 7)
+            segment.V.fill_(1.0)
+            writer.flush()
+            tags = ["D0/V"] if batch is None else ["D0/V/0", "D0/V/1"]
+            self.assertEqual([tag for tag, *_ in writer.writer.calls], tags)
+            for _, values, step, thread in writer.writer.calls:
+                self.assertEqual(values, {f'{i}': 0.5 for i in range(segment.length)})
+                self.assertEqual(step, 7)
+                self.assertNotEqual(thread, threading.get_ident())
+
+
+if __name__ == '__main__':
+    unittest.main()
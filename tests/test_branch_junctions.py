@@ -0,0 +1,83 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine, EXTEND_STEP
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+from dendrites.segment import dendrite_default_configuration
+
+LEN = 10
+
+
+class TestBranchJunctions(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.configuration = dendrite_default_configuration(self.c)
+        self.configuration["LEN"] = LEN
+
+    def _tree(self, packed=False, children=3):
+        engine = DendriteEngine(self.c, packed=packed)
+        segment = engine.create_segment(**self.configuration, name="D0")
+        branches = [engine.create_segment(**self.configuration, name=f"B{i}") for i in range(children)]
+        engine.add_branch(segment, *branches)
+        return engine, segment, branches
+
+    def test_n_way_junction(self):
+        engine, segment, branches = self._tree()
+        segment.V[LEN - 3] = 0.4
+        branches[0].V[2] = 0.8
+        engine.forward()
+        # Junction compartments of all four arms hold the same value
+        junction = torch.stack([segment.V[-2]] + [branch.V[1] for branch in branches])
+        self.assertTrue(torch.allclose(junction, junction[0].expand(4)))
+        self.assertGreater(branches[2].V[1], 0.0)
+
+    def test_survives_reallocation(self):
+        for packed in (False, True):
+            engine, segment, branches = self._tree(packed, children=2)
+            # Force every storage to reallocate after the branch was added
+            for i in range(2 * EXTEND_STEP):
+                engine.create_segment(**self.configuration, name=f"F{i}")
+            engine.grow(branches[1])
+            segment.V[LEN // 2] = 1.0
+            for _ in range(50):
+                engine.forward()
+            self.assertGreater(branches[0].V[1], 0.0)
+            self.assertGreater(branches[1].V[1], 0.0)
+            self.assertAlmostEqual(branches[0].V[1].item(), branches[1].V[1].item(), places=6)
+
+    def test_matches_implicit_graph(self):
+        DT = self.c.dendrites.DT
+        results = []
+        for strategy in (None, ForwardStrategyImplicit(self.c, method='backward_euler', dt=DT / 4)):
+            engine, segment, branches = self._tree(children=3)
+            if strategy is not None:
+                engine.forward_context.set_strategy(strategy)
+            segment.V[3] = 1.0
+            for _ in range(200 if strategy is None else 800):
+                engine.forward()
+            results.append(torch.cat([segment.V[1:-1]] + [branch.V[1:-1] for branch in branches]))
+        self.assertLess((results[0] - results[1]).abs().max(), 0.05 * results[0].abs().max())
+
+    def test_run_matches_forward(self):
+        engine, segment, _ = self._tree(children=3)
+        reference, reference_segment, _ = self._tree(children=3)
+        segment.V[3] = 1.0
+        reference_segment.V[3] = 1.0
+        engine.run(100)
+        for _ in range(100):
+            reference.forward()
+        key = lambda s: s.name
+        for a, b in zip(sorted(engine.segments, key=key), sorted(reference.segments, key=key)):
+            self.assertTrue(torch.equal(a.V, b.V))
+
+    def test_needs_child(self):
+        engine = DendriteEngine(self.c)
+        segment = engine.create_segment(**self.configuration, name="D0")
+        with self.assertRaises(ValueError):
+            engine.add_branch(segment)
+
+
+if __name__ == '__main__':
+    unittest.main()
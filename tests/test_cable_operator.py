@@ -0,0 +1,78 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_sparse import ForwardStrategySparse
+from dendrites.segment import dendrite_default_configuration
+from dendrites.stimulus import StimulusSchedule
+
+N = 50
+
+
+class TestCableOperator(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+
+    def _engine(self, strategy=None, packed=False, batch=None):
+        forward_context = ForwardContext(self.c, strategy) if strategy is not None else None
+        engine = DendriteEngine(self.c, forward_context=forward_context, packed=packed, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        segments = []
+        for i in range(7):
+            configuration["LEN"] = 5 + i % 3
+            segments.append(engine.create_segment(**configuration, name=f"S{i}"))
+        for i in range(3):
+            engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+        return engine, segments
+
+    def _run(self, strategy=None, packed=False, batch=None):
+        engine, segments = self._engine(strategy, packed, batch)
+        schedule = StimulusSchedule(self.c)
+        schedule.add_events(segments[4], torch.tensor([0.0, 20.0]) * self.c.dendrites.DT, 2, 0.5)
+        engine.set_stimulus(schedule)
+        engine.run(N)
+        engine.grow(segments[2])
+        engine.add_branch(segments[6], engine.create_segment(**dendrite_default_configuration(self.c), name="S7"))
+        engine.run(N)
+        return torch.cat([segment.V for segment in segments], -1)
+
+    def test_matches_default(self):
+        for packed in (False, True):
+            for batch in (None, 2):
+                expected = self._run(packed=packed, batch=batch)
+                V = self._run(ForwardStrategySparse(self.c), packed, batch)
+                self.assertTrue(torch.allclose(V, expected, atol=1e-6), f"packed {packed} batch {batch}")
+
+    def test_rest_is_fixed_point(self):
+        for packed in (False, True):
+            engine, segments = self._engine(packed=packed)
+            operator = engine.operator.assemble()
+            V = operator.gather(engine.voltage_tables)[0]
+            index = torch.cat([operator.index(segment) for segment in segments])
+            after = (operator.matrix @ V + operator.affine)[index]
+            self.assertTrue(torch.allclose(after, V[index], atol=1e-6))
+
+    def test_incremental(self):
+        engine, segments = self._engine()
+        engine.operator.assemble()
+        self.assertEqual(engine.operator.computed, len(segments))
+        engine.grow(segments[3])
+        engine.operator.assemble()
+        self.assertEqual(engine.operator.computed, len(segments) + 1)
+        engine.add_branch(segments[5], engine.create_segment(**dendrite_default_configuration(self.c), name="S7"))
+        engine.set_parameters(segments[0], gl=2 * segments[0].gl)
+        engine.operator.assemble()
+        self.assertEqual(engine.operator.computed, len(segments) + 3)
+
+    def test_replicas_need_equal_parameters(self):
+        engine, segments = self._engine(batch=2)
+        engine.set_parameters(segments[0], gl=torch.tensor([1.0, 2.0]) * segments[0].gl)
+        with self.assertRaises(ValueError):
+            engine.operator.assemble()
+
+
+if __name__ == '__main__':
+    unittest.main()
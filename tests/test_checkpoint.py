@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.segment import dendrite_default_configuration
+
+N = 40
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _engine(self, packed=False, batch=None):
+        engine = DendriteEngine(self.c, packed=packed, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        gl = torch.linspace(1.0, 3.0, batch) if batch is not None else 1.5
+        segment = engine.create_segment(**{**configuration, 'gl': gl}, name="D0")
+        branch_L = engine.create_segment(**configuration, name="L")
+        configuration["LEN"] = 7
+        branch_R = engine.create_segment(**configuration, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        stimulus = torch.full((N, batch or 1), 0.05).squeeze(-1)
+        engine.run(N, stimuli=[(segment, 1, stimulus)])
+        # Leave a free slice and, in the packed buffer, a hole
+        engine.grow(branch_L)
+        return engine, [segment, branch_L, branch_R]
+
+    def test_restore_continues(self):
+        for packed in (False, True):
+            for batch in (None, 3):
+                for mmap in (False, True):
+                    engine, segments = self._engine(packed, batch)
+                    engine.save(self.directory.name)
+                    restored = DendriteEngine.load(self.c, self.directory.name, mmap=mmap)
+                    self.assertEqual(restored.steps, N)
+                    by_name = {segment.name: segment for segment in restored.slice_ids}
+                    for segment in segments:
+                        self.assertTrue(torch.equal(by_name[segment.name].V, segment.V))
+                        self.assertTrue(torch.equal(by_name[segment.name].gl, segment.gl))
+                    engine.run(N)
+                    restored.run(N)
+                    for _ in range(5):
+                        engine.forward()
+                        restored.forward()
+                    for segment in segments:
+                        self.assertTrue(torch.equal(by_name[segment.name].V, segment.V))
+
+    def test_modify_after_restore(self):
+        for packed in (False, True):
+            engine, segments = self._engine(packed)
+            engine.save(self.directory.name)
+            restored = DendriteEngine.load(self.c, self.directory.name, mmap=True)
+            by_name = {segment.name: segment for segment in restored.slice_ids}
+            for engine_, (D0, L, R) in ((engine, segments), (restored, [by_name[name] for name in ("D0", "L", "R")])):
+                engine_.grow_many([D0, R], [2, 1])
+                engine_.add_branch(R, engine_.create_segment(**dendrite_default_configuration(self.c), name="RR"))
+                engine_.set_parameters(L, gl=2.5)
+                engine_.run(N)
+            for segment in segments:
+                self.assertTrue(torch.equal(by_name[segment.name].V, segment.V))
+            self.assertEqual(restored.count, engine.count)
+
+
+if __name__ == '__main__':
+    unittest.main()
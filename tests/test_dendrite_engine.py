@@ -1,9 +1,12 @@
 import unittest
+import unittest.mock
 from pprint import pprint
 
+import torch
+
 from config import MainConfig
 from dendrites.segment import DendriteSegment, dendrite_default_configuration
-from dendrites.voltage_cache_table import VoltageCacheTable
+from dendrites.voltage_cache_table import CHANNELS, VoltageCacheTable
 from dendrites.boundary.boundary_context import BoundaryContext
 from dendrites.forward.forward_context import ForwardContext
 from dendrites.dendrite_engine import DendriteEngine
@@ -22,7 +25,7 @@ class TestVoltageCacheTable(unittest.TestCase):
         """Test the initial setup of the VoltageCacheTable."""
         self.assertEqual(self.cache_table.total, self.initial_size)
         self.assertEqual(self.cache_table.free, self.initial_size)
-        self.assertEqual(self.cache_table.data.shape, (self.initial_size, 2, self.length))
+        self.assertEqual(self.cache_table.data.shape, (self.initial_size, CHANNELS, self.length))
 
     def test_reserve_and_free_slice(self):
         """Test reserving and freeing a slice in the voltage cache."""
@@ -42,7 +45,23 @@ class TestVoltageCacheTable(unittest.TestCase):
         self.cache_table.extend(5)
         self.assertEqual(self.cache_table.total, self.initial_size + 5)
         self.assertEqual(self.cache_table.free, self.initial_size + 5)
-        self.assertEqual(self.cache_table.data.shape, (self.initial_size + 5, 2, self.length))
+        self.assertEqual(self.cache_table.data.shape, (self.initial_size + 5, CHANNELS, self.length))
+
+    def test_extend_amortized(self):
+        """Test that extending keeps reserved slices in place and does not recompute D."""
+        segment = DendriteSegment(dx=1.0, dt=1.0, r0=5.0, k=0.01, gl=1.0, El=-65.0, Cm=1.0, Ra=100.0, name="seg1",
+                                  LEN=self.length)
+        slice_id = self.cache_table.reserve_slice(segment)
+        segment.V.fill_(1.0)
+        D = self.cache_table.data[slice_id, 1].clone()
+        with unittest.mock.patch.object(DendriteSegment, 'D_batch') as D_batch:
+            for _ in range(10):
+                self.cache_table.extend(self.initial_size)
+            D_batch.assert_not_called()
+        self.assertEqual(self.cache_table.total, 11 * self.initial_size)
+        self.assertLess(self.cache_table.capacity, 4 * self.cache_table.total)
+        self.assertTrue((segment.V == 1.0).all())
+        self.assertTrue(torch.equal(self.cache_table.data[slice_id, 1], D))
 
     def test_cache_full_exception(self):
         """Test that a DendriteCacheFull exception is raised when cache is full."""
@@ -135,10 +154,10 @@ class TestDendriteEngine(unittest.TestCase):
 
         self.engine.add_branch(self.segment, branch_L, branch_R)
 
-        # Check that branches have been added to the lists
-        self.assertEqual(len(self.engine.branchesM), 1)
-        self.assertEqual(len(self.engine.branchesL), 1)
-        self.assertEqual(len(self.engine.branchesR), 1)
+        # Check that the junction has been added with one arm per segment
+        self.assertEqual(len(self.engine.branches), 1)
+        self.assertEqual(len(self.engine.junctions), 1)
+        self.assertEqual(len(self.engine.junctions.arms), 3)
 
     def test_logging(self):
         """Test logging a segment's data to TensorBoard (mock test)."""
@@ -0,0 +1,83 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+from dendrites.segment import dendrite_default_configuration
+
+LEN = 8
+B = 4
+N = 50
+
+
+class TestDendriteEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.configuration = dendrite_default_configuration(self.c)
+        self.configuration["LEN"] = LEN
+        self.gl = torch.tensor([0.5, 1.0, 2.0, 4.0])
+        self.signal = torch.rand((N, B)) * 0.1
+
+    def _tree(self, gl, packed=False, batch=None):
+        engine = DendriteEngine(self.c, packed=packed, batch=batch)
+        segment = engine.create_segment(**{**self.configuration, 'gl': gl}, name="D0")
+        branch_L = engine.create_segment(**self.configuration, name="L")
+        branch_R = engine.create_segment(**{**self.configuration, 'LEN': LEN + 2}, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        return engine, (segment, branch_L, branch_R)
+
+    def _replicas(self, packed=False):
+        """
+        Reference: one engine per replica.
+        """
+        replicas = []
+        for b in range(B):
+            engine, segments = self._tree(self.gl[b], packed)
+            for step in range(N):
+                segments[0].signal(1, self.signal[step:step + 1, b])
+                engine.forward()
+            replicas.append(segments)
+        return replicas
+
+    def test_matches_separate_engines(self):
+        for packed in (False, True):
+            replicas = self._replicas(packed)
+            engine, segments = self._tree(self.gl, packed, batch=B)
+            self.assertEqual(segments[0].V.shape, (B, LEN))
+            for step in range(N):
+                segments[0].signal(1, self.signal[step:step + 1])
+                engine.forward()
+            for b in range(B):
+                for segment, reference in zip(segments, replicas[b]):
+                    self.assertTrue(torch.allclose(segment.V[b], reference.V, atol=1e-6))
+
+    def test_run(self):
+        for packed in (False, True):
+            replicas = self._replicas(packed)
+            engine, segments = self._tree(self.gl, packed, batch=B)
+            recorded = engine.run(N, stimuli=[(segments[0], 1, self.signal)], record=[segments[2]])
+            self.assertEqual(recorded[segments[2]].shape, (N, B, LEN + 2))
+            for b in range(B):
+                self.assertTrue(torch.allclose(recorded[segments[2]][-1, b], replicas[b][2].V, atol=1e-6))
+
+    def test_grow(self):
+        engine, segments = self._tree(self.gl, batch=B)
+        segments[1].V.copy_(torch.rand((B, LEN)))
+        before = segments[1].V.clone()
+        engine.grow(segments[1])
+        engine.grow_many([segments[0], segments[1]], [1, 2])
+        self.assertEqual(segments[1].V.shape, (B, LEN + 3))
+        self.assertTrue(torch.equal(segments[1].V[:, :LEN], before))
+        self.assertTrue(torch.equal(segments[1].V[:, -1], before[:, -1]))
+
+    def test_implicit_not_supported(self):
+        engine, _ = self._tree(self.gl, batch=B)
+        engine.forward_context.set_strategy(ForwardStrategyImplicit(self.c))
+        with self.assertRaises(ValueError):
+            engine.forward()
+
+
+if __name__ == '__main__':
+    unittest.main()
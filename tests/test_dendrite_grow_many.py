@@ -0,0 +1,102 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.exceptions import DendriteRadiusError
+from dendrites.segment import dendrite_default_configuration, DendriteSegment
+
+N = 300
+
+
+class TestDendriteGrowMany(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.configuration = dendrite_default_configuration(self.c)
+
+    def _engine(self, packed):
+        engine = DendriteEngine(self.c, packed=packed)
+        segments = [engine.create_segment(**self.configuration, name=f"D{i}") for i in range(N)]
+        for i, segment in enumerate(segments):
+            segment.V.copy_(torch.arange(segment.length) + i)
+        return engine, segments
+
+    def test_grow_many_matches_grow(self):
+        for packed in (False, True):
+            engine, segments = self._engine(packed)
+            batched, batched_segments = self._engine(packed)
+            deltas = [i % 3 for i in range(N)]
+            for segment, delta in zip(segments, deltas):
+                for _ in range(delta):
+                    engine.grow(segment)
+            new_lengths = batched.grow_many(batched_segments, deltas)
+            self.assertEqual(new_lengths, [segment.length for segment in segments])
+            for segment, batched_segment in zip(segments, batched_segments):
+                self.assertTrue(torch.equal(segment.V, batched_segment.V))
+
+    def test_grow_many_duplicates(self):
+        # The same segment twice grows by the sum of its deltas, as inside a transaction
+        for packed in (False, True):
+            engine, segments = self._engine(packed)
+            expected = segments[0].V.clone()
+            LEN = self.configuration["LEN"]
+            self.assertEqual(engine.grow_many([segments[0], segments[1], segments[0]], [1, 1, 2]),
+                             [LEN + 3, LEN + 1, LEN + 3])
+            self.assertEqual(segments[0].length, LEN + 3)
+            self.assertTrue(torch.equal(segments[0].V[:LEN], expected))
+            self.assertTrue(torch.equal(segments[0].V[LEN:], expected[-1].expand(3)))
+            with engine.transaction():
+                self.assertEqual(engine.grow_many([segments[1], segments[1]], [1, 1]), [LEN + 3, LEN + 3])
+            self.assertEqual(segments[1].length, LEN + 3)
+
+    def test_grow_many_reallocates_once(self):
+        engine, segments = self._engine(False)
+        engine.grow_many(segments, 2)
+        table = engine.voltage_tables[self.configuration["LEN"] + 2]
+        self.assertEqual(table.generation, 0)
+        self.assertEqual(set(engine.voltage_tables), {self.configuration["LEN"] + 2})
+
+    def test_grow_many_radius(self):
+        engine, segments = self._engine(False)
+        with self.assertRaises(DendriteRadiusError):
+            engine.grow_many(segments[:2], [1, 10000])
+        self.assertEqual(segments[0].length, self.configuration["LEN"])
+
+    def test_transaction(self):
+        engine = DendriteEngine(self.c)
+        segment = engine.create_segment(**self.configuration, name="D0")
+        segment.V.fill_(1.0)
+        with engine.transaction():
+            branch_L = engine.create_segment(**self.configuration, name="L")
+            branch_R = engine.create_segment(**self.configuration, name="R")
+            self.assertIsNone(branch_L.V)
+            self.assertEqual(engine.grow(segment), self.configuration["LEN"] + 1)
+            self.assertEqual(engine.grow(segment), self.configuration["LEN"] + 2)
+            engine.add_branch(segment, branch_L, branch_R)
+            self.assertEqual(segment.length, self.configuration["LEN"])
+            self.assertEqual(len(engine.branches), 0)
+        self.assertEqual(segment.length, self.configuration["LEN"] + 2)
+        self.assertTrue((segment.V == 1.0).all())
+        self.assertEqual(len(branch_L.V), self.configuration["LEN"])
+        self.assertEqual(len(engine.branches), 1)
+        engine.forward()
+
+    def test_transaction_rollback(self):
+        engine = DendriteEngine(self.c)
+        with self.assertRaises(KeyError):
+            with engine.transaction():
+                engine.add_segment(DendriteSegment(**self.configuration, name="D0"))
+                raise KeyError
+        self.assertEqual(len(engine.segments), 0)
+        self.assertIsNone(engine._transaction)
+        # Rows of segments created in the block are freed
+        with self.assertRaises(KeyError):
+            with engine.transaction():
+                engine.create_segment(**self.configuration, name="D1")
+                raise KeyError
+        self.assertEqual(engine.parameters.free, engine.parameters.count)
+
+
+if __name__ == '__main__':
+    unittest.main()
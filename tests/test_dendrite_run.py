@@ -0,0 +1,62 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+from dendrites.segment import dendrite_default_configuration
+
+N = 300
+
+
+class TestDendriteRun(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.signal = torch.zeros(N)
+        self.signal[::100] = 1 / 8
+        self.noise = torch.rand(N) * 0.01
+
+    def _engine(self):
+        engine = DendriteEngine(self.c)
+        configuration = dendrite_default_configuration(self.c)
+        segment = engine.create_segment(**configuration, name="D0")
+        branch_L = engine.create_segment(**configuration, name="L")
+        configuration["LEN"] = 7
+        branch_R = engine.create_segment(**configuration, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        return engine, (segment, branch_L, branch_R)
+
+    def test_run_matches_forward(self):
+        engine, (segment, branch_L, branch_R) = self._engine()
+        expected = torch.zeros((N, branch_R.length))
+        for step in range(N):
+            segment.signal(1, self.signal[step:step + 1])
+            branch_R.signal(-2, self.noise[step:step + 1])
+            engine.forward()
+            expected[step] = branch_R.V
+
+        fused, (fused_segment, fused_L, fused_R) = self._engine()
+        recorded = fused.run(N, stimuli=[(fused_segment, 1, self.signal), (fused_R, -2, self.noise)],
+                             record=[fused_R, fused_segment])
+        self.assertEqual(recorded[fused_R].shape, (N, fused_R.length))
+        self.assertTrue(torch.allclose(recorded[fused_R], expected))
+        self.assertTrue(torch.allclose(recorded[fused_segment][-1], segment.V))
+        self.assertTrue(torch.allclose(fused_L.V, branch_L.V))
+
+    def test_run_without_stimuli(self):
+        engine, (segment, _, _) = self._engine()
+        segment.V[2] = 1.0
+        self.assertEqual(engine.run(10), {})
+        self.assertLess(segment.V[2], 1.0)
+
+    def test_run_other_strategy(self):
+        engine, (segment, _, branch_R) = self._engine()
+        engine.forward_context.set_strategy(ForwardStrategyImplicit(self.c))
+        recorded = engine.run(20, stimuli=[(segment, 1, self.signal)], record=[branch_R])
+        self.assertEqual(recorded[branch_R].shape, (20, branch_R.length))
+        self.assertTrue(torch.allclose(recorded[branch_R][-1], branch_R.V))
+
+
+if __name__ == '__main__':
+    unittest.main()
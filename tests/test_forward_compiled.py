@@ -0,0 +1,67 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_compiled import ForwardStrategyCompiled, step_torchscript
+from dendrites.segment import dendrite_default_configuration
+
+N = 20
+
+
+def failing_step(*args):
+    raise RuntimeError("no compiler")
+
+
+class TestForwardCompiled(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+
+    def _run(self, strategy=None, packed=False, batch=None):
+        forward_context = ForwardContext(self.c, strategy) if strategy is not None else None
+        engine = DendriteEngine(self.c, forward_context=forward_context, packed=packed, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        segment = engine.create_segment(**configuration, name="D0")
+        branch_L = engine.create_segment(**configuration, name="L")
+        configuration["LEN"] = 7
+        branch_R = engine.create_segment(**configuration, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        branch_R.V[..., 3] = 0.5
+        engine.run(N)
+        engine.grow(segment)
+        engine.run(N)
+        return torch.cat([segment.V, branch_L.V, branch_R.V], -1)
+
+    @unittest.skipUnless(hasattr(torch, 'compile'), "torch.compile not available")
+    def test_matches_default(self):
+        strategy = ForwardStrategyCompiled(self.c)
+        V = self._run(strategy)
+        self.assertTrue(torch.allclose(V, self._run(), atol=1e-6))
+        self.assertTrue(strategy.compiled)
+
+    def test_fallback(self):
+        for packed in (False, True):
+            for batch in (None, 2):
+                strategy = ForwardStrategyCompiled(self.c)
+                strategy.compiled = True
+                strategy._step = failing_step
+                with self.assertWarns(RuntimeWarning):
+                    V = self._run(strategy, packed, batch)
+                self.assertFalse(strategy.compiled)
+                self.assertIs(strategy._step, step_torchscript)
+                self.assertTrue(torch.equal(V, self._run(packed=packed, batch=batch)))
+
+    def test_errors_after_first_step_propagate(self):
+        strategy = ForwardStrategyCompiled(self.c)
+        strategy._step = step_torchscript
+        strategy.compiled = True
+        self._run(strategy)
+        strategy._step = failing_step
+        with self.assertRaises(RuntimeError):
+            self._run(strategy)
+
+
+if __name__ == '__main__':
+    unittest.main()
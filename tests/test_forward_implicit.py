@@ -0,0 +1,69 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+from dendrites.segment import dendrite_default_configuration
+
+LEN = 12
+T = 2.0
+
+
+class TestForwardImplicit(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+
+    def _run(self, strategy, dt):
+        engine = DendriteEngine(self.c)
+        if strategy is not None:
+            engine.forward_context.set_strategy(strategy)
+        configuration = dendrite_default_configuration(self.c)
+        configuration["LEN"] = LEN
+        segment = engine.create_segment(**configuration, name="D0")
+        branch_L = engine.create_segment(**configuration, name="L")
+        branch_R = engine.create_segment(**configuration, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        segment.V[3] = 1.0
+        for _ in range(round(T / dt)):
+            engine.forward()
+        return torch.cat((segment.V, branch_L.V, branch_R.V))
+
+    def test_matches_explicit(self):
+        DT = self.c.dendrites.DT
+        explicit = self._run(None, DT)
+        for method in ('backward_euler', 'crank_nicolson', 'tr_bdf2'):
+            implicit = self._run(ForwardStrategyImplicit(self.c, method=method), DT)
+            self.assertLess((implicit - explicit).abs().max(), 0.1 * explicit.abs().max())
+
+    def test_large_dt(self):
+        DT = self.c.dendrites.DT
+        reference = self._run(ForwardStrategyImplicit(self.c, dt=DT / 16), DT / 16)
+        explicit_error = (self._run(None, DT) - reference).abs().max()
+        implicit = self._run(ForwardStrategyImplicit(self.c, dt=DT * 16), DT * 16)
+        self.assertLess((implicit - reference).abs().max(), explicit_error)
+
+    def test_stable_beyond_explicit_limit(self):
+        DT = self.c.dendrites.DT * 64
+        V = self._run(ForwardStrategyImplicit(self.c, method='backward_euler', dt=DT), DT)
+        self.assertTrue(torch.isfinite(V).all())
+        self.assertLess(V.abs().max(), 1.0)
+
+    def test_grow_after_forward(self):
+        engine = DendriteEngine(self.c)
+        engine.forward_context.set_strategy(ForwardStrategyImplicit(self.c))
+        segment = engine.create_segment(**dendrite_default_configuration(self.c), name="D0")
+        segment.V.fill_(1.0)
+        engine.forward()
+        engine.grow(segment)
+        engine.forward()
+        self.assertTrue((segment.V > 0.5).all())
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            ForwardStrategyImplicit(self.c, method='rk4')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites import numpy_kernels
+from dendrites.boundary.boundary_context import BoundaryContext
+from dendrites.boundary.boundary_strategy_numpy import BoundaryStrategyNumpy
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_numpy import ForwardStrategyNumpy
+from dendrites.segment import dendrite_default_configuration
+from dendrites.stimulus import StimulusSchedule
+
+N = 50
+
+
+class TestForwardNumpy(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+
+    def _run(self, strategy=None, boundary_strategy=None, packed=False, batch=None):
+        engine = DendriteEngine(self.c, ForwardContext(self.c, strategy), BoundaryContext(boundary_strategy),
+                                packed=packed, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        segments = []
+        for i in range(7):
+            configuration["LEN"] = 5 + i % 3
+            segments.append(engine.create_segment(**configuration, name=f"S{i}"))
+        for i in range(3):
+            engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+        schedule = StimulusSchedule(self.c)
+        schedule.add_events(segments[4], torch.tensor([0.0, 20.0]) * self.c.dendrites.DT, 2, 0.5)
+        engine.set_stimulus(schedule)
+        engine.run(N)
+        engine.grow(segments[2])
+        engine.run(N)
+        return torch.cat([segment.V for segment in segments], -1)
+
+    def _strategies(self):
+        yield ForwardStrategyNumpy(self.c, jit=False), None
+        yield None, BoundaryStrategyNumpy()
+        if numpy_kernels.numba is not None:
+            yield ForwardStrategyNumpy(self.c, jit=True), None
+
+    def test_matches_torch(self):
+        for packed in (False, True):
+            for batch in (None, 2):
+                expected = self._run(packed=packed, batch=batch)
+                for strategy, boundary_strategy in self._strategies():
+                    V = self._run(strategy, boundary_strategy, packed, batch)
+                    self.assertTrue(torch.equal(V, expected), f"{strategy} {boundary_strategy}")
+
+    def test_jit_needs_numba(self):
+        if numpy_kernels.numba is None:
+            with self.assertRaises(ImportError):
+                ForwardStrategyNumpy(self.c, jit=True)
+        else:
+            self.assertTrue(ForwardStrategyNumpy(self.c).jit)
+
+    def test_junction_members(self):
+        members = numpy_kernels.junction_members(torch.tensor([0, 1, 0, 1, 1]).numpy(),
+                                                 torch.tensor([2.0, 3.0]).numpy())
+        self.assertEqual(members.tolist(), [[0, 2, 5], [1, 3, 4]])
+
+
+if __name__ == '__main__':
+    unittest.main()
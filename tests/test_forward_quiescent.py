@@ -0,0 +1,97 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_quiescent import ForwardStrategyQuiescent
+from dendrites.segment import dendrite_default_configuration
+
+N = 200
+# Blocks narrower than the segments, so segments are split and the last block overlaps
+WIDTH = 4
+
+
+class TestForwardQuiescent(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.EL = self.c.dendrites.EL
+
+    def _engine(self, strategy=None, packed=False, batch=None):
+        forward_context = ForwardContext(self.c, strategy) if strategy is not None else None
+        engine = DendriteEngine(self.c, forward_context=forward_context, packed=packed, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        configuration["LEN"] = 11
+        segment = engine.create_segment(**configuration, name="D0")
+        branch_L = engine.create_segment(**configuration, name="L")
+        configuration["LEN"] = 7
+        branch_R = engine.create_segment(**configuration, name="R")
+        leaf = engine.create_segment(**configuration, name="LL")
+        engine.add_branch(segment, branch_L, branch_R)
+        engine.add_branch(branch_L, leaf)
+        segments = [segment, branch_L, branch_R, leaf]
+        for segment in segments:
+            segment.V.fill_(self.EL)
+        return engine, segments
+
+    def _run(self, strategy=None, packed=False, batch=None):
+        engine, segments = self._engine(strategy, packed, batch)
+        for step in range(N):
+            if step % 50 == 0:
+                segments[3].signal(2, torch.tensor([0.5]))
+            engine.forward()
+        return torch.cat([segment.V for segment in segments], -1)
+
+    def test_exact_at_zero_tolerance(self):
+        for packed in (False, True):
+            for batch in (None, 2):
+                expected = self._run(packed=packed, batch=batch)
+                strategy = ForwardStrategyQuiescent(self.c, tolerance=0.0, width=WIDTH)
+                self.assertTrue(torch.equal(self._run(strategy, packed, batch), expected))
+
+    def test_error_within_tolerance(self):
+        tolerance = 1e-4
+        for packed in (False, True):
+            expected = self._run(packed=packed)
+            strategy = ForwardStrategyQuiescent(self.c, tolerance=tolerance, width=WIDTH)
+            self.assertLess((self._run(strategy, packed) - expected).abs().max(), tolerance)
+
+    def test_rest_is_skipped(self):
+        for packed in (False, True):
+            strategy = ForwardStrategyQuiescent(self.c, width=WIDTH)
+            engine, segments = self._engine(strategy, packed)
+            engine.forward()
+            self.assertEqual(strategy.updated, 0)
+            self.assertGreater(strategy.total, 0)
+            segments[0].signal(1, torch.tensor([0.5]))
+            engine.forward()
+            self.assertGreater(strategy.active_fraction, 0.0)
+            self.assertLess(strategy.active_fraction, 0.5)
+
+    def test_wakes_through_junction(self):
+        for packed in (False, True):
+            strategy = ForwardStrategyQuiescent(self.c, width=WIDTH)
+            engine, segments = self._engine(strategy, packed)
+            root, branch_L, branch_R, leaf = segments
+            root.signal(root.length - 2, torch.tensor([0.5]))
+            for _ in range(N):
+                engine.forward()
+            for segment in (branch_L, branch_R, leaf):
+                self.assertGreater((segment.V - self.EL).abs().max(), 1e-4)
+
+    def test_grow(self):
+        strategy = ForwardStrategyQuiescent(self.c, tolerance=0.0, width=WIDTH)
+        engine, segments = self._engine(strategy)
+        reference, copies = self._engine()
+        for engine_, segments_ in ((engine, segments), (reference, copies)):
+            segments_[1].signal(3, torch.tensor([0.5]))
+            engine_.forward()
+            engine_.grow(segments_[1])
+            engine_.run(20)
+        for segment, copy in zip(segments, copies):
+            self.assertTrue(torch.equal(segment.V, copy.V))
+
+
+if __name__ == '__main__':
+    unittest.main()
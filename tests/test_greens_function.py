@@ -0,0 +1,48 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+from dendrites.greens_function import GreensFunction
+from dendrites.segment import dendrite_default_configuration
+
+LEN = 12
+
+
+class TestGreensFunction(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.engine = DendriteEngine(self.c)
+        configuration = dendrite_default_configuration(self.c)
+        configuration["LEN"] = LEN
+        self.segment = self.engine.create_segment(**configuration, name="D0")
+        self.branch_L = self.engine.create_segment(**configuration, name="L")
+        self.branch_R = self.engine.create_segment(**configuration, name="R")
+        self.engine.add_branch(self.segment, self.branch_L, self.branch_R)
+        self.segment.V[3] = 1.0
+
+    def test_matches_forward(self):
+        green = GreensFunction(self.engine)
+        dt = self.c.dendrites.DT / 16
+        self.engine.forward_context.set_strategy(ForwardStrategyImplicit(self.c, dt=dt))
+        for _ in range(round(1.0 / dt)):
+            self.engine.forward()
+        x = torch.arange(LEN, dtype=torch.float)
+        for segment in (self.segment, self.branch_L, self.branch_R):
+            self.assertLess((green.at(segment, x, 1.0) - segment.V).abs().max(), 1e-5)
+
+    def test_initial_state(self):
+        green = GreensFunction(self.engine)
+        self.assertAlmostEqual(green.at(self.segment, 3.0, 0.0).item(), 1.0, places=5)
+        self.assertEqual(green.at(self.segment, [2.5, 3.0], [0.5, 1.0, 2.0]).shape, (3, 2))
+
+    def test_decays_to_rest(self):
+        green = GreensFunction(self.engine)
+        V = green.voltage(100.0)
+        self.assertLess((V - self.c.dendrites.EL).abs().max(), 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
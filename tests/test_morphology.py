@@ -0,0 +1,68 @@
+import io
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.morphology import load_swc
+
+# Soma with two dendrites, the apical one forks after 8 units
+SWC = """# id type x y z radius parent
+1 1 0 0 0 10 -1
+2 3 0 -3 0 4 1
+3 3 0 -6 0 3 2
+4 4 0 4 0 8 1
+5 4 0 8 0 6 4
+6 4 3 8 0 2 5
+7 4 6 8 0 1 6
+8 4 0 14 0 4 5
+"""
+
+
+class TestMorphology(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+
+    def test_segments_and_branches(self):
+        for packed in (False, True):
+            engine = DendriteEngine(self.c, packed=packed)
+            segments = load_swc(engine, io.StringIO(SWC), min_length=4)
+            self.assertEqual([segment.name for segment in segments], ["soma_0", "basal_1", "apical_2", "apical_3",
+                                                                      "apical_4"])
+            self.assertEqual([segment.length for segment in segments], [4, 6, 8, 6, 6])
+            soma, basal, apical, fork_1, fork_2 = segments
+            self.assertEqual(engine.branches, [(soma, (basal, apical)), (apical, (fork_1, fork_2))])
+            self.assertAlmostEqual(apical.r0.item(), 8.0)
+            self.assertAlmostEqual(apical.radius(apical.length).item(), 6.0, places=5)
+            self.assertAlmostEqual(fork_1.radius(fork_1.length).item(), 1.0, places=5)
+            self.assertEqual(len(engine.segments), 5)
+
+    def test_matches_create_segment(self):
+        engine = DendriteEngine(self.c)
+        segments = load_swc(engine, io.StringIO(SWC), min_length=4)
+        reference = DendriteEngine(self.c)
+        copies = [reference.create_segment(**{**segment.configuration, 'r0': segment.r0}, name=segment.name,
+                                           LEN=segment.length) for segment in segments]
+        for segment, *children in [(0, 1, 2), (2, 3, 4)]:
+            reference.add_branch(copies[segment], *[copies[child] for child in children])
+        for engine_, segments_ in ((engine, segments), (reference, copies)):
+            segments_[2].V[1] = 0.5
+            engine_.run(50)
+        for segment, copy in zip(segments, copies):
+            self.assertTrue(torch.equal(segment.V, copy.V))
+
+    def test_parents_after_children(self):
+        lines = SWC.strip().split("\n")
+        engine = DendriteEngine(self.c)
+        segments = load_swc(engine, [lines[0]] + lines[:0:-1], min_length=4)
+        self.assertEqual(sorted(segment.length for segment in segments), [4, 6, 6, 6, 8])
+        self.assertEqual(len(engine.branches), 2)
+
+    def test_unknown_parent(self):
+        with self.assertRaises(ValueError):
+            load_swc(DendriteEngine(self.c), io.StringIO(SWC + "9 3 0 0 1 1 42\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine, PACKED
+from dendrites.packed_voltage_buffer import PackedVoltageBuffer
+from dendrites.segment import DendriteSegment, dendrite_default_configuration
+from dendrites.voltage_cache_table import CHANNELS
+
+
+class TestPackedVoltageBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buffer = PackedVoltageBuffer(8)
+
+    def _segment(self, length):
+        return DendriteSegment(dx=1.0, dt=1.0, r0=5.0, k=0.01, gl=1.0, El=-65.0, Cm=1.0, Ra=100.0, name="seg",
+                               LEN=length)
+
+    def test_reserve_and_free_slice(self):
+        segment = self._segment(5)
+        slice_id = self.buffer.reserve_slice(segment, 5)
+        self.assertEqual(self.buffer.data.shape, (1, CHANNELS, 5))
+        self.assertEqual(len(segment.V), 5)
+        self.assertEqual(self.buffer.first.tolist(), [0])
+        self.assertEqual(self.buffer.last.tolist(), [4])
+        self.buffer.free_slice(slice_id)
+        self.assertEqual(self.buffer.holes, 5)
+        self.assertEqual(len(self.buffer.first), 0)
+
+    def test_views_survive_reallocation(self):
+        segments = [self._segment(length) for length in (3, 4, 5, 6)]
+        for i, segment in enumerate(segments):
+            self.buffer.reserve_slice(segment, segment.length)
+            segment.V.fill_(i)
+        self.assertGreaterEqual(self.buffer.total, 18)
+        for i, segment in enumerate(segments):
+            self.assertTrue((segment.V == i).all())
+
+    def test_compact(self):
+        segments = [self._segment(4) for _ in range(4)]
+        slice_ids = [self.buffer.reserve_slice(segment, 4) for segment in segments]
+        for i, segment in enumerate(segments):
+            segment.V.fill_(i)
+        self.buffer.free_slice(slice_ids[0])
+        self.buffer.free_slice(slice_ids[2])
+        self.buffer.compact()
+        self.assertEqual(self.buffer.end, 8)
+        self.assertTrue((segments[1].V == 1).all())
+        self.assertTrue((segments[3].V == 3).all())
+        self.assertEqual(self.buffer.first.tolist(), [0, 4])
+
+
+class TestPackedEngine(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+
+    def _engine(self, packed):
+        engine = DendriteEngine(self.c, packed=packed)
+        configuration = dendrite_default_configuration(self.c)
+        segments = []
+        for i in range(5):
+            configuration["LEN"] = 5 + i
+            segments.append(engine.create_segment(**configuration, name=f"D{i}"))
+        engine.add_branch(segments[0], segments[1], segments[2])
+        engine.add_branch(segments[2], segments[3], segments[4])
+        segments[0].V[2] = 1.0
+        return engine, segments
+
+    def test_single_buffer(self):
+        engine, _ = self._engine(True)
+        self.assertEqual(list(engine.voltage_tables), [PACKED])
+
+    def test_matches_tables(self):
+        engine, segments = self._engine(False)
+        packed, packed_segments = self._engine(True)
+        for e in (engine, packed):
+            for _ in range(50):
+                e.forward()
+        engine.grow(segments[2])
+        packed.grow(packed_segments[2])
+        for e in (engine, packed):
+            for _ in range(50):
+                e.forward()
+        for segment, packed_segment in zip(segments, packed_segments):
+            self.assertEqual(packed_segment.length, segment.length)
+            self.assertTrue(torch.allclose(packed_segment.V, segment.V))
+
+    def test_grow(self):
+        engine, segments = self._engine(True)
+        segments[0].V.fill_(1.0)
+        for _ in range(20):
+            engine.grow(segments[0])
+        self.assertEqual(segments[0].length, 25)
+        self.assertTrue((segments[0].V == 1.0).all())
+        engine.forward()
+        self.assertTrue(torch.isfinite(engine.voltage_tables[PACKED].data).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
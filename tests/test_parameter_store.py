@@ -0,0 +1,98 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.exceptions import DendriteRadiusError
+from dendrites.segment import DendriteSegment, dendrite_default_configuration
+from dendrites.segment_parameters import COLUMN, SegmentParameters
+
+N = 6
+
+
+class TestParameterStore(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.configuration = dendrite_default_configuration(self.c)
+        self.lengths = torch.arange(5, 5 + N)
+        self.r0 = torch.linspace(10.0, 15.0, N)
+
+    def test_segments_are_handles(self):
+        engine = DendriteEngine(self.c)
+        segment = engine.create_segment(**self.configuration, name="D0")
+        self.assertFalse(hasattr(segment, '__dict__'))
+        engine.set_parameters(segment, gl=3.0)
+        self.assertEqual(engine.parameters.values[segment._id, COLUMN['gl'], 0].item(), 3.0)
+        self.assertEqual(segment.gl.item(), 3.0)
+        self.assertEqual(engine.parameters.lengths[segment._id].item(), segment.length)
+
+    def test_create_segments_matches_create_segment(self):
+        for packed in (False, True):
+            engine = DendriteEngine(self.c, packed=packed)
+            configuration = {name: value for name, value in self.configuration.items() if name != 'LEN'}
+            segments = engine.create_segments([f"S{i}" for i in range(N)], self.lengths,
+                                              **{**configuration, 'r0': self.r0})
+            reference = DendriteEngine(self.c, packed=packed)
+            copies = [reference.create_segment(**{**configuration, 'r0': r0}, LEN=length, name=f"S{i}")
+                      for i, (r0, length) in enumerate(zip(self.r0, self.lengths.tolist()))]
+            for engine_, segments_ in ((engine, segments), (reference, copies)):
+                engine_.add_branch(segments_[0], *segments_[1:3])
+                segments_[0].V[2] = 0.5
+                engine_.run(20)
+            for segment, copy in zip(segments, copies):
+                self.assertEqual(segment.length, copy.length)
+                self.assertTrue(torch.equal(segment.V, copy.V))
+
+    def test_radii(self):
+        engine = DendriteEngine(self.c)
+        segments = [engine.create_segment(**{**self.configuration, 'r0': r0}, name=f"S{i}")
+                    for i, r0 in enumerate(self.r0)]
+        engine.grow_many(segments, list(range(N)))
+        expected = torch.stack([segment.radius(segment.length) for segment in segments])
+        self.assertTrue(torch.allclose(engine.radii(segments), expected))
+
+    def test_per_replica(self):
+        engine = DendriteEngine(self.c, batch=3)
+        gl = torch.tensor([1.0, 2.0, 3.0])
+        standalone = DendriteSegment(**{**self.configuration, 'gl': gl}, name="D0")
+        engine.add_segment(standalone)
+        other = engine.create_segment(**self.configuration, name="L")
+        self.assertIs(standalone._parameters, engine.parameters)
+        self.assertTrue(torch.equal(standalone.gl, gl))
+        self.assertEqual(other.gl.dim(), 0)
+        self.assertEqual(engine.parameters.columns([standalone._id, other._id], ['gl'])[0].shape, (2, 3))
+        with self.assertRaises(ValueError):
+            engine.set_parameters(other, El=torch.zeros(2))
+
+    def test_free_rows_are_reused(self):
+        parameters = SegmentParameters(4)
+        ids = parameters.allocate(4)
+        parameters.set(ids, 'gl', torch.ones((4, 2)))
+        parameters.free_rows([1, 2])
+        self.assertEqual(parameters.free, 2)
+        self.assertFalse(parameters.per_replica[1:3].any())
+        self.assertEqual(parameters.allocate(2), range(1, 3))
+        self.assertEqual(parameters.allocate(1), range(4, 5))
+        parameters.free_rows([0, 3])
+        self.assertEqual(parameters.allocate(2), range(5, 7))
+        self.assertEqual(parameters.allocate(1), range(0, 1))
+
+        # A segment added to an engine frees its row in the store it was built with
+        store = SegmentParameters()
+        segment = DendriteSegment(**self.configuration, name="D0", parameters=store)
+        row = segment._id
+        DendriteEngine(self.c).add_segment(segment)
+        self.assertEqual(store.free, 1)
+        self.assertEqual(DendriteSegment(**self.configuration, name="D1", parameters=store)._id, row)
+        self.assertEqual(store.count, 1)
+
+    def test_radius_error(self):
+        engine = DendriteEngine(self.c)
+        configuration = {name: value for name, value in self.configuration.items() if name != 'LEN'}
+        with self.assertRaises(DendriteRadiusError):
+            engine.create_segments(["S0", "S1"], [5, 5000], **configuration)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.probe import Probe
+from dendrites.segment import dendrite_default_configuration
+
+N = 60
+
+
+class TestProbe(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.signal = torch.rand(N) * 0.1
+
+    def _engine(self, packed=False, batch=None):
+        engine = DendriteEngine(self.c, packed=packed, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        segment = engine.create_segment(**configuration, name="D0")
+        branch_L = engine.create_segment(**configuration, name="L")
+        configuration["LEN"] = 7
+        branch_R = engine.create_segment(**configuration, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        return engine, [segment, branch_L, branch_R]
+
+    def _reference(self, packed=False):
+        """
+        Voltages of the right branch after every step.
+        """
+        engine, segments = self._engine(packed)
+        recorded = []
+        for step in range(N):
+            segments[0].signal(1, self.signal[step:step + 1])
+            engine.forward()
+            recorded.append(segments[2].V.clone())
+        return torch.stack(recorded)
+
+    def test_forward_and_run(self):
+        for packed in (False, True):
+            reference = self._reference(packed)
+            for fused in (False, True):
+                engine, segments = self._engine(packed)
+                probe = engine.add_probe(Probe([segments[2]], capacity=N))
+                if fused:
+                    engine.run(N, stimuli=[(segments[0], 1, self.signal)])
+                else:
+                    for step in range(N):
+                        segments[0].signal(1, self.signal[step:step + 1])
+                        engine.forward()
+                steps, values = probe.flush()
+                self.assertTrue(torch.equal(steps, torch.arange(1, N + 1)))
+                self.assertTrue(torch.allclose(probe.segment_values(values, segments[2]), reference, atol=1e-6))
+
+    def test_every_and_positions(self):
+        reference = self._reference()
+        engine, segments = self._engine()
+        probe = engine.add_probe(Probe([segments[2]], positions=[1, -1], every=4, capacity=N))
+        engine.run(N // 2, stimuli=[(segments[0], 1, self.signal)])
+        for step in range(N // 2, N):
+            segments[0].signal(1, self.signal[step:step + 1])
+            engine.forward()
+        steps, values = probe.flush()
+        self.assertTrue(torch.equal(steps, torch.arange(4, N + 1, 4)))
+        self.assertEqual(values.shape, (N // 4, 2))
+        compartments = [segments[2].compartment(1), segments[2].length - 1]
+        self.assertTrue(torch.allclose(values, reference[3::4][:, compartments], atol=1e-6))
+
+    def test_ring_keeps_last_samples(self):
+        reference = self._reference()
+        engine, segments = self._engine()
+        probe = engine.add_probe(Probe([segments[2]], capacity=7))
+        engine.run(N, stimuli=[(segments[0], 1, self.signal)])
+        steps, values = probe.flush()
+        self.assertTrue(torch.equal(steps, torch.arange(N - 6, N + 1)))
+        self.assertTrue(torch.allclose(values, reference[-7:], atol=1e-6))
+        self.assertEqual(probe.flush()[1].shape[0], 0)
+
+    def test_sink(self):
+        reference = self._reference()
+        engine, segments = self._engine()
+        flushed = []
+        probe = engine.add_probe(Probe([segments[2]], every=2, capacity=4, sink=lambda *sample: flushed.append(sample)))
+        engine.run(N // 2 + 1, stimuli=[(segments[0], 1, self.signal)])
+        for step in range(N // 2 + 1, N):
+            segments[0].signal(1, self.signal[step:step + 1])
+            engine.forward()
+        probe.flush()
+        steps = torch.cat([steps for steps, _ in flushed])
+        values = torch.cat([values for _, values in flushed])
+        self.assertTrue(torch.equal(steps, torch.arange(2, N + 1, 2)))
+        self.assertTrue(torch.allclose(values, reference[1::2], atol=1e-6))
+
+    def test_grow(self):
+        # Samples of the old layout go to the sink, then the probe records the grown segment whole
+        for fused in (False, True):
+            engine, segments = self._engine()
+            flushed = []
+            probe = engine.add_probe(Probe(segments[1:], capacity=N, sink=lambda *sample: flushed.append(sample)))
+            plain = engine.add_probe(Probe(segments[1:], capacity=N))
+            engine.run(5)
+            plain.flush()
+            engine.grow(segments[1])
+            if fused:
+                engine.run(5)
+            else:
+                for _ in range(5):
+                    engine.forward()
+            self.assertEqual([values.shape for _, values in flushed], [(5, 12)])
+            steps, values = probe.flush()
+            self.assertTrue(torch.equal(steps, torch.arange(6, 11)))
+            self.assertTrue(torch.equal(probe.segment_values(values[-1], segments[1]), segments[1].V))
+            self.assertTrue(torch.equal(plain.flush()[1], values))
+            # Without a sink, samples of the old layout must be flushed first
+            engine.forward()
+            engine.grow(segments[2])
+            with self.assertRaises(ValueError):
+                engine.forward()
+
+    def test_whole_table(self):
+        engine, segments = self._engine(packed=True)
+        probe = engine.add_probe(Probe(table=next(iter(engine.voltage_tables)), capacity=1))
+        engine.run(5)
+        _, values = probe.flush()
+        storage, row, start = segments[1].locate()
+        self.assertTrue(torch.equal(values[0, start:start + segments[1].length], segments[1].V))
+
+    def test_ensemble(self):
+        engine, segments = self._engine(batch=3)
+        probe = engine.add_probe(Probe(segments[:2], positions=[1], capacity=N))
+        engine.run(N, stimuli=[(segments[0], 1, torch.rand((N, 3)) * 0.1)])
+        _, values = probe.flush()
+        self.assertEqual(values.shape, (N, 3, 2))
+        self.assertTrue(torch.equal(probe.segment_values(values, segments[1])[-1, :, 0],
+                                    segments[1].V[:, segments[1].compartment(1)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.probe import Probe
+from dendrites.propagator import Propagator
+from dendrites.segment import dendrite_default_configuration
+from dendrites.stimulus import StimulusSchedule
+
+N = 2000
+EVERY = 250
+
+
+class TestPropagator(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.DT = self.c.dendrites.DT
+
+    def _engine(self, packed=False, batch=None, probe=True):
+        engine = DendriteEngine(self.c, packed=packed, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        segments = []
+        for i in range(5):
+            configuration["LEN"] = 6 + i % 3
+            segments.append(engine.create_segment(**configuration, name=f"S{i}"))
+        engine.add_branch(segments[0], segments[1], segments[2])
+        engine.add_branch(segments[2], segments[3], segments[4])
+        schedule = StimulusSchedule(self.c)
+        schedule.add_events(segments[3], torch.tensor([3.0, 7.0, 7.5]) * self.DT + 1.0, 2, 0.5)
+        engine.set_stimulus(schedule)
+        if probe:
+            engine.add_probe(Probe(segments[:2], every=EVERY))
+        return engine, segments
+
+    def test_matches_forward(self):
+        for packed in (False, True):
+            for batch in (None, 2):
+                reference, copies = self._engine(packed, batch)
+                reference.run(N)
+                expected_steps, expected = reference.probes[0].flush()
+                engine, segments = self._engine(packed, batch)
+                self.assertEqual(engine.advance(N * self.DT), N)
+                self.assertEqual(engine.steps, N)
+                steps, values = engine.probes[0].flush()
+                self.assertTrue(torch.equal(steps, expected_steps))
+                self.assertTrue(torch.allclose(values, expected, atol=1e-6))
+                for segment, copy in zip(segments, copies):
+                    self.assertTrue(torch.allclose(segment.V, copy.V, atol=1e-6))
+
+    def test_jumps_per_event(self):
+        engine, segments = self._engine(probe=False)
+        propagator = Propagator(engine)
+        propagator.run(N)
+        # Before the first input, between the inputs and after the last one
+        self.assertEqual(propagator.jumps, 4)
+
+    def test_tree_changes(self):
+        reference, copies = self._engine(probe=False)
+        engine, segments = self._engine(probe=False)
+        propagator = Propagator(engine)
+        for engine_, segments_ in ((reference, copies), (engine, segments)):
+            engine_.grow(segments_[1])
+            engine_.add_branch(segments_[1], engine_.create_segment(**dendrite_default_configuration(self.c),
+                                                                    name="S5"))
+        propagator.run(N // 2)
+        reference.run(N // 2)
+        for engine_, segments_ in ((reference, copies), (engine, segments)):
+            engine_.grow(segments_[4])
+        propagator.run(N // 2)
+        reference.run(N // 2)
+        for segment, copy in zip(segments, copies):
+            self.assertTrue(torch.allclose(segment.V, copy.V, atol=1e-6))
+
+    def test_cache(self):
+        engine, _ = self._engine(probe=False)
+        propagator = Propagator(engine, cache_size=2)
+        for n in (5, 6, 7, 5):
+            self.assertTrue(torch.allclose(propagator.propagator(n),
+                                           torch.matrix_power(propagator.propagator(1), n)))
+        self.assertEqual(len(propagator._cache), 2)
+
+    def test_time_must_be_multiple_of_dt(self):
+        engine, _ = self._engine()
+        with self.assertRaises(ValueError):
+            engine.advance(1.5 * self.DT)
+
+
+if __name__ == '__main__':
+    unittest.main()
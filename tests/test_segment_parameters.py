@@ -0,0 +1,120 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.exceptions import DendriteRadiusError
+from dendrites.forward.forward_strategy_default import ForwardStrategyDefault
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+from dendrites.greens_function import GreensFunction
+from dendrites.segment import dendrite_default_configuration
+
+LEN = 12
+
+
+class TestSegmentParameters(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.configuration = dendrite_default_configuration(self.c)
+        self.configuration["LEN"] = LEN
+
+    def _tree(self, packed=False, **parameters):
+        engine = DendriteEngine(self.c, packed=packed)
+        segment = engine.create_segment(**{**self.configuration, 'gl': 4.0, **parameters}, name="D0")
+        branch_L = engine.create_segment(**{**self.configuration, 'El': 0.25, 'Cm': 2.0}, name="L")
+        branch_R = engine.create_segment(**{**self.configuration, 'El': -0.25, 'gl': 0.5}, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        segment.V[3] = 1.0
+        return engine, (segment, branch_L, branch_R)
+
+    def test_resting_potential(self):
+        engine = DendriteEngine(self.c)
+        segment = engine.create_segment(**{**self.configuration, 'El': 0.5}, name="D0")
+        for _ in range(2000):
+            engine.forward()
+        self.assertTrue(torch.allclose(segment.V, torch.full((LEN,), 0.5), atol=1e-4))
+
+    def test_coefficients(self):
+        for packed in (False, True):
+            engine, (segment, branch_L, _) = self._tree(packed)
+            storage, row, start = branch_L.locate()
+            coefficients = storage.data[row, 1:, start:start + LEN]
+            self.assertTrue(torch.allclose(coefficients[1], torch.full((LEN,), self.c.dendrites.DT / 2.0)))
+            self.assertTrue(torch.equal(coefficients[2], branch_L.D_batch(LEN) / self.c.dendrites.DX ** 2))
+            self.assertTrue(torch.equal(coefficients[4], torch.full((LEN,), 0.25)))
+
+    def test_implicit_and_greens_function_match_explicit(self):
+        explicit, segments = self._tree()
+        implicit, implicit_segments = self._tree()
+        dt = self.c.dendrites.DT / 4
+        implicit.forward_context.set_strategy(ForwardStrategyImplicit(self.c, method='backward_euler', dt=dt))
+        green = GreensFunction(explicit)
+        for _ in range(128):
+            explicit.forward()
+        for _ in range(512):
+            implicit.forward()
+        x = torch.arange(LEN, dtype=torch.float)
+        for segment, implicit_segment in zip(segments, implicit_segments):
+            self.assertLess((segment.V - implicit_segment.V)[1:-1].abs().max(), 0.02)
+            self.assertLess((segment.V - green.at(segment, x, 1.0).reshape(-1))[1:-1].abs().max(), 0.02)
+
+    def test_set_parameters(self):
+        engine, (segment, _, _) = self._tree()
+        reference, (reference_segment, _, _) = self._tree(gl=1.0, El=0.1)
+        engine.set_parameters(segment, gl=1.0, El=0.1)
+        for _ in range(100):
+            engine.forward()
+            reference.forward()
+        self.assertTrue(torch.equal(segment.V, reference_segment.V))
+
+    def test_segment_set_parameters_notifies_engine(self):
+        # Cached factorizations, stencils and propagator powers are rebuilt without going through the engine
+        for implicit in (False, True):
+            engine, (segment, _, _) = self._tree()
+            reference, (reference_segment, _, _) = self._tree()
+            if implicit:
+                engine.forward_context.set_strategy(ForwardStrategyImplicit(self.c))
+                reference.forward_context.set_strategy(ForwardStrategyImplicit(self.c))
+            for gl in (None, 20.0):
+                if gl is not None:
+                    segment.set_parameters(gl=gl)
+                    reference.set_parameters(reference_segment, gl=gl)
+                if implicit:
+                    engine.run(10)
+                else:
+                    engine.advance(10 * self.c.dendrites.DT)
+                for _ in range(10):
+                    reference.forward()
+            self.assertTrue(torch.allclose(segment.V, reference_segment.V, atol=1e-5))
+
+    def test_set_parameters_checks(self):
+        engine, (segment, _, _) = self._tree()
+        with self.assertRaises(ValueError):
+            engine.set_parameters(segment, dx=2.0)
+        with self.assertRaises(DendriteRadiusError):
+            engine.set_parameters(segment, k=10.0)
+        self.assertEqual(segment.k.item(), self.c.dendrites.K)
+
+    def test_strategies_reject_segment_parameters(self):
+        with self.assertRaises(TypeError):
+            ForwardStrategyDefault(self.c, gl=1.0)
+        with self.assertRaises(TypeError):
+            ForwardStrategyDefault(self.c, dt=0.1)
+        with self.assertRaises(TypeError):
+            ForwardStrategyImplicit(self.c, dx=1.0, Cm=2.0)
+        self.assertAlmostEqual(ForwardStrategyImplicit(self.c, dt=0.1).dt.item(), 0.1)
+
+    def test_run_matches_forward(self):
+        for packed in (False, True):
+            engine, segments = self._tree(packed)
+            reference, reference_segments = self._tree(packed)
+            engine.run(100)
+            for _ in range(100):
+                reference.forward()
+            for segment, reference_segment in zip(segments, reference_segments):
+                self.assertTrue(torch.equal(segment.V, reference_segment.V))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.segment import dendrite_default_configuration
+from dendrites.sharded_engine import ShardedEngine, partition
+
+N = 100
+
+
+class TestShardedEngine(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+
+    def _engine(self, n_trees: int, depth: int, packed=False, length: int = 6):
+        engine = DendriteEngine(self.c, packed=packed)
+        configuration = dendrite_default_configuration(self.c)
+        configuration.pop('LEN')
+        n = 2 ** depth - 1
+        for t in range(n_trees):
+            lengths = [length + (t + i) % 3 for i in range(n)]
+            segments = engine.create_segments([f"T{t}S{i}" for i in range(n)], lengths, **configuration)
+            for i in range(n // 2):
+                engine.add_branch(segments[i], segments[2 * i + 1], segments[2 * i + 2])
+            segments[-1].V[2] = 0.5
+        return engine
+
+    def _compare(self, engine, n_shards):
+        reference = list(engine.slice_ids)
+        with ShardedEngine(engine, n_shards) as sharded:
+            for engine_ in (sharded, engine):
+                engine_.run(N)
+            sharded.signal(reference[1], 3, torch.tensor([0.25]))
+            reference[1].signal(3, torch.tensor([0.25]))
+            for engine_ in (sharded, engine):
+                engine_.run(N)
+            V = sharded.voltages()
+            for segment in reference:
+                self.assertTrue(torch.allclose(V[segment], segment.V, atol=1e-7), segment.name)
+            return sharded
+
+    def test_forest(self):
+        sharded = self._compare(self._engine(4, 3), 2)
+        self.assertEqual(sharded.cross_junctions, 0)
+
+    def test_split_tree(self):
+        engine = self._engine(1, 5, packed=True)
+        sharded = self._compare(engine, 3)
+        self.assertGreater(sharded.cross_junctions, 0)
+
+    def test_split_tree_short_segments(self):
+        # Segments of length 5 share one inner compartment between the arms at their start and end
+        for packed in (False, True):
+            engine = self._engine(1, 5, packed=packed, length=5)
+            sharded = self._compare(engine, 3)
+            self.assertGreater(sharded.cross_junctions, 0)
+
+    def test_partition(self):
+        engine = self._engine(3, 4)
+        for n_shards in (2, 4, 6):
+            shards = partition(engine, n_shards)
+            self.assertEqual(sorted(segment.name for shard in shards for segment in shard),
+                             sorted(segment.name for segment in engine.slice_ids))
+            sizes = [sum(segment.length for segment in shard) for shard in shards]
+            self.assertEqual(len(shards), n_shards)
+            self.assertLessEqual(max(sizes), 2 * sum(sizes) / n_shards)
+        # Trees smaller than a shard stay whole
+        shards = partition(engine, 3)
+        self.assertEqual([{segment.name[:2] for segment in shard} for shard in shards], [{'T0'}, {'T1'}, {'T2'}])
+
+    def test_sync(self):
+        engine = self._engine(2, 2)
+        expected = self._engine(2, 2)
+        expected.run(N)
+        with ShardedEngine(engine, 2) as sharded:
+            sharded.run(N)
+            sharded.sync()
+        self.assertEqual(engine.steps, N)
+        for segment, copy in zip(engine.slice_ids, expected.slice_ids):
+            self.assertTrue(torch.allclose(segment.V, copy.V, atol=1e-7))
+
+
+if __name__ == '__main__':
+    unittest.main()
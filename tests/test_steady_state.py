@@ -0,0 +1,99 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.forward.forward_context import ForwardContext
+from dendrites.forward.forward_strategy_implicit import ForwardStrategyImplicit
+from dendrites.segment import dendrite_default_configuration
+from dendrites.steady_state import SteadyState
+from dendrites.stimulus import StimulusSchedule
+
+N = 4000
+AMPLITUDE = 1e-3
+
+
+class TestSteadyState(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.EL = self.c.dendrites.EL
+
+    def _engine(self, strategy=None):
+        forward_context = ForwardContext(self.c, strategy) if strategy is not None else None
+        engine = DendriteEngine(self.c, forward_context=forward_context)
+        configuration = dendrite_default_configuration(self.c)
+        segments = []
+        for i in range(5):
+            configuration["LEN"] = 8 + 2 * i
+            segments.append(engine.create_segment(**configuration, name=f"S{i}"))
+        engine.add_branch(segments[0], segments[1], segments[2])
+        engine.add_branch(segments[2], segments[3], segments[4])
+        return engine, segments
+
+    def test_rest(self):
+        engine, segments = self._engine()
+        for V in engine.steady_state().steady_state().values():
+            self.assertTrue(torch.allclose(V, torch.full_like(V, self.EL)))
+
+    def test_matches_settled_run(self):
+        # Backward Euler has the same fixed point as the cable equation
+        engine, segments = self._engine(ForwardStrategyImplicit(self.c, method='backward_euler'))
+        schedule = StimulusSchedule(self.c)
+        schedule.add_waveform(segments[3], 4, torch.full((N,), AMPLITUDE))
+        schedule.add_waveform(segments[0], 2, torch.full((N,), -AMPLITUDE / 2))
+        engine.set_stimulus(schedule)
+        engine.run(N)
+        inputs = [(segments[3], 4, AMPLITUDE), (segments[0], 2, -AMPLITUDE / 2)]
+        expected = engine.steady_state().steady_state(inputs)
+        for segment in segments:
+            self.assertTrue(torch.allclose(segment.V[1:-1], expected[segment][1:-1], atol=1e-6))
+            self.assertGreater(expected[segment].sub(self.EL).abs().max(), 1e-3)
+
+    def test_input_at_junction(self):
+        # The inner compartment of the parent at a branch point is merged with those of its children
+        engine, segments = self._engine(ForwardStrategyImplicit(self.c, method='backward_euler'))
+        position = segments[2].length - 3
+        schedule = StimulusSchedule(self.c)
+        schedule.add_waveform(segments[2], position, torch.full((N,), AMPLITUDE))
+        engine.set_stimulus(schedule)
+        engine.run(N)
+        expected = engine.steady_state().steady_state([(segments[2], position, AMPLITUDE)])
+        for segment in segments:
+            self.assertTrue(torch.allclose(segment.V[1:-1], expected[segment][1:-1], atol=1e-6))
+        impedance = engine.steady_state().impedance(segments[2], position)
+        self.assertAlmostEqual(impedance[segments[2]][position].item(),
+                               engine.steady_state().input_resistance()[segments[2]][position].item(), places=5)
+
+    def test_apply(self):
+        engine, segments = self._engine()
+        expected = engine.steady_state().steady_state([(segments[1], 3, AMPLITUDE)], apply=True)
+        for segment in segments:
+            self.assertTrue(torch.allclose(segment.V, expected[segment]))
+
+    def test_impedance_maps(self):
+        engine, segments = self._engine()
+        solver = SteadyState(engine, block=7)
+        resistance = solver.input_resistance()
+        attenuation = solver.attenuation(segments[0], 1)
+        self.assertAlmostEqual(attenuation[segments[0]][1].item(), 1.0, places=6)
+        for segment, position in ((segments[0], 5), (segments[2], 3), (segments[4], 10)):
+            impedance = solver.impedance(segment, position)
+            self.assertAlmostEqual(resistance[segment][position].item(), impedance[segment][position].item(),
+                                   places=5)
+            self.assertAlmostEqual(attenuation[segment][position].item(),
+                                   (impedance[segments[0]][1] / impedance[segment][position]).item(), places=5)
+            self.assertLess(attenuation[segment][position].item(), 1.0)
+        self.assertTrue(all((values > 0).all() for values in resistance.values()))
+
+    def test_rebuilt_after_change(self):
+        engine, segments = self._engine()
+        solver = engine.steady_state()
+        self.assertIs(engine.steady_state(), solver)
+        engine.grow(segments[4])
+        solver = engine.steady_state()
+        self.assertEqual(len(solver.input_resistance()[segments[4]]), segments[4].length)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.segment import dendrite_default_configuration
+from dendrites.stimulus import StimulusSchedule
+
+N = 200
+EVENTS = 500
+
+
+class TestStimulusSchedule(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.DT = self.c.dendrites.DT
+        generator = torch.Generator().manual_seed(0)
+        self.steps = torch.randint(0, N, (EVENTS,), generator=generator)
+        self.index = torch.randint(0, 3, (EVENTS,), generator=generator)
+        self.positions = torch.randint(1, 4, (EVENTS,), generator=generator).float()
+        self.amplitudes = torch.rand(EVENTS, generator=generator) * 0.01
+
+    def _engine(self, packed=False, batch=None):
+        engine = DendriteEngine(self.c, packed=packed, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        segment = engine.create_segment(**configuration, name="D0")
+        branch_L = engine.create_segment(**configuration, name="L")
+        configuration["LEN"] = 7
+        branch_R = engine.create_segment(**configuration, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        return engine, [segment, branch_L, branch_R]
+
+    def _schedule(self, segments):
+        schedule = StimulusSchedule(self.c)
+        schedule.add_events(segments, self.steps * self.DT, self.positions, self.amplitudes, index=self.index)
+        return schedule
+
+    def _reference(self, packed=False):
+        engine, segments = self._engine(packed)
+        for step in range(N):
+            for i in (self.steps == step).nonzero().reshape(-1).tolist():
+                segments[self.index[i]].signal(self.positions[i], self.amplitudes[i:i + 1])
+            engine.forward()
+        return segments
+
+    def test_matches_signal(self):
+        for packed in (False, True):
+            reference = self._reference(packed)
+            for fused in (False, True):
+                engine, segments = self._engine(packed)
+                engine.set_stimulus(self._schedule(segments))
+                if fused:
+                    engine.run(N)
+                else:
+                    for _ in range(N):
+                        engine.forward()
+                self.assertEqual(engine.steps, N)
+                for segment, expected in zip(segments, reference):
+                    self.assertTrue(torch.allclose(segment.V, expected.V, atol=1e-6))
+
+    def test_run_in_chunks(self):
+        reference, segments = self._engine()
+        reference.set_stimulus(self._schedule(segments))
+        reference.run(N)
+        engine, chunked = self._engine()
+        engine.set_stimulus(self._schedule(chunked))
+        engine.run(N // 4)
+        for _ in range(N // 4):
+            engine.forward()
+        engine.run(N // 2)
+        for segment, expected in zip(chunked, segments):
+            self.assertTrue(torch.allclose(segment.V, expected.V, atol=1e-6))
+
+    def test_waveform_per_replica(self):
+        engine, segments = self._engine(batch=2)
+        schedule = StimulusSchedule(self.c)
+        schedule.add_waveform(segments[0], 1, torch.stack((torch.full((N,), 0.01), torch.zeros(N)), dim=1))
+        engine.set_stimulus(schedule)
+        engine.run(N)
+        self.assertGreater(segments[0].V[0, 1], 0.0)
+        self.assertLess(segments[0].V[1, 1], 0.0)
+
+    def test_same_step_summed(self):
+        engine, segments = self._engine()
+        schedule = StimulusSchedule(self.c)
+        schedule.add_events(segments[0], [0.0, 0.0], 2, [0.25, 0.5])
+        engine.set_stimulus(schedule)
+        engine._forward_stimulus()
+        self.assertAlmostEqual(segments[0].V[2].item(), 0.75)
+
+    def test_recompiled_after_grow(self):
+        # Against a twin without the input, the step after grow adds it at the new second to last compartment, so
+        # after one step of diffusion it reaches no further back than its neighbour
+        engine, segments = self._engine()
+        twin, twin_segments = self._engine()
+        schedule = StimulusSchedule(self.c)
+        schedule.add_events(segments[2], [N * self.DT], -2, 0.5)
+        engine.set_stimulus(schedule)
+        for engine_, segments_ in ((engine, segments), (twin, twin_segments)):
+            engine_.run(N)
+            engine_.grow(segments_[2])
+            engine_.forward()
+        delta = segments[2].V - twin_segments[2].V
+        self.assertTrue(torch.equal(delta[:-3], torch.zeros(segments[2].length - 3)))
+        self.assertGreater(delta[-3], 0.1)
+        self.assertGreater(delta[-2], 0.05)
+
+    def test_position_outside_segment(self):
+        engine, segments = self._engine()
+        schedule = StimulusSchedule(self.c)
+        schedule.add_events(segments[0], [0.0], 100, 0.5)
+        engine.set_stimulus(schedule)
+        with self.assertRaises(ValueError):
+            engine.forward()
+
+
+if __name__ == '__main__':
+    unittest.main()
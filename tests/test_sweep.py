@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from config import MainConfig
+from dendrites.probe import Probe
+from dendrites.sweep import SweepRunner, branching_tree, grid, peak_features, sample
+
+N = 300
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.points = grid(gl=[1.0, 2.0], r0=[10.0, 15.0, 20.0])
+
+    def _direct(self, point):
+        engine, record = branching_tree(self.c)
+        for segment in record:
+            engine.set_parameters(segment, **point)
+        probe = engine.add_probe(Probe(record, capacity=N))
+        engine.run(N)
+        steps, values = probe.flush()
+        return values, peak_features(values, steps, self.c.dendrites.DT).numpy()
+
+    def test_grid_and_sample(self):
+        self.assertEqual(self.points[:2], [dict(gl=1.0, r0=10.0), dict(gl=1.0, r0=15.0)])
+        self.assertEqual(len(self.points), 6)
+        points = sample(5, seed=3, gl=(1.0, 2.0), Ra=(0.01, 0.1))
+        self.assertEqual(points, sample(5, seed=3, gl=(1.0, 2.0), Ra=(0.01, 0.1)))
+        self.assertTrue(all(1.0 <= point['gl'] <= 2.0 for point in points))
+
+    def test_matches_direct_runs(self):
+        with tempfile.TemporaryDirectory() as path:
+            runner = SweepRunner(self.c, self.points, path, N, traces=True, workers=0)
+            features = runner.run()
+            self.assertTrue(runner.done.all())
+            for i in (0, 4):
+                values, expected = self._direct(self.points[i])
+                self.assertTrue(np.allclose(features[i], expected))
+                self.assertTrue(np.allclose(runner.traces[i], values.numpy()))
+            self.assertFalse(np.allclose(features[0], features[5]))
+
+    def test_points_with_different_parameters(self):
+        # Parameters missing from a point keep their built values, not those of the point before
+        points = [dict(gl=np.float32(3.0)), dict(r0=torch.tensor(15.0)), dict(gl=np.array(1.5))]
+        with tempfile.TemporaryDirectory() as path:
+            features = SweepRunner(self.c, points, path, N, workers=0).run()
+            for i in (1, 2):
+                self.assertTrue(np.allclose(features[i], self._direct(points[i])[1]))
+            SweepRunner(self.c, points, path, N, workers=0)
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as path:
+            def crash(done, total):
+                if done == 2:
+                    raise Interrupted
+
+            with self.assertRaises(Interrupted):
+                SweepRunner(self.c, self.points, path, N, workers=0, progress=crash).run()
+            reports = []
+            runner = SweepRunner(self.c, self.points, path, N, workers=0,
+                                 progress=lambda done, total: reports.append((done, total)))
+            features = runner.run()
+            self.assertEqual(reports, [(3, 6), (4, 6), (5, 6), (6, 6)])
+            with tempfile.TemporaryDirectory() as other:
+                expected = SweepRunner(self.c, self.points, other, N, workers=0).run()
+            self.assertTrue(np.array_equal(features, expected))
+            with self.assertRaises(ValueError):
+                SweepRunner(self.c, self.points[:3], path, N, workers=0)
+
+    def test_no_samples(self):
+        with tempfile.TemporaryDirectory() as path:
+            with self.assertRaises(ValueError):
+                SweepRunner(self.c, self.points, path, 5, every=10, workers=0)
+
+    def test_process_pool(self):
+        with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as other:
+            features = SweepRunner(self.c, self.points, path, N, workers=2).run()
+            expected = SweepRunner(self.c, self.points, other, N, workers=0).run()
+            self.assertTrue(np.array_equal(features, expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
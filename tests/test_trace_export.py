@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from config import MainConfig
+from dendrites.dendrite_engine import DendriteEngine
+from dendrites.probe import Probe
+from dendrites.segment import dendrite_default_configuration
+from dendrites.trace_export import load_traces
+
+N = 50
+
+
+class TestTraceExport(unittest.TestCase):
+    def setUp(self):
+        self.c = MainConfig()
+        self.signal = torch.rand((N, 2)) * 0.1
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _engine(self, batch=None):
+        engine = DendriteEngine(self.c, batch=batch)
+        configuration = dendrite_default_configuration(self.c)
+        segment = engine.create_segment(**configuration, name="D0")
+        branch_L = engine.create_segment(**configuration, name="L")
+        configuration["LEN"] = 7
+        branch_R = engine.create_segment(**configuration, name="R")
+        engine.add_branch(segment, branch_L, branch_R)
+        return engine, [segment, branch_L, branch_R]
+
+    def test_matches_probe(self):
+        engine, segments = self._engine()
+        probe = engine.add_probe(Probe(segments, capacity=N))
+        exporter = engine.export_traces(self.directory.name, n_steps=N, every=2, capacity=4)
+        engine.run(N // 2, stimuli=[(segments[0], 1, self.signal[:, 0])])
+        for _ in range(N // 2):
+            engine.forward()
+        exporter.close()
+        _, values = probe.flush()
+
+        traces = load_traces(self.directory.name)
+        self.assertIsInstance(traces.values, np.memmap)
+        self.assertEqual(traces.values.shape, (N // 2, sum(segment.length for segment in segments)))
+        self.assertTrue(np.array_equal(traces.steps, np.arange(2, N + 1, 2)))
+        self.assertTrue(np.allclose(traces.times, traces.steps * self.c.dendrites.DT))
+        for segment in segments:
+            expected = probe.segment_values(values, segment)[1::2].numpy()
+            self.assertTrue(np.array_equal(traces[segment.name], expected))
+
+    def test_ensemble_partial(self):
+        engine, segments = self._engine(batch=2)
+        exporter = engine.export_traces(self.directory.name, segments[2:], n_steps=N, capacity=8)
+        engine.run(N // 2, stimuli=[(segments[0], 1, self.signal)])
+        exporter.close()
+        engine.run(5)
+        traces = load_traces(self.directory.name)
+        self.assertEqual(traces["R"].shape, (N // 2, 2, 7))
+        self.assertEqual(list(traces.columns), ["R"])
+        self.assertEqual(engine.probes, [])
+
+    def test_full(self):
+        engine, segments = self._engine()
+        engine.export_traces(self.directory.name, n_steps=4, capacity=2)
+        with self.assertRaises(ValueError):
+            engine.run(8)
+
+    def test_grow_while_exporting(self):
+        engine, segments = self._engine()
+        exporter = engine.export_traces(self.directory.name, n_steps=N, capacity=4)
+        engine.run(6)
+        engine.grow(segments[0])
+        with self.assertRaises(ValueError):
+            engine.run(8)
+        # Samples before the segment grew are in the files
+        self.assertEqual(exporter.count, 6)
+
+    def test_n_steps_required(self):
+        engine, segments = self._engine()
+        with self.assertRaises(TypeError):
+            engine.export_traces(self.directory.name)
+        with self.assertRaises(ValueError):
+            engine.export_traces(self.directory.name, n_steps=0)
+        self.assertEqual(engine.probes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()